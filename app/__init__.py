@@ -1,7 +1,19 @@
 import os 
-from flask import Flask, request
+import time
+from flask import Flask, request, g
 from config import Config
-from ml.loader import load_model
+from app.services.tile_cache import configure_tile_cache
+from app.services.tile_fetcher import configure_tile_fetcher
+from app.services.tile_providers import configure_tile_provider
+from app.services.rate_limiter import configure_rate_limits
+from app.services.model_state import start_model_loading
+from app.services.prediction_writer import configure_prediction_writer
+from app.services.result_cache import configure_result_cache
+from app.services.image_cache import configure_image_cache
+from app.services.job_runner import recover_interrupted_jobs
+from app.services.coordinate_store import expire_coordinate_sets
+from app.services.metrics import configure_metrics, set_route, reset_route, observe_request
+from app.services.profiler import SamplingProfiler, wants_profile
 from app.utils.helper import resource_path
 
 import logging
@@ -39,6 +51,16 @@ def create_app():
             f"REQUEST: {request.method} {request.path} | IP={request.remote_addr}"
         )
 
+    @app.before_request
+    def start_timers():
+        # Stage timers are labelled with the url rule (not the path: bounded label set)
+        g.metrics_route = request.url_rule.rule if request.url_rule else "unmatched"
+        g.metrics_token = set_route(g.metrics_route)
+        g.request_start = time.perf_counter()
+
+        if wants_profile(request, app.config["APP_CONFIG"]):
+            g.profiler = SamplingProfiler(app.config["APP_CONFIG"].profile_interval_ms / 1000.0).start()
+
     @app.after_request
     def log_response(response):
         app.logger.info(
@@ -46,29 +68,75 @@ def create_app():
         )
         return response
 
+    @app.after_request
+    def stop_timers(response):
+        if "request_start" in g:
+            observe_request(g.metrics_route, request.method, response.status_code, time.perf_counter() - g.request_start)
+
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            cfg = app.config["APP_CONFIG"]
+            profiler.stop()
+            try:
+                path = profiler.write(cfg.profile_dir, f"{request.method}-{request.path}")
+                response.headers["X-Profile"] = os.path.basename(path)
+                app.logger.info(f"PROFILE: {profiler.samples} samples over {profiler.elapsed:.3f}s -> {path}")
+            except OSError as e:
+                app.logger.error(f"Failed to write profile: {str(e)}")
+
+        return response
+
+    @app.teardown_request
+    def reset_timers(exc):
+        # A profiler still running here belongs to a request that never reached after_request
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.stop()
+
+        token = g.pop("metrics_token", None)
+        if token is not None:
+            try:
+                reset_route(token)
+            except ValueError:
+                # Streamed bodies finish in a different context
+                pass
+
     app.secret_key = os.urandom(24)  # Secure key for sessions and flash messages
 
 
     # 2. Load configuration
     config = Config()
     app.config["APP_CONFIG"] = config 
-
-
-    # 3. Load ML Model ONCE
-    app.model = load_model(config)
-
-    if app.model is None:
-        print("Error: Model could not be loaded.")
+    configure_metrics(config)
+    configure_tile_cache(config)
+    configure_tile_fetcher(config)
+    configure_tile_provider(config)
+    configure_rate_limits(config)
+    configure_prediction_writer(config)
+    configure_result_cache(config)
+    configure_image_cache(config)
+    recover_interrupted_jobs(config)
+    expire_coordinate_sets(config)
+
+
+    # 3. Load ML Model ONCE (in the background; /readyz flips when it is warmed)
+    start_model_loading(app, config)
     
     # 4. Register Blueprints
 
     from app.routes.page_routes import static_bp
     from app.routes.coordinate_routes import coordinate_bp
     from app.routes.predictions_routes import prediction_bp
+    from app.routes.health_routes import health_bp
+    from app.routes.job_routes import job_bp
+    from app.routes.image_routes import image_bp
 
     app.register_blueprint(static_bp)
     app.register_blueprint(coordinate_bp)
     app.register_blueprint(prediction_bp)
+    app.register_blueprint(health_bp)
+    app.register_blueprint(job_bp)
+    app.register_blueprint(image_bp)
 
     # 5. Return app
     return app
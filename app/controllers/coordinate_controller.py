@@ -1,6 +1,8 @@
+import logging
 from flask import session
 from app.utils.helper import is_ajax, get_response, validate_latlon, coordinates_match
-import pandas as pd
+from app.services.coordinate_store import get_coordinate_store, expire_coordinate_sets
+from app.services.coordinate_ingest import ingest_coordinates_csv
 
 
 class CoordinateController:
@@ -53,9 +55,10 @@ class CoordinateController:
         return get_response("Coordinate deleted successfully!", "success", 200, extra={"coordinates": new_list})
 
     @staticmethod
-    def clear_all(request):
-        """Clear all coordinates"""
+    def clear_all(request, cfg):
+        """Clear all coordinates (and the uploaded coordinate set)"""
 
+        CoordinateController._drop_coordinate_set(cfg)
         session["coordinates"] = []
         session.modified = True
 
@@ -68,9 +71,12 @@ class CoordinateController:
         )
 
     @staticmethod
-
-    def upload_coordinates(file_obj, request):
-        """Upload coordinates from a CSV file, supporting flexible column naming."""
+    def upload_coordinates(file_obj, request, cfg):
+        """
+        Upload coordinates from a CSV file, supporting flexible column naming.
+        All valid, de-duplicated rows go into a server-side coordinate set;
+        the first MAX_LIMIT are also shown on the map.
+        """
 
         if not file_obj or file_obj.filename == "":
             return get_response("No file selected.", "error", 400, is_ajax(request))
@@ -78,63 +84,55 @@ class CoordinateController:
         if not file_obj.filename.endswith(".csv"):
             return get_response("Invalid file format. Please upload a CSV file.", "error", 400, is_ajax(request))
 
-        # 1. Read CSV
+        expire_coordinate_sets(cfg)
+
+        # 1. Stream the CSV into a coordinate set (chunked, vectorized checks)
         try:
-            df = pd.read_csv(file_obj)
+            result = ingest_coordinates_csv(file_obj, cfg, name=file_obj.filename)
+        except ValueError as e:
+            return get_response(str(e), "error", 400, is_ajax(request))
         except Exception as e:
             return get_response(f"Error reading CSV: {str(e)}", "error", 500, is_ajax(request))
 
-        # 2. Normalize column names
-        df.columns = df.columns.str.strip().str.lower()
-
-        # 3. Possible matching names
-        lat_candidates = ["latitude", "lat", "x", "y_lat", "latitude (deg)"]
-        lon_candidates = ["longitude", "lon", "lng", "long", "y", "x_lon", "longitude (deg)"]
-
-        # 4. Detect actual columns
-        lat_col = next((c for c in df.columns if any(key in c for key in lat_candidates)), None)
-        lon_col = next((c for c in df.columns if any(key in c for key in lon_candidates)), None)
-
-        if not lat_col or not lon_col:
-            return get_response(
-                "CSV must contain recognizable latitude/longitude columns. "
-                "Examples: latitude, lat, Latitude, LAT, lon, longitude",
-                "error",
-                400,
-                is_ajax(request)
-            )
-
-        # 5. Process coordinates
-        coordinates = []
-        new_count = 0
-        invalid_count = 0
-        duplicates_count = 0
-
-        for _, row in df.iterrows():
-            try:
-                lat, lon = validate_latlon(row[lat_col], row[lon_col])
-            except ValueError:
-                invalid_count += 1
-                continue
-
-            if len(coordinates) >= CoordinateController.MAX_LIMIT:
-                break
-
-            if any(coordinates_match(c, lat, lon) for c in coordinates):
-                duplicates_count += 1
-                continue
-
-            coordinates.append({"lat": lat, "lon": lon})
-            new_count += 1
-
-        # 6. Save to session
+        # 2. Replace the previous upload, keep only the set id in the session
+        store = get_coordinate_store(cfg)
+        CoordinateController._drop_coordinate_set(cfg)
+
+        coordinates = store.head(result["set_id"], CoordinateController.MAX_LIMIT)
+
+        session["coordinate_set"] = {
+            "id": result["set_id"],
+            "name": file_obj.filename,
+            "total": result["total"]
+        }
         session["coordinates"] = coordinates
         session.modified = True
 
         msg = (
-            f"Successfully added {new_count} new coordinates. "
-            f"{invalid_count} invalid coordinates ignored. "
-            f"{duplicates_count} duplicates ignored."
+            f"Successfully added {result['total']} new coordinates. "
+            f"{result['invalid']} invalid coordinates ignored. "
+            f"{result['duplicates']} duplicates ignored."
         )
+        if result["truncated"]:
+            msg += f" Only the first {cfg.upload_max_coordinates} coordinates were kept."
+
+        extras = {
+            "coordinates": coordinates,
+            "coordinate_set": session["coordinate_set"],
+            "invalid": result["invalid"],
+            "duplicates": result["duplicates"]
+        }
 
-        return get_response(msg, "success", 200, is_ajax(request), extra={"coordinates": coordinates})
+        return get_response(msg, "success", 200, is_ajax(request), extra=extras)
+
+    @staticmethod
+    def _drop_coordinate_set(cfg):
+        """Forget (and delete) the uploaded coordinate set of this session, if any."""
+        info = session.pop("coordinate_set", None)
+        if not info:
+            return
+
+        try:
+            get_coordinate_store(cfg).delete_set(info["id"])
+        except Exception as e:
+            logging.error(f"Failed to delete coordinate set: {str(e)}")
@@ -0,0 +1,30 @@
+from app.utils.helper import get_response
+from app.services.image_cache import get_image_cache, IMAGE_ID_RE
+
+
+class ImageController:
+
+    @staticmethod
+    def get_image(image_id, size, cfg):
+        """Encoded JPEG bytes of a prediction image (or one of its thumbnails)."""
+
+        if not IMAGE_ID_RE.match(image_id or ""):
+            return get_response("Invalid image id.", "error", 400)
+
+        if size is not None and size not in cfg.image_thumbnail_sizes:
+            allowed = ", ".join(str(s) for s in cfg.image_thumbnail_sizes)
+            return get_response(f"Unsupported thumbnail size. Allowed: {allowed}", "error", 400)
+
+        cache = get_image_cache()
+        data = cache.get_image(image_id, size) if cache is not None else None
+
+        if data is None:
+            return get_response("Image not found.", "error", 404)
+
+        extras = {
+            "data": data,
+            "mime_type": "image/jpeg",
+            "etag": image_id if size is None else f"{image_id}-{size}"
+        }
+
+        return get_response("Image loaded.", "success", 200, False, extras)
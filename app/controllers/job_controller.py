@@ -0,0 +1,122 @@
+from flask import session
+from app.utils.helper import get_response, int_arg, is_ajax
+from app.services.job_store import get_job_store, FINISHED_STATES
+from app.services.job_runner import submit_job, cancel_job
+from app.services.coordinate_store import get_coordinate_store
+from app.services.scan_planner import parse_scan_area, plan_scan
+from app.services.raster_source import parse_raster_job, plan_raster
+from app.services.image_cache import get_image_cache
+
+
+class JobController:
+
+    @staticmethod
+    def _submitted(job_id, request):
+        return get_response(
+            "Job submitted.",
+            "success",
+            202,
+            is_ajax(request),
+            {"job_id": job_id}
+        )
+
+    @staticmethod
+    def submit_batch(cfg, request, use_cache=True):
+        """Queue a prediction job for the session coordinates (or the uploaded set)."""
+        info = session.get("coordinate_set")
+        coords = session.get("coordinates", [])
+
+        try:
+            if info and info.get("total", 0) > len(coords):
+                if get_coordinate_store(cfg).get_set(info["id"]) is None:
+                    return get_response("Uploaded coordinate set no longer exists.", "error", 404, is_ajax(request))
+                job_id = submit_job(cfg, "set", {"set_id": info["id"], "use_cache": use_cache}, info["total"])
+            else:
+                if not coords:
+                    return get_response("No coordinates to predict.", "error", 400, is_ajax(request))
+                job_id = submit_job(cfg, "batch", {"coords": coords, "use_cache": use_cache}, len(coords))
+        except Exception as e:
+            return get_response(f"Failed to submit job. {str(e)}", "error", 500, is_ajax(request))
+
+        return JobController._submitted(job_id, request)
+
+    @staticmethod
+    def submit_scan(form, cfg, request, use_cache=True):
+        """Queue an area scan job (grid, radius or polygon, see scan_planner)."""
+        try:
+            area = parse_scan_area(form)
+            total = len(plan_scan(area, cfg))
+        except ValueError as e:
+            return get_response(str(e), "error", 400, is_ajax(request))
+
+        try:
+            job_id = submit_job(cfg, "scan", {"area": area, "use_cache": use_cache}, total)
+        except Exception as e:
+            return get_response(f"Failed to submit job. {str(e)}", "error", 500, is_ajax(request))
+
+        return JobController._submitted(job_id, request)
+
+    @staticmethod
+    def submit_raster(form, cfg, request):
+        """Queue a sliding-window prediction job over a local raster (see raster_source)."""
+        try:
+            params = parse_raster_job(form, cfg)
+            total = len(plan_raster(params, cfg))
+        except ValueError as e:
+            return get_response(str(e), "error", 400, is_ajax(request))
+
+        try:
+            job_id = submit_job(cfg, "raster", {"raster": params}, total)
+        except Exception as e:
+            return get_response(f"Failed to submit job. {str(e)}", "error", 500, is_ajax(request))
+
+        return JobController._submitted(job_id, request)
+
+    @staticmethod
+    def job_status(job_id, cfg, args):
+        """Job state plus one page of its (partial) results."""
+        store = get_job_store(cfg)
+        job = store.get(job_id)
+
+        if job is None:
+            return get_response("Job not found.", "error", 404)
+
+        try:
+            after = int_arg(args, "after", -1)
+            limit = min(int_arg(args, "limit", cfg.job_results_page_size), cfg.history_page_size_max)
+        except ValueError:
+            return get_response("Invalid paging parameters.", "error", 400)
+
+        results, next_after = store.results_page(job_id, after, max(1, limit))
+
+        # Result images live in the size-capped image cache and expire with it
+        cache = get_image_cache()
+        for result in results:
+            if result["image_id"] and (cache is None or not cache.has_image(result["image_id"])):
+                result["image_id"] = None
+
+        job.pop("params", None)
+        job["finished"] = job["status"] in FINISHED_STATES
+
+        return get_response(
+            "Job loaded.",
+            "success",
+            200,
+            False,
+            {"job": job, "results": results, "next_after": next_after}
+        )
+
+    @staticmethod
+    def cancel(job_id, cfg):
+        store = get_job_store(cfg)
+        job = store.get(job_id)
+
+        if job is None:
+            return get_response("Job not found.", "error", 404)
+
+        if job["status"] in FINISHED_STATES:
+            return get_response(f"Job already {job['status']}.", "warning", 409)
+
+        cancel_job(cfg, job_id)
+
+        return get_response("Cancellation requested.", "success", 202)
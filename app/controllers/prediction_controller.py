@@ -1,16 +1,20 @@
-import os
-import pandas as pd
+import logging
+from datetime import datetime
 from flask import session
-from app.utils.helper import get_response, validate_latlon
-from app.services.prediction_service import run_prediction, run_prediction_batch, get_scan_coordinates, get_scan_stats
+from app.utils.helper import get_response, int_arg, validate_latlon, is_ajax
+from app.services.prediction_store import get_prediction_store
+from app.services.prediction_writer import flush_pending_predictions
+from app.services.coordinate_store import get_coordinate_store
+from app.services.prediction_service import run_prediction, run_prediction_batch, iter_prediction_batch, iter_scan, ScanStats
+from app.services.scan_planner import parse_scan_area, plan_scan
 from app.utils.helper import coordinates_match
 
 class PredictionController:
     MAX_LIMIT = 30
 
     @staticmethod
-    def predict_single(lat, lon, model, cfg):
-        """Predict a single coordinate."""
+    def predict_single(lat, lon, model, cfg, use_cache=True):
+        """Predict a single coordinate (use_cache=False skips the result cache)."""
 
         # Validate coordinate
         try:
@@ -28,8 +32,8 @@ class PredictionController:
         session.modified = True
 
         try:
-            image_base64, label, confidence = run_prediction(model, lat, lon, cfg)
-            if image_base64 is None:
+            image_id, label, confidence = run_prediction(model, lat, lon, cfg, use_cache)
+            if label is None:
                 return get_response("Failed to fetch satellite image for the given coordinates.", "error_response", 500)
         except:
             return get_response("Failed to run prediction.", "error_response", 500)
@@ -39,7 +43,7 @@ class PredictionController:
             'lon': lon,
             'label': label,
             'confidence': confidence,
-            "image_base64": image_base64
+            "image_id": image_id
         }
         return get_response(
             "Prediction completed",
@@ -50,7 +54,7 @@ class PredictionController:
         )
 
     @staticmethod
-    def predict_batch(model, coords, cfg, scan=False):
+    def predict_batch(model, coords, cfg, scan=False, use_cache=True):
         """Predict all coordinates stored in session"""
         
         if not coords:
@@ -60,7 +64,7 @@ class PredictionController:
             return get_response(f"Maximum {PredictionController.MAX_LIMIT} coordinates allowed.", "error", 400)
         
         try:
-            batch = run_prediction_batch(model, coords, cfg, sleep_seconds=1)
+            batch = run_prediction_batch(model, coords, cfg, use_cache=use_cache)
         except Exception as e:
             return get_response(f"Failed to run batch prediction. {str(e)}", "error", 500)
 
@@ -77,63 +81,228 @@ class PredictionController:
         )
     
     @staticmethod
-    def scan_predictions(lat, lon, model,cfg):
+    def predict_coordinate_set(model, set_info, cfg, use_cache=True):
+        """
+        Predict every coordinate of an uploaded coordinate set.
+        Coordinates are streamed from the store through the prediction
+        pipeline; only the first cfg.bulk_display_limit results are kept (and
+        get an image), the rest only count towards the summary statistics.
+        """
+        if not set_info:
+            return get_response("No uploaded coordinate set to predict.", "error", 400)
+
+        store = get_coordinate_store(cfg)
+        if store.get_set(set_info["id"]) is None:
+            return get_response("Uploaded coordinate set no longer exists.", "error", 404)
+
+        shown = []
+        stats = ScanStats()
         try:
-            lat, lon = validate_latlon(lat, lon)
-        except ValueError:
-            return get_response("Invalid coordinates.", "error_coordinates", 400)
+            coords = store.iter_coords(set_info["id"])
+            predictions = iter_prediction_batch(model, coords, cfg, use_cache=use_cache, image_limit=cfg.bulk_display_limit)
+            for prediction in predictions:
+                if len(shown) < cfg.bulk_display_limit:
+                    shown.append(prediction)
+                stats.add(prediction)
+        except Exception as e:
+            return get_response(f"Failed to run batch prediction. {str(e)}", "error", 500)
+
+        return get_response(
+            "Prediction completed",
+            "success",
+            200,
+            False,
+            { "predictions": shown, "summary_stats": stats.summary() }
+        )
+
+    @staticmethod
+    def _plan_sync_scan(form, cfg):
+        """ScanPlan for a scan run inside the request; raises ValueError with the user message."""
+        plan = plan_scan(parse_scan_area(form), cfg)
+
+        if len(plan) > cfg.scan_sync_max_tiles:
+            raise ValueError(f"Scan covers {len(plan)} tiles; run scans over {cfg.scan_sync_max_tiles} tiles as a background job.")
+
+        return plan
+
+    @staticmethod
+    def _stream_events(open_results, total, error_message):
+        """
+        Event stream of (event, data) pairs: "start" with the tile count, one
+        "result" per tile as soon as the pipeline yields it, then "stats" with
+        the summary (accumulated as results arrive) or "error" (error_message
+        plus the cause).
+        open_results() -> (results, hierarchical) is only called once the
+        stream is consumed; the pipeline is stopped if the client goes away.
+        """
+        yield "start", {"total": total}
 
+        stats = ScanStats()
+        results = hierarchical = None
         try:
-            coords = get_scan_coordinates(lat, lon)
-        except ValueError:
-            return get_response("Failed to generate scan coordinates.", "error", 500)
-        
+            results, hierarchical = open_results()
+            for index, prediction in enumerate(results):
+                stats.add(prediction)
+                yield "result", dict(prediction, index=index)
+        except Exception as e:
+            logging.error(f"Streaming prediction error: {str(e)}")
+            yield "error", {"message": f"{error_message} {str(e)}"}
+            return
+        finally:
+            if results is not None:
+                results.close()
+
+        yield "stats", stats.summary(hierarchical)
+
+    @staticmethod
+    def stream_batch(model, coords, cfg, use_cache=True):
+        """Like predict_batch, but returns an event stream (see _stream_events) of the results."""
         if not coords:
-            return get_response("Failed to generate scan coordinates.", "error", 500)
-        
+            return get_response("No coordinates to predict.", "error", 400)
+
+        if len(coords) >= PredictionController.MAX_LIMIT:
+            return get_response(f"Maximum {PredictionController.MAX_LIMIT} coordinates allowed.", "error", 400)
+
+        # The session cookie cannot change once the stream has started, so the
+        # coordinates are kept until the client confirms the run (finish_batch)
+        def open_results():
+            return iter_prediction_batch(model, coords, cfg, use_cache=use_cache), None
+
+        return get_response(
+            "Prediction started",
+            "success",
+            200,
+            False,
+            {
+                "total": len(coords),
+                "events": PredictionController._stream_events(open_results, len(coords), "Failed to run batch prediction.")
+            }
+        )
+
+    @staticmethod
+    def finish_batch(request):
+        """Clear the session coordinates once a streamed batch has delivered its stats (like predict_batch)."""
+        session["coordinates"] = []
+        session.modified = True
+
+        return get_response("Prediction completed", "success", 200, is_ajax(request), extra={"coordinates": []})
+
+    @staticmethod
+    def stream_scan(form, model, cfg, use_cache=True):
+        """Like scan_predictions, but returns an event stream (see _stream_events) of the results."""
         try:
-            batch = run_prediction_batch(model, coords, cfg, sleep_seconds=0.5)
-        except Exception as e:
-            return get_response(f"Failed to run batch prediction. {str(e)}", "error", 500)
-        
+            plan = PredictionController._plan_sync_scan(form, cfg)
+        except ValueError as e:
+            return get_response(str(e), "error", 400)
 
-        result = batch.get("predictions", [])
-        summary_stats = get_scan_stats(result)
+        def open_results():
+            return iter_scan(model, plan, cfg, use_cache, cfg.bulk_display_limit)
 
+        return get_response(
+            "Scan started",
+            "success",
+            200,
+            False,
+            { "total": len(plan), "events": PredictionController._stream_events(open_results, len(plan), "Failed to run scan.") }
+        )
+
+    @staticmethod
+    def scan_predictions(form, model, cfg, use_cache=True):
+        """
+        Scan an area (see scan_planner.parse_scan_area: a grid around lat/lon,
+        a radius or a GeoJSON polygon, optionally coarse-to-fine). Tiles are
+        streamed from the plan through the prediction pipeline and the summary
+        is updated as results arrive; only the first cfg.bulk_display_limit
+        results are kept for the page.
+        """
+        try:
+            plan = PredictionController._plan_sync_scan(form, cfg)
+        except ValueError as e:
+            return get_response(str(e), "error", 400)
+
+        shown = []
+        stats = ScanStats()
+        try:
+            predictions, hierarchical = iter_scan(model, plan, cfg, use_cache, cfg.bulk_display_limit)
+            for prediction in predictions:
+                if len(shown) < cfg.bulk_display_limit:
+                    shown.append(prediction)
+                stats.add(prediction)
+        except Exception as e:
+            return get_response(f"Failed to run batch prediction. {str(e)}", "error", 500)
 
         return get_response(
             "Scan completed",
             "success",
             200,
             False,
-            { "predictions": result, "summary_stats": summary_stats }
+            { "predictions": shown, "summary_stats": stats.summary(hierarchical) }
         )
     
     @staticmethod
-    def load_history(cfg):
-        """Load predictions from file"""
-        
-        file_name = cfg.predictions_file
+    def parse_history_filters(args):
+        """
+        Read history filters from query args.
+        start / end: YYYY-MM-DD or YYYY-MM-DDTHH:MM (end dates are inclusive)
+        label: exact label, min_conf / max_conf: 0-1
+        Raises ValueError on malformed values.
+        """
+        filters = {}
+
+        for key in ("start", "end"):
+            value = (args.get(key) or "").strip().replace("T", " ")
+            if not value:
+                continue
+            fmt = "%Y-%m-%d" if len(value) == 10 else "%Y-%m-%d %H:%M"
+            parsed = datetime.strptime(value[:16], fmt)
+
+            if key == "end" and fmt == "%Y-%m-%d":
+                filters[key] = parsed.strftime("%Y-%m-%d 23:59:59")
+            elif key == "end":
+                filters[key] = parsed.strftime("%Y-%m-%d %H:%M:59")
+            else:
+                filters[key] = parsed.strftime("%Y-%m-%d %H:%M:%S")
+
+        label = (args.get("label") or "").strip()
+        if label:
+            filters["label"] = label
 
-        if not os.path.exists(file_name):
-            return get_response("No predictions file found.", "warning", 404)
+        for arg, key in (("min_conf", "min_confidence"), ("max_conf", "max_confidence")):
+            value = (args.get(arg) or "").strip()
+            if value:
+                filters[key] = float(value)
+
+        return filters
+
+    @staticmethod
+    def load_history(cfg, args):
+        """Load one page of predictions (newest first) from the store"""
         
         try:
-            df = pd.read_csv(file_name)
-            df.columns = df.columns.str.lower()
+            filters = PredictionController.parse_history_filters(args)
+            cursor = int_arg(args, "cursor")
+            limit = max(1, min(int_arg(args, "limit", cfg.history_page_size), cfg.history_page_size_max))
+        except ValueError:
+            return get_response("Invalid history filters.", "error", 400)
 
-            required = ['latitude', 'longitude', 'label', 'confidence', 'timestamp']
+        if cursor is not None and cursor < 1:
+            return get_response("Invalid history cursor.", "error", 400)
 
-            if not all(col in df.columns for col in required):
-                return get_response("Predictions file is corrupted or has invalid format.", "error", 500)
+        try:
+            flush_pending_predictions()
+            store = get_prediction_store(cfg)
+            predictions, next_cursor = store.page(limit, cursor, filters)
 
-            df = df.dropna(subset=required)
-            predictions = df.to_dict("records")
+            extras = {
+                "predictions": predictions,
+                "next_cursor": next_cursor,
+                "labels": store.labels()
+            }
 
             if not predictions:
-                return get_response("No valid predictions found.", "warning", 404)
+                return get_response("No valid predictions found.", "warning", 404, False, extras)
             
-            return get_response("Predictions loaded.", "success", 200, False, {"predictions": predictions})
+            return get_response("Predictions loaded.", "success", 200, False, extras)
         
         except Exception as e:
             return get_response(f"Failed to load predictions: {str(e)}", "error", 500)
@@ -141,19 +310,16 @@ class PredictionController:
 
     @staticmethod
     def clear_history(cfg):
-        """Delete all predictions from file"""
-
-        file_path = cfg.predictions_file
+        """Delete all predictions from the store"""
 
         try:
-            if not os.path.exists(file_path):
-                return get_response("No predictions found.", "error", 404)
+            flush_pending_predictions()
+            store = get_prediction_store(cfg)
 
-            df = pd.read_csv(file_path)
-            columns_names = df.columns.tolist()
-            empty_df = pd.DataFrame(columns=columns_names)
+            if store.count() == 0:
+                return get_response("No predictions found.", "error", 404)
 
-            empty_df.to_csv(file_path, index=False)
+            store.clear()
 
             return get_response(
                 "All predictions have been cleared!",
@@ -166,18 +332,27 @@ class PredictionController:
             return get_response(f"Error clearing predictions: {str(e)}", "error", 500)
 
     @staticmethod
-    def download_history(file_path):
-        """Download the predictions CSV file."""
+    def download_history(cfg, args):
+        """Stream the (optionally filtered) prediction history as CSV."""
 
-        if not os.path.exists(file_path):
-            return get_response("No predictions file found to download", "error", 404)
+        try:
+            filters = PredictionController.parse_history_filters(args)
+        except ValueError:
+            return get_response("Invalid history filters.", "error", 400)
+
+        try:
+            flush_pending_predictions()
+            store = get_prediction_store(cfg)
+
+            if store.count() == 0:
+                return get_response("No predictions file found to download", "error", 404)
+        except Exception as e:
+            return get_response(f"Failed to export predictions: {str(e)}", "error", 500)
         
         data = {
-            'file_path': file_path,
+            'chunks': store.iter_csv(cfg.history_export_chunk_rows, filters),
             'mime_type': 'text/csv',
-            'download_name': 'predictions.csv',
-            'as_attachment': True
+            'download_name': 'predictions.csv'
         }
 
         return get_response("File ready for download", "success", 200, False, data)
-        
\ No newline at end of file
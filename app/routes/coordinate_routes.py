@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify, redirect, url_for, session, flash
+from flask import Blueprint, request, jsonify, redirect, url_for, session, flash, current_app
 from app.controllers.coordinate_controller import CoordinateController
 from app.utils.helper import _return_json
 
@@ -43,7 +43,9 @@ def delete_coordinate_route():
 
 @coordinate_bp.route("/clear", methods=["POST"])
 def clear_coordinates_route():
-    result = CoordinateController.clear_all(request)
+    cfg = current_app.config["APP_CONFIG"]
+
+    result = CoordinateController.clear_all(request, cfg)
 
     if result['type'] == "ajax":
         return _return_json({"message" : result.get("message", "Cleared all coordinates")}, result.get("status_code"))
@@ -62,7 +64,9 @@ def upload_coordinates_route():
 
     csv_file = request.files["csv_file"]
 
-    result = CoordinateController.upload_coordinates(csv_file, request)
+    cfg = current_app.config["APP_CONFIG"]
+
+    result = CoordinateController.upload_coordinates(csv_file, request, cfg)
 
 
     flash(result.get("message"), result.get("type"))
@@ -0,0 +1,28 @@
+from flask import Blueprint, Response, current_app
+from app.utils.helper import _return_json
+from app.services.metrics import render_metrics
+
+health_bp = Blueprint("health", __name__)
+
+
+@health_bp.route("/healthz", methods=["GET"])
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return _return_json({"status": "ok"})
+
+
+@health_bp.route("/readyz", methods=["GET"])
+def readyz():
+    """Readiness: the model is loaded and warmed."""
+    state = current_app.model_state
+
+    if not state.is_ready:
+        return _return_json(state.to_dict(), 503)
+
+    return _return_json(state.to_dict())
+
+
+@health_bp.route("/metrics", methods=["GET"])
+def metrics():
+    """Per-stage and per-route latency histograms in the Prometheus text format (this worker only)."""
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,25 @@
+from flask import Blueprint, request, current_app, Response
+from app.controllers.image_controller import ImageController
+from app.utils.helper import _return_json
+
+image_bp = Blueprint("images", __name__, url_prefix="/images")
+
+
+@image_bp.route("/<image_id>.jpg", methods=["GET"])
+def get_image(image_id):
+    """Serve a prediction image by id; ?size=N for a thumbnail"""
+    cfg = current_app.config["APP_CONFIG"]
+
+    result = ImageController.get_image(image_id, request.args.get("size", type=int), cfg)
+
+    if result["type"] == "error":
+        return _return_json({"message": result["message"]}, result["status_code"])
+
+    image = result["response"]
+
+    response = Response(image["data"], mimetype=image["mime_type"])
+    response.set_etag(image["etag"])
+    # Content-addressed: the bytes behind a URL never change
+    response.headers["Cache-Control"] = f"public, max-age={cfg.image_max_age}, immutable"
+
+    return response.make_conditional(request)
@@ -0,0 +1,91 @@
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
+from app.controllers.job_controller import JobController
+from app.utils.helper import _return_json, is_ajax
+
+job_bp = Blueprint("jobs", __name__, url_prefix="/jobs")
+
+
+def _submitted_response(result):
+    if result.get("type") == "ajax":
+        response = result.get("response", {})
+        if "job_id" in response:
+            response["status_url"] = url_for("jobs.job_status", job_id=response["job_id"], format="json")
+        return _return_json(response, result.get("status_code"))
+
+    if result.get("type") == "error":
+        flash(result.get("message", "Failed to submit job."), "error")
+        return redirect(url_for("pages.map_view"))
+
+    return redirect(url_for("jobs.job_status", job_id=result["response"]["job_id"]))
+
+
+@job_bp.route("/batch", methods=["POST"])
+def submit_batch():
+    """Run the session coordinates (or uploaded set) as a background job"""
+    cfg = current_app.config["APP_CONFIG"]
+    use_cache = not request.form.get("no_cache")
+
+    return _submitted_response(JobController.submit_batch(cfg, request, use_cache))
+
+
+@job_bp.route("/scan", methods=["POST"])
+def submit_scan():
+    """Run an area scan as a background job"""
+    cfg = current_app.config["APP_CONFIG"]
+    use_cache = not request.form.get("no_cache")
+
+    result = JobController.submit_scan(request.form, cfg, request, use_cache)
+
+    return _submitted_response(result)
+
+
+@job_bp.route("/raster", methods=["POST"])
+def submit_raster():
+    """Run sliding-window predictions over a local raster as a background job"""
+    cfg = current_app.config["APP_CONFIG"]
+
+    result = JobController.submit_raster(request.form, cfg, request)
+
+    return _submitted_response(result)
+
+
+@job_bp.route("/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """Job progress and results page; JSON with ?format=json (for polling)"""
+    cfg = current_app.config["APP_CONFIG"]
+
+    result = JobController.job_status(job_id, cfg, request.args)
+    wants_json = request.args.get("format") == "json" or is_ajax(request)
+
+    if wants_json:
+        payload = result.get("response", {}) if result["type"] == "success" else {"message": result["message"]}
+        return _return_json(payload, result.get("status_code"))
+
+    if result["type"] == "error":
+        flash(result["message"], "error")
+        return redirect(url_for("pages.map_view"))
+
+    response = result["response"]
+
+    return render_template(
+        "job.html",
+        show_sidebar=False,
+        job=response["job"],
+        results=response["results"],
+        next_after=response["next_after"],
+        after=request.args.get("after", type=int)
+    )
+
+
+@job_bp.route("/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    cfg = current_app.config["APP_CONFIG"]
+
+    result = JobController.cancel(job_id, cfg)
+
+    if is_ajax(request):
+        return _return_json({"message": result["message"]}, result.get("status_code"))
+
+    flash(result["message"], result["type"])
+
+    return redirect(url_for("jobs.job_status", job_id=job_id))
@@ -32,7 +32,9 @@ def map_view():
 
     return render_template("map.html",
                            coordinates=coords,
+                           coordinate_set=session.get('coordinate_set'),
                            map_center=center,
+                           scan_sync_max_tiles=cfg.scan_sync_max_tiles,
                            zoom=cfg.map_default['zoom'])
 
 
@@ -1,19 +1,55 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app, jsonify, send_file
+import json
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app, jsonify, Response, stream_with_context
 from app.controllers.prediction_controller import PredictionController
-from app.utils.helper import _return_json
+from app.utils.helper import _return_json, model_required
+from app.services.metrics import iter_in_context
 
 prediction_bp = Blueprint('predict', __name__, url_prefix="/predict")
 
 
+def _event_stream_response(result):
+    """
+    Stream controller events as Server-Sent Events, or as NDJSON (one
+    {"event", "data"} object per line) with ?format=ndjson or an
+    application/x-ndjson Accept header. Results get URLs for their image.
+    """
+    if result.get("type") == "error":
+        return _return_json({"message": result.get("message")}, result.get("status_code"))
+
+    ndjson = request.args.get("format") == "ndjson" or "application/x-ndjson" in request.headers.get("Accept", "")
+
+    def generate():
+        for event, data in result["response"]["events"]:
+            if data.get("image_id"):
+                data["image_url"] = url_for("images.get_image", image_id=data["image_id"])
+                data["thumbnail_url"] = url_for("images.get_image", image_id=data["image_id"], size=256)
+
+            if ndjson:
+                yield json.dumps({"event": event, "data": data}) + "\n"
+            else:
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    return Response(
+        # Stage timers of the streamed pipeline keep this route's label
+        stream_with_context(iter_in_context(generate())),
+        mimetype="application/x-ndjson" if ndjson else "text/event-stream",
+        # Flush every event through caches and reverse proxies (nginx buffers by default)
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+
 @prediction_bp.route('/single', methods=['POST'])
+@model_required
 def predict_single():
     model = current_app.model
     cfg = current_app.config["APP_CONFIG"]
 
     lat = request.form.get('lat')
     lon = request.form.get('lon')
+    use_cache = not request.form.get('no_cache')
 
-    result = PredictionController.predict_single(lat, lon, model, cfg)
+    result = PredictionController.predict_single(lat, lon, model, cfg, use_cache)
 
     if result.get("type") == "ajax":
         return _return_json(result.get("response", {}), result.get("status_code"))
@@ -36,18 +72,20 @@ def predict_single():
         confidence=render_info['confidence'],
         lat=render_info['lat'],
         lon=render_info['lon'],
-        image_base64=render_info['image_base64']
+        image_id=render_info['image_id']
     )
 
 @prediction_bp.route('/batch', methods=['POST'])
+@model_required
 def predict_batch():
     """Predict all coordinates stored in session"""
     coords = session.get("coordinates", [])
 
     cfg = current_app.config["APP_CONFIG"]
     model = current_app.model
+    use_cache = not request.form.get('no_cache')
 
-    result = PredictionController.predict_batch(model,coords,cfg)
+    result = PredictionController.predict_batch(model,coords,cfg, use_cache=use_cache)
 
     if result.get("type") == "ajax":
         return _return_json(result.get("response", {}), result.get("status_code"))
@@ -69,35 +107,88 @@ def predict_batch():
         predictions=predictions_results
     )
 
+@prediction_bp.route('/batch/stream', methods=['POST'])
+@model_required
+def stream_batch():
+    """Predict the session coordinates, streaming each result as it is ready"""
+    coords = session.get("coordinates", [])
+
+    cfg = current_app.config["APP_CONFIG"]
+    model = current_app.model
+    use_cache = not request.form.get('no_cache')
+
+    return _event_stream_response(PredictionController.stream_batch(model, coords, cfg, use_cache))
+
+@prediction_bp.route('/batch/done', methods=['POST'])
+def finish_batch():
+    """Clear the session coordinates after a streamed batch finished"""
+    result = PredictionController.finish_batch(request)
+
+    if result.get("type") == "ajax":
+        return _return_json({"message": result.get("message")}, result.get("status_code"))
+
+    flash(result.get("message"), result.get("type"))
+    return redirect(url_for("pages.map_view"))
+
+@prediction_bp.route('/set', methods=['POST'])
+@model_required
+def predict_coordinate_set():
+    """Predict all coordinates of the uploaded coordinate set"""
+    cfg = current_app.config["APP_CONFIG"]
+    model = current_app.model
+    use_cache = not request.form.get('no_cache')
+
+    result = PredictionController.predict_coordinate_set(model, session.get("coordinate_set"), cfg, use_cache)
+
+    if result.get("type") == "error":
+        flash(result.get("message", "Failed to run batch prediction."), "error")
+        return redirect(url_for("pages.map_view"))
+
+    response = result.get("response", {})
+
+    return render_template(
+        "scan_results.html",
+        show_sidebar=False,
+        title="Bulk Prediction Results",
+        predictions=response.get("predictions", []),
+        summary_stats=response.get("summary_stats", {})
+    )
+
 @prediction_bp.route('/history', methods=['GET'])
 def load_history():
-    """Load predictions from file"""
+    """Load one page of predictions from the store"""
 
     cfg = current_app.config['APP_CONFIG']
 
-    result = PredictionController.load_history(cfg)
+    result = PredictionController.load_history(cfg, request.args)
 
     # Error or warning
     if result.get("type") in ["error", "warning"]:
         flash(result["message"], result["type"])
     
+    response = result["response"]
+    filters = {k: v for k, v in request.args.items() if k not in ("cursor",) and v}
 
     return render_template(
         'predictions.html',
         show_sidebar=False,
-        predictions=result["response"].get("predictions", [])
-    )
+        predictions=response.get("predictions", []),
+        next_cursor=response.get("next_cursor"),
+        labels=response.get("labels", []),
+        filters=filters,
+        paged=bool(request.args.get("cursor"))
+    ), result.get("status_code") if result.get("type") == "error" else 200
 
 @prediction_bp.route('/scan', methods=['POST'])
+@model_required
 def scan_predictions():
-    """Scan predictions"""
-    lat = request.form.get('lat')
-    lon = request.form.get('lon')
+    """Scan an area: grid around lat/lon (rows x cols), radius_m or GeoJSON polygon"""
+    use_cache = not request.form.get('no_cache')
 
     model = current_app.model
     cfg = current_app.config["APP_CONFIG"]
 
-    result = PredictionController.scan_predictions(lat, lon, model, cfg)
+    result = PredictionController.scan_predictions(request.form, model, cfg, use_cache)
 
     if result.get("type") == "ajax":
         return _return_json(result.get("response", {}), result.get("status_code"))
@@ -117,6 +208,17 @@ def scan_predictions():
         summary_stats=summary_stats
     )
 
+@prediction_bp.route('/scan/stream', methods=['POST'])
+@model_required
+def stream_scan():
+    """Scan an area (same fields as /predict/scan), streaming each tile's result as it is ready"""
+    use_cache = not request.form.get('no_cache')
+
+    model = current_app.model
+    cfg = current_app.config["APP_CONFIG"]
+
+    return _event_stream_response(PredictionController.stream_scan(request.form, model, cfg, use_cache))
+
 @prediction_bp.route('/clear', methods=['POST'])
 def clear_history():
     """Clear all predictions from file"""
@@ -130,11 +232,10 @@ def clear_history():
 
 @prediction_bp.route('/download', methods=['GET'])
 def download_history():
-    """Download the predictions CSV file."""
+    """Stream the predictions as a CSV download."""
     cfg = current_app.config["APP_CONFIG"]
-    file_path = cfg.predictions_file
 
-    result = PredictionController.download_history(file_path)
+    result = PredictionController.download_history(cfg, request.args)
 
     if result.get("type") == "error":
         flash(result["message"], "error")
@@ -142,9 +243,8 @@ def download_history():
     
     args = result.get("response", {})
     
-    return send_file(
-        args["file_path"],
+    return Response(
+        stream_with_context(args["chunks"]),
         mimetype=args["mime_type"],
-        download_name=args["download_name"],
-        as_attachment=args["as_attachment"]
+        headers={"Content-Disposition": f"attachment; filename={args['download_name']}"}
     )
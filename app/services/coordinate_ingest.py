@@ -0,0 +1,147 @@
+import numpy as np
+
+from app.services.coordinate_store import get_coordinate_store
+
+LAT_CANDIDATES = ["latitude", "lat", "x", "y_lat", "latitude (deg)"]
+LON_CANDIDATES = ["longitude", "lon", "lng", "long", "y", "x_lon", "longitude (deg)"]
+
+
+def detect_latlon_columns(columns):
+    """Return (lat_col, lon_col) from normalized column names, None where not found."""
+    lat_col = next((c for c in columns if any(key in c for key in LAT_CANDIDATES)), None)
+    lon_col = next((c for c in columns if any(key in c for key in LON_CANDIDATES)), None)
+    return lat_col, lon_col
+
+
+class GridDeduper:
+    """
+    Duplicate filter with the coordinates_match rule (|dlat| and |dlon| both
+    below tolerance), using a grid hash with cells of tolerance degrees.
+
+    Two points in the same cell always match, so each cell holds at most one
+    accepted point and a new point only has to be compared against its own
+    cell and the 8 neighbouring ones: constant work per row instead of a scan
+    over everything accepted so far.
+    """
+
+    def __init__(self, tolerance=0.0001):
+        self.tolerance = tolerance
+        self._cells = {}
+
+    def __len__(self):
+        return len(self._cells)
+
+    def add(self, lats, lons):
+        """Register a chunk of points (numpy arrays), returns a bool mask of accepted ones."""
+        tol = self.tolerance
+        ci = np.floor(lats / tol).astype(np.int64).tolist()
+        cj = np.floor(lons / tol).astype(np.int64).tolist()
+
+        cells = self._cells
+        accepted = np.zeros(len(ci), dtype=bool)
+
+        for n, (lat, lon, i, j) in enumerate(zip(lats.tolist(), lons.tolist(), ci, cj)):
+            if (i, j) in cells:
+                continue
+
+            duplicate = False
+            for di in (-1, 0, 1):
+                for dj in (-1, 0, 1):
+                    other = cells.get((i + di, j + dj))
+                    if other is not None and abs(other[0] - lat) < tol and abs(other[1] - lon) < tol:
+                        duplicate = True
+                        break
+                if duplicate:
+                    break
+
+            if not duplicate:
+                cells[(i, j)] = (lat, lon)
+                accepted[n] = True
+
+        return accepted
+
+
+def ingest_coordinates_csv(file_obj, cfg, name=None):
+    """
+    Stream a coordinates CSV into a new server-side coordinate set.
+
+    The file is read cfg.upload_chunk_rows rows at a time; each chunk is
+    parsed and range checked with vectorized pandas/numpy operations, then
+    deduplicated with a GridDeduper and appended to the set. At most
+    cfg.upload_max_coordinates coordinates are kept.
+
+    Returns a dict with set_id, total, invalid, duplicates and truncated.
+    Raises ValueError when no latitude/longitude columns can be found.
+    """
+    import pandas as pd
+
+    store = get_coordinate_store(cfg)
+    deduper = GridDeduper(cfg.coordinate_tolerance)
+    limit = cfg.upload_max_coordinates
+
+    set_id = None
+    total = 0
+    invalid = 0
+    duplicates = 0
+    truncated = False
+
+    try:
+        reader = pd.read_csv(file_obj, chunksize=cfg.upload_chunk_rows, dtype=str)
+
+        lat_col = lon_col = None
+        for chunk in reader:
+            chunk.columns = chunk.columns.str.strip().str.lower()
+
+            if lat_col is None:
+                lat_col, lon_col = detect_latlon_columns(chunk.columns)
+                if not lat_col or not lon_col:
+                    raise ValueError(
+                        "CSV must contain recognizable latitude/longitude columns. "
+                        "Examples: latitude, lat, Latitude, LAT, lon, longitude"
+                    )
+                set_id = store.create_set(name)
+
+            lats = pd.to_numeric(chunk[lat_col], errors="coerce").to_numpy(dtype=np.float64)
+            lons = pd.to_numeric(chunk[lon_col], errors="coerce").to_numpy(dtype=np.float64)
+
+            valid = (
+                np.isfinite(lats) & np.isfinite(lons)
+                & (np.abs(lats) <= 90) & (np.abs(lons) <= 180)
+            )
+            invalid += int((~valid).sum())
+            lats = lats[valid]
+            lons = lons[valid]
+
+            accepted = deduper.add(lats, lons)
+            duplicates += int((~accepted).sum())
+            lats = lats[accepted]
+            lons = lons[accepted]
+
+            room = limit - total
+            if len(lats) > room:
+                lats = lats[:room]
+                lons = lons[:room]
+                truncated = True
+
+            total += store.add_many(set_id, total, lats.tolist(), lons.tolist())
+
+            if truncated:
+                break
+
+        if set_id is None:
+            raise ValueError("CSV file is empty.")
+
+        store.finish(set_id, total, invalid, duplicates)
+
+    except Exception:
+        if set_id is not None:
+            store.delete_set(set_id)
+        raise
+
+    return {
+        "set_id": set_id,
+        "total": total,
+        "invalid": invalid,
+        "duplicates": duplicates,
+        "truncated": truncated
+    }
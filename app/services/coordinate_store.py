@@ -0,0 +1,172 @@
+import os
+import uuid
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from app.services.prediction_store import now_timestamp
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS coordinate_sets (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    created TEXT NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    invalid INTEGER NOT NULL DEFAULT 0,
+    duplicates INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_coordinate_sets_created ON coordinate_sets (created);
+CREATE TABLE IF NOT EXISTS set_coordinates (
+    set_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    PRIMARY KEY (set_id, idx)
+) WITHOUT ROWID;
+"""
+
+
+class CoordinateStore:
+    """
+    Server-side coordinate sets (uploaded CSVs) in SQLite.
+
+    The session only keeps the set id, so a set can hold far more points
+    than fit in a cookie. Coordinates are kept in upload order and read
+    back in chunks. Sets whose session went away are removed by
+    delete_expired once they are older than cfg.coordinate_set_ttl.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def create_set(self, name=None):
+        set_id = uuid.uuid4().hex
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO coordinate_sets (id, name, created) VALUES (?, ?, ?)",
+                (set_id, name, now_timestamp())
+            )
+        return set_id
+
+    def add_many(self, set_id, start_idx, lats, lons):
+        """Append coordinates (parallel sequences) starting at position start_idx."""
+        rows = [(set_id, start_idx + i, lat, lon) for i, (lat, lon) in enumerate(zip(lats, lons))]
+        if not rows:
+            return 0
+
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT INTO set_coordinates (set_id, idx, latitude, longitude) VALUES (?, ?, ?, ?)",
+                rows
+            )
+        return len(rows)
+
+    def finish(self, set_id, total, invalid, duplicates):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "UPDATE coordinate_sets SET total = ?, invalid = ?, duplicates = ? WHERE id = ?",
+                (total, invalid, duplicates, set_id)
+            )
+
+    def get_set(self, set_id):
+        row = self._conn().execute(
+            "SELECT id, name, created, total, invalid, duplicates FROM coordinate_sets WHERE id = ?",
+            (set_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def head(self, set_id, limit):
+        rows = self._conn().execute(
+            "SELECT latitude, longitude FROM set_coordinates WHERE set_id = ? ORDER BY idx LIMIT ?",
+            (set_id, int(limit))
+        ).fetchall()
+        return [{"lat": row[0], "lon": row[1]} for row in rows]
+
+    def iter_coords(self, set_id, chunk_size=1000, start=0):
+        """Coordinates of a set as {"lat", "lon"} dicts, from position start on."""
+        last_idx = start - 1
+        conn = self._conn()
+        while True:
+            rows = conn.execute(
+                "SELECT idx, latitude, longitude FROM set_coordinates "
+                "WHERE set_id = ? AND idx > ? ORDER BY idx LIMIT ?",
+                (set_id, last_idx, chunk_size)
+            ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield {"lat": row[1], "lon": row[2]}
+            last_idx = rows[-1][0]
+
+    def delete_set(self, set_id):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM set_coordinates WHERE set_id = ?", (set_id,))
+            conn.execute("DELETE FROM coordinate_sets WHERE id = ?", (set_id,))
+
+    def delete_expired(self, max_age):
+        """Delete sets created more than max_age seconds ago; returns how many."""
+        cutoff = (datetime.now() - timedelta(seconds=max_age)).strftime('%Y-%m-%d %H:%M:%S')
+        expired = [row[0] for row in self._conn().execute(
+            "SELECT id FROM coordinate_sets WHERE created < ?", (cutoff,)
+        )]
+
+        for set_id in expired:
+            self.delete_set(set_id)
+        return len(expired)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_coordinate_store(cfg):
+    """Process-wide store for cfg.coordinates_db."""
+    store = _stores.get(cfg.coordinates_db)
+    if store is not None:
+        return store
+
+    with _stores_lock:
+        store = _stores.get(cfg.coordinates_db)
+        if store is None:
+            store = CoordinateStore(cfg.coordinates_db)
+            _stores[cfg.coordinates_db] = store
+
+    return store
+
+
+def expire_coordinate_sets(cfg):
+    """TTL sweep of uploaded sets (at startup and on every upload); errors are logged."""
+    try:
+        removed = get_coordinate_store(cfg).delete_expired(cfg.coordinate_set_ttl)
+    except Exception as e:
+        logging.error(f"Failed to expire coordinate sets: {str(e)}")
+        return 0
+
+    if removed:
+        logging.info(f"Deleted {removed} expired coordinate sets")
+    return removed
@@ -0,0 +1,100 @@
+import io
+import os
+import re
+import hashlib
+import logging
+
+from app.services.tile_cache import DiskCache
+
+IMAGE_ID_RE = re.compile(r"^[0-9a-f]{40}$")
+
+
+def encode_jpeg(image_np):
+    """Encode an image array as JPEG bytes (same encoding the UI always used)."""
+    from PIL import Image
+
+    pil_img = Image.fromarray(image_np.astype('uint8'))
+    buffered = io.BytesIO()
+    pil_img.save(buffered, format="JPEG")
+    return buffered.getvalue()
+
+
+class ImageCache(DiskCache):
+    """
+    Encoded prediction images, addressed by the SHA-1 of their JPEG bytes.
+
+    Images are encoded once when a prediction is made and served from here
+    by id; since ids are content hashes, a cached response never changes.
+    Thumbnails are derived from the full image on first request and cached
+    next to it.
+    """
+
+    SUFFIX = ".jpg"
+
+    @staticmethod
+    def _key(image_id, size=None):
+        name = image_id if size is None else f"{image_id}_{size}"
+        return image_id[:2], name
+
+    def put_image(self, image_np):
+        """Encode and store an image, returns its id."""
+        data = encode_jpeg(image_np)
+        image_id = hashlib.sha1(data).hexdigest()
+        self.put(self._key(image_id), data)
+        return image_id
+
+    def has_image(self, image_id):
+        """Whether the full image for an id is still cached (LRU eviction removes old ones)."""
+        return os.path.exists(self._path(self._key(image_id)))
+
+    def get_image(self, image_id, size=None):
+        """JPEG bytes for an id (thumbnail no larger than size x size if given), or None."""
+        if size is None:
+            return self.get(self._key(image_id))
+
+        data = self.get(self._key(image_id, size))
+        if data is not None:
+            return data
+
+        full = self.get(self._key(image_id))
+        if full is None:
+            return None
+
+        try:
+            data = self._thumbnail(full, size)
+        except Exception as e:
+            logging.error(f"Thumbnail error for {image_id}: {str(e)}")
+            return None
+
+        self.put(self._key(image_id, size), data)
+        return data
+
+    @staticmethod
+    def _thumbnail(data, size):
+        from PIL import Image
+
+        img = Image.open(io.BytesIO(data))
+        img.thumbnail((size, size))
+        buffered = io.BytesIO()
+        img.save(buffered, format="JPEG")
+        return buffered.getvalue()
+
+
+_image_cache = None
+
+
+def configure_image_cache(cfg):
+    """Create the process-wide image cache from Config."""
+    global _image_cache
+
+    try:
+        _image_cache = ImageCache(cfg.image_cache_dir, cfg.image_cache_max_bytes)
+    except OSError as e:
+        logging.error(f"Image cache disabled, cannot use {cfg.image_cache_dir}: {e}")
+        _image_cache = None
+
+    return _image_cache
+
+
+def get_image_cache():
+    return _image_cache
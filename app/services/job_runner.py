@@ -0,0 +1,261 @@
+import os
+import time
+import atexit
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from app.services.job_store import get_job_store, COMPLETED, FAILED, CANCELLED
+
+# Set in each pool process by _init_worker
+_worker_model = None
+_worker_error = None
+
+
+def _init_worker(cfg):
+    """Process pool initializer: set up the fetch layer and load the model once per process."""
+    global _worker_model, _worker_error
+
+    from app.services.tile_cache import configure_tile_cache
+    from app.services.tile_fetcher import configure_tile_fetcher
+    from app.services.tile_providers import configure_tile_provider
+    from app.services.rate_limiter import configure_rate_limits
+    from app.services.result_cache import configure_result_cache
+    from app.services.image_cache import configure_image_cache
+    from app.services.metrics import configure_metrics
+
+    configure_metrics(cfg)
+    configure_tile_cache(cfg)
+    configure_tile_fetcher(cfg)
+    configure_tile_provider(cfg)
+    configure_rate_limits(cfg)
+    configure_result_cache(cfg)
+    configure_image_cache(cfg)
+
+    try:
+        from ml.loader import load_model
+        _worker_model = load_model(cfg)
+        if _worker_model is None:
+            _worker_error = "Model could not be loaded."
+    except Exception as e:
+        logging.error(f"Job worker model load error: {str(e)}")
+        _worker_error = str(e)
+
+
+def _job_results(job, cfg):
+    """
+    (results, hierarchical) for a job: the streaming prediction results and,
+    for coarse-to-fine scans, the HierarchicalScan (else None). Images are only
+    encoded for the first results shown on the job page.
+    """
+    from app.services.prediction_service import iter_prediction_batch, iter_scan
+    from app.services.coordinate_store import get_coordinate_store
+    from app.services.scan_planner import plan_scan
+    from app.services.raster_source import plan_raster
+
+    params = job["params"]
+    use_cache = params.get("use_cache", True)
+
+    if job["kind"] == "scan":
+        return iter_scan(_worker_model, plan_scan(params["area"], cfg), cfg, use_cache, cfg.job_image_limit)
+
+    if job["kind"] == "raster":
+        # Windows are read from the memory-mapped raster as the pipeline reaches them
+        plan = plan_raster(params["raster"], cfg)
+        return iter_prediction_batch(
+            _worker_model, plan, cfg, images=plan.images, use_cache=False,
+            image_limit=cfg.job_image_limit, cache_results=False
+        ), None
+
+    if job["kind"] == "set":
+        coords = get_coordinate_store(cfg).iter_coords(params["set_id"])
+    else:
+        coords = params["coords"]
+
+    return iter_prediction_batch(_worker_model, coords, cfg, use_cache=use_cache, image_limit=cfg.job_image_limit), None
+
+
+def run_job(job_id, cfg):
+    """
+    Execute one job inside a pool process.
+
+    Results are written to the job store in groups (every
+    cfg.job_progress_every results or once a second) together with the
+    progress count; the cancel flag is checked after each group.
+    """
+    from app.services.prediction_service import ScanStats
+    from app.services.metrics import set_route
+
+    store = get_job_store(cfg)
+    job = store.get(job_id)
+
+    if job is None or not store.mark_running(job_id):
+        return
+
+    if _worker_model is None:
+        store.finish(job_id, FAILED, error=_worker_error or "Model is not loaded.")
+        return
+
+    # Stage timers in this pool process are labelled job:<kind>
+    set_route(f"job:{job['kind']}")
+
+    stats = ScanStats()
+    pending = []
+    done = 0
+    cancelled = False
+    last_write = time.monotonic()
+    hierarchical = None
+    progress = 0
+
+    def write():
+        nonlocal done, pending, last_write, progress
+        # Tiles ruled out by a screening pass count towards progress too
+        skipped = hierarchical.skipped if hierarchical is not None else 0
+        if pending or done + skipped != progress:
+            progress = done + len(pending) + skipped
+            store.add_results(job_id, done, pending, progress)
+            done += len(pending)
+            pending = []
+        last_write = time.monotonic()
+
+    try:
+        results, hierarchical = _job_results(job, cfg)
+
+        try:
+            for result in results:
+                pending.append(result)
+                stats.add(result)
+
+                if len(pending) >= cfg.job_progress_every or time.monotonic() - last_write >= 1.0:
+                    write()
+                    if store.is_cancel_requested(job_id):
+                        cancelled = True
+                        break
+        finally:
+            # Stops the pipeline threads when the job is cancelled
+            results.close()
+
+        write()
+        store.finish(job_id, CANCELLED if cancelled else COMPLETED, stats.summary(hierarchical))
+
+    except Exception as e:
+        logging.error(f"Job {job_id} failed: {str(e)}", exc_info=True)
+        try:
+            write()
+        except Exception:
+            pass
+        store.finish(job_id, FAILED, stats.summary(hierarchical), error=str(e))
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_futures = {}
+
+
+def _get_executor(cfg):
+    """Process pool, created on first use (spawned processes import the app and load the model)."""
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=cfg.job_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(cfg,)
+            )
+        return _executor
+
+
+def _drop_executor(broken):
+    """Forget a broken pool so the next submit starts a fresh one."""
+    global _executor
+
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+            broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _on_job_done(job_id, cfg, executor, future):
+    _futures.pop(job_id, None)
+
+    if future.cancelled():
+        return
+
+    error = future.exception()
+    if error is not None:
+        # e.g. the pool process died; run_job itself never raises
+        logging.error(f"Job {job_id} crashed: {str(error)}")
+        get_job_store(cfg).finish(job_id, FAILED, error=f"Job worker crashed: {str(error) or type(error).__name__}")
+
+        if isinstance(error, BrokenProcessPool):
+            _drop_executor(executor)
+
+
+def submit_job(cfg, kind, params, total=0):
+    """Persist a new job and queue it on the local process pool. Returns the job id."""
+    store = get_job_store(cfg)
+    job_id = store.create(kind, params, total)
+
+    try:
+        executor = _get_executor(cfg)
+        try:
+            future = executor.submit(run_job, job_id, cfg)
+        except BrokenProcessPool:
+            # A pool process died (OOM, crash in torch): replace the pool once
+            logging.warning("Job pool is broken, starting a new one")
+            _drop_executor(executor)
+            executor = _get_executor(cfg)
+            future = executor.submit(run_job, job_id, cfg)
+    except Exception as e:
+        store.finish(job_id, FAILED, error=str(e))
+        raise
+
+    _futures[job_id] = future
+    future.add_done_callback(lambda f: _on_job_done(job_id, cfg, executor, f))
+
+    return job_id
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def recover_interrupted_jobs(cfg):
+    """
+    Fail jobs left queued/running by a web process that no longer exists
+    (its pool died with it), so clients polling them see a final state.
+    """
+    try:
+        failed = get_job_store(cfg).fail_orphaned(_pid_alive, "Interrupted: the server restarted before the job finished.")
+    except Exception as e:
+        logging.error(f"Failed to recover interrupted jobs: {str(e)}")
+        return []
+
+    if failed:
+        logging.warning(f"Marked {len(failed)} interrupted job(s) as failed")
+    return failed
+
+
+def cancel_job(cfg, job_id):
+    """Request cancellation; a job that has not started yet never runs."""
+    get_job_store(cfg).request_cancel(job_id)
+
+    future = _futures.get(job_id)
+    if future is not None:
+        future.cancel()
+
+
+@atexit.register
+def _shutdown_executor():
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,217 @@
+import os
+import json
+import uuid
+import sqlite3
+import threading
+
+from app.services.prediction_store import now_timestamp
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    params TEXT,
+    owner INTEGER,
+    total INTEGER NOT NULL DEFAULT 0,
+    done INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    summary TEXT,
+    error TEXT,
+    created TEXT NOT NULL,
+    started TEXT,
+    finished TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs (created);
+CREATE TABLE IF NOT EXISTS job_results (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    latitude REAL,
+    longitude REAL,
+    label TEXT,
+    confidence REAL,
+    image_id TEXT,
+    PRIMARY KEY (job_id, idx)
+) WITHOUT ROWID;
+"""
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+
+class JobStore:
+    """
+    Background job state in SQLite: status, progress, partial results.
+
+    Web workers create jobs and read their progress; job processes write
+    progress and results. Every process opens its own connections, so the
+    database is the only thing they share.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def create(self, kind, params, total=0, owner=None):
+        """New queued job. owner: pid of the process whose pool runs it (default this one)."""
+        job_id = uuid.uuid4().hex
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, params, owner, total, created) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, json.dumps(params), owner or os.getpid(), int(total), now_timestamp())
+            )
+        return job_id
+
+    def get(self, job_id):
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+
+        job = dict(row)
+        job["params"] = json.loads(job["params"]) if job["params"] else {}
+        job["summary"] = json.loads(job["summary"]) if job["summary"] else None
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        job["progress"] = round(job["done"] / job["total"] * 100, 1) if job["total"] else 0.0
+        return job
+
+    def recent(self, limit=20):
+        rows = self._conn().execute(
+            "SELECT id, kind, status, total, done, created, finished FROM jobs ORDER BY created DESC LIMIT ?",
+            (int(limit),)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def mark_running(self, job_id, total=None):
+        """Move a queued job to running. Returns False if it was cancelled meanwhile."""
+        conn = self._conn()
+        with conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = ?, started = ?, total = COALESCE(?, total) "
+                "WHERE id = ? AND status = ? AND cancel_requested = 0",
+                (RUNNING, now_timestamp(), total, job_id, QUEUED)
+            )
+        return cur.rowcount == 1
+
+    def add_results(self, job_id, start_idx, results, done):
+        """Store a group of results and the new progress count in one transaction."""
+        rows = [
+            (job_id, start_idx + i, r.get("lat"), r.get("lon"), r.get("label"), r.get("confidence"), r.get("image_id"))
+            for i, r in enumerate(results)
+        ]
+
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO job_results (job_id, idx, latitude, longitude, label, confidence, image_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.execute("UPDATE jobs SET done = ? WHERE id = ?", (done, job_id))
+
+    def finish(self, job_id, status, summary=None, error=None):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, summary = ?, error = ?, finished = ? WHERE id = ?",
+                (status, json.dumps(summary) if summary is not None else None, error, now_timestamp(), job_id)
+            )
+
+    def fail_orphaned(self, is_alive, error):
+        """
+        Fail queued/running jobs whose owning process is gone (is_alive(pid) is
+        False), e.g. after a restart. Jobs of live processes are left alone.
+        Returns the ids that were failed.
+        """
+        conn = self._conn()
+        rows = conn.execute(
+            "SELECT id, owner FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+        ).fetchall()
+
+        orphaned = [row["id"] for row in rows if row["owner"] is None or not is_alive(row["owner"])]
+        if orphaned:
+            with conn:
+                conn.executemany(
+                    "UPDATE jobs SET status = ?, error = ?, finished = ? WHERE id = ? AND status IN (?, ?)",
+                    [(FAILED, error, now_timestamp(), job_id, QUEUED, RUNNING) for job_id in orphaned]
+                )
+        return orphaned
+
+    def request_cancel(self, job_id):
+        """Flag a job for cancellation; a queued job is cancelled right away."""
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status IN (?, ?)",
+                (job_id, QUEUED, RUNNING)
+            )
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished = ? WHERE id = ? AND status = ?",
+                (CANCELLED, now_timestamp(), job_id, QUEUED)
+            )
+
+    def is_cancel_requested(self, job_id):
+        row = self._conn().execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def results_page(self, job_id, after=-1, limit=50):
+        """
+        Results with idx > after, in input order.
+        Returns (rows, next_after); next_after is None when no more rows are stored yet.
+        """
+        limit = int(limit)
+        rows = self._conn().execute(
+            "SELECT idx, latitude AS lat, longitude AS lon, label, confidence, image_id "
+            "FROM job_results WHERE job_id = ? AND idx > ? ORDER BY idx LIMIT ?",
+            (job_id, int(after), limit + 1)
+        ).fetchall()
+
+        rows = [dict(row) for row in rows]
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return rows, rows[-1]["idx"]
+
+        return rows, None
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_job_store(cfg):
+    """Process-wide store for cfg.jobs_db."""
+    store = _stores.get(cfg.jobs_db)
+    if store is not None:
+        return store
+
+    with _stores_lock:
+        store = _stores.get(cfg.jobs_db)
+        if store is None:
+            store = JobStore(cfg.jobs_db)
+            _stores[cfg.jobs_db] = store
+
+    return store
@@ -0,0 +1,193 @@
+import time
+import bisect
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STAGES = ("fetch", "decode", "stitch", "preprocess", "forward", "encode", "enqueue", "persist")
+
+# Route the current work belongs to (the Flask url rule, job:<kind>, or the name of a
+# background writer). Work handed to other threads keeps it through in_context().
+_route = contextvars.ContextVar("metrics_route", default="none")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram per label set, rendered in the Prometheus
+    text exposition format. Observations only take a lock and bump a few
+    integers, so it is cheap enough for per-tile timers.
+    """
+
+    def __init__(self, name, documentation, labelnames, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        # Bucket i counts observations <= buckets[i]; cumulated when rendered
+        index = bisect.bisect_left(self.buckets, value)
+
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        with self._lock:
+            series = {labels: ([*counts], total, count) for labels, (counts, total, count) in self._series.items()}
+
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+
+        for labelvalues in sorted(series):
+            counts, total, count = series[labelvalues]
+            labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labelvalues))
+
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{labels},le="{_format_bound(bound)}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total!r}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "vikas_stage_duration_seconds",
+    "Time spent in one call of a prediction hot-path stage.",
+    ("stage", "route", "batch_size")
+)
+
+REQUEST_SECONDS = Histogram(
+    "vikas_request_duration_seconds",
+    "HTTP request latency until the response is returned (streamed bodies excluded).",
+    ("route", "method", "status")
+)
+
+_histograms = [STAGE_SECONDS, REQUEST_SECONDS]
+_enabled = True
+
+
+def configure_metrics(cfg):
+    """Enable/disable the timers and apply the configured buckets (clears recorded data)."""
+    global _enabled
+
+    _enabled = cfg.metrics_enabled
+    for histogram in _histograms:
+        histogram.buckets = tuple(sorted(cfg.metrics_buckets)) + (float("inf"),)
+        histogram.reset()
+
+
+def metrics_enabled():
+    return _enabled
+
+
+def batch_label(size):
+    """Batch size rounded up to a power of two (keeps the label set small)."""
+    return str(1 << max(0, int(size) - 1).bit_length())
+
+
+@contextmanager
+def route_label(route):
+    """Attribute the stages timed inside the block to route."""
+    token = _route.set(route)
+    try:
+        yield
+    finally:
+        _route.reset(token)
+
+
+def set_route(route):
+    """Set the route label for the rest of the current context; returns a reset token."""
+    return _route.set(route)
+
+
+def reset_route(token):
+    _route.reset(token)
+
+
+def current_route():
+    return _route.get()
+
+
+def in_context(fn):
+    """
+    fn bound to a copy of the caller's context (route label included), for
+    Thread targets and executor tasks. Call the result once per copy: a
+    context cannot be entered by two threads at the same time.
+    """
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+def iter_in_context(iterable):
+    """
+    Iterate iterable with every step run in a copy of the caller's context.
+    For streamed response bodies, which are consumed after the request
+    handler (and its route label) has returned.
+    """
+    ctx = contextvars.copy_context()
+    iterator = iter(iterable)
+
+    def steps():
+        try:
+            while True:
+                try:
+                    item = ctx.run(next, iterator)
+                except StopIteration:
+                    return
+                yield item
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                ctx.run(close)
+
+    return steps()
+
+
+@contextmanager
+def stage(name, batch_size=1):
+    """Time the block as one call of a hot-path stage (see STAGES)."""
+    if not _enabled:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, name, _route.get(), batch_label(batch_size))
+
+
+def observe_request(route, method, status, seconds):
+    if _enabled:
+        REQUEST_SECONDS.observe(seconds, route, method, str(status))
+
+
+def render_metrics():
+    """All histograms in the Prometheus text format (version 0.0.4)."""
+    lines = []
+    for histogram in _histograms:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,113 @@
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+from app.services.metrics import current_route, route_label
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-image predictions into batched forward passes.
+
+    Callers hand in one image and block on their own Future. A dispatcher
+    thread takes the first waiting image, keeps collecting until max_batch
+    images are queued or max_wait_ms has passed since that first one, runs
+    them through predict_images as one batch and resolves each Future with
+    its own (label, confidence).
+    """
+
+    def __init__(self, model, max_batch=16, max_wait_ms=5):
+        self.model = model
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+
+        self.batches = 0
+        self.images = 0
+        self.max_seen = 0
+
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, img_np, threshold=0.49):
+        future = Future()
+        self._queue.put((img_np, threshold, future, current_route()))
+        return future
+
+    def predict(self, img_np, threshold=0.49):
+        return self.submit(img_np, threshold).result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+
+        return batch
+
+    def _run(self):
+        from app.services.prediction_service import predict_images
+
+        while True:
+            batch = self._collect()
+
+            # Requests normally share the default threshold; run one pass per distinct value
+            by_threshold = {}
+            for item in batch:
+                by_threshold.setdefault(item[1], []).append(item)
+
+            for threshold, items in by_threshold.items():
+                try:
+                    # A shared pass is timed under the route of its first request
+                    with route_label(items[0][3]):
+                        results = predict_images([img for img, _, _, _ in items], self.model, threshold, batch_size=self.max_batch)
+                except Exception as e:
+                    logging.error(f"Micro-batch prediction error: {str(e)}")
+                    results = [("Error", 0.0)] * len(items)
+
+                for (_, _, future, _), result in zip(items, results):
+                    future.set_result(result)
+
+            with self._lock:
+                self.batches += 1
+                self.images += len(batch)
+                self.max_seen = max(self.max_seen, len(batch))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "images": self.images,
+                "avg_batch": round(self.images / self.batches, 2) if self.batches else 0.0,
+                "max_batch": self.max_seen,
+                "queue_depth": self._queue.qsize(),
+            }
+
+
+_batcher_lock = threading.Lock()
+
+
+def get_micro_batcher(model):
+    """Return the micro-batcher cached on a loaded model, building it on first use."""
+    batcher = getattr(model, "micro_batcher", None)
+    if batcher is not None:
+        return batcher
+
+    with _batcher_lock:
+        batcher = getattr(model, "micro_batcher", None)
+        if batcher is None:
+            cfg = model.cfg
+            batcher = MicroBatcher(model, cfg.micro_batch_max_size, cfg.micro_batch_max_wait_ms)
+            model.micro_batcher = batcher
+
+    return batcher
@@ -0,0 +1,93 @@
+import time
+import logging
+import threading
+
+
+class ModelState:
+    """Tracks the model lifecycle: loading -> warming -> ready | failed."""
+
+    LOADING = "loading"
+    WARMING = "warming"
+    READY = "ready"
+    FAILED = "failed"
+
+    def __init__(self):
+        self.status = self.LOADING
+        self.error = None
+        self.started_at = time.time()
+        self.ready_at = None
+        self._ready = threading.Event()
+
+    @property
+    def is_ready(self):
+        return self._ready.is_set()
+
+    def wait(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def mark_ready(self):
+        self.status = self.READY
+        self.ready_at = time.time()
+        self._ready.set()
+
+    def mark_failed(self, error):
+        self.status = self.FAILED
+        self.error = error
+
+    def to_dict(self):
+        info = {"status": self.status}
+        if self.error:
+            info["error"] = self.error
+        if self.ready_at is not None:
+            info["load_seconds"] = round(self.ready_at - self.started_at, 3)
+        return info
+
+
+def warm_up(model, cfg):
+    """Run one dummy batch so first-request latency excludes lazy init (allocator, kernels)."""
+    import numpy as np
+    from app.services.prediction_service import predict_images
+
+    h, w = cfg.image_size
+    predict_images([np.zeros((h, w, 3), dtype=np.uint8)], model)
+
+
+def load_model_into(app, cfg):
+    """Load + warm the model and publish it on app.model. Safe to run on a thread."""
+    state = app.model_state
+
+    try:
+        # Heavy ML imports (torch, timm, ...) happen here, not at app import time
+        from ml.loader import load_model
+
+        model = load_model(cfg)
+        if model is None:
+            state.mark_failed("Model could not be loaded.")
+            app.logger.error("Error: Model could not be loaded.")
+            return
+
+        if cfg.model_warmup:
+            state.status = ModelState.WARMING
+            warm_up(model, cfg)
+
+        app.model = model
+        state.mark_ready()
+        app.logger.info(f"Model ready in {state.ready_at - state.started_at:.2f}s")
+
+    except Exception as e:
+        logging.error(f"Model load error: {str(e)}", exc_info=True)
+        state.mark_failed(str(e))
+
+
+def start_model_loading(app, cfg):
+    """Load the model in the background (default) or inline, per Config."""
+    app.model = None
+    app.model_state = ModelState()
+
+    if not cfg.model_background_load:
+        load_model_into(app, cfg)
+        return None
+
+    thread = threading.Thread(target=load_model_into, args=(app, cfg), name="model-loader", daemon=True)
+    thread.start()
+    return thread
@@ -1,28 +1,60 @@
-import io
-import os
-import time
 import base64
+import functools
+import queue
+from collections import deque
 import logging
-from datetime import datetime
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 
-import cv2
-import torch
 import numpy as np
-import pandas as pd
-from PIL import Image
-from torchvision import transforms
 
-from app.services.satellite_img_service import get_image
+from app.services.satellite_img_service import MODEL_WINDOW, get_image, get_images_mosaic
 from app.utils.helper import validate_latlon
+from app.services.prediction_store import get_prediction_store, make_record
+from app.services.prediction_writer import get_prediction_writer
+from app.services.result_cache import get_result_cache
+from app.services.micro_batcher import get_micro_batcher
+from app.services.image_cache import encode_jpeg, get_image_cache
+from app.services.scan_planner import ScanPlan
+from app.services.metrics import stage, in_context
+
+# Labels of a failed inference ("Error") or a missing tile ("N/A")
+FAILED_LABELS = ("Error", "N/A")
+# Failures are transient: caching them would keep serving the failure for the whole TTL
+UNCACHEABLE_LABELS = FAILED_LABELS
 
 
 def image_to_base64(image_np):
     """Converts image to base64 string"""
-    pil_img = Image.fromarray(image_np.astype('uint8'))
-    buffered = io.BytesIO()
-    pil_img.save(buffered, format="JPEG")
+    with stage("encode"):
+        return base64.b64encode(encode_jpeg(image_np)).decode('utf-8')
+
+
+def store_image(image_np):
+    """Encode an image once into the image cache; returns its id (served at /images/<id>)."""
+    cache = get_image_cache()
+    if cache is None:
+        return None
+
+    try:
+        with stage("encode"):
+            return cache.put_image(image_np)
+    except Exception as e:
+        logging.error(f"Failed to store image: {str(e)}")
+        return None
+
+
+def lookup_cached_result(cache, lat, lon):
+    """Result cache entry for lat/lon (or None); an image the image cache has
+    since evicted comes back as image_id None instead of an id that 404s."""
+    cached = cache.get(lat, lon)
+
+    if cached is not None and cached.get("image_id"):
+        image_cache = get_image_cache()
+        if image_cache is None or not image_cache.has_image(cached["image_id"]):
+            cached["image_id"] = None
 
-    return base64.b64encode(buffered.getvalue()).decode('utf-8')
+    return cached
 
 
 def fetch_satellite_image(lat, lon, cfg):
@@ -35,12 +67,44 @@ def fetch_satellite_image(lat, lon, cfg):
     
     return image
 
-def run_prediction(model, lat, lon, cfg):
+
+def fetch_screen_image(lat, lon, cfg, extent):
+    """Screening image of a coarse cell: extent is its (half_lat, half_lon) in degrees
+    (see HierarchicalScan.screen_extent), fetched scan_screen_levels zoom levels lower."""
+    image = get_image(lat, lon, cfg.zoom_level - cfg.scan_screen_levels, extent=extent)
+
+    if image is None or not isinstance(image, np.ndarray):
+        return None
+
+    return image
+
+
+def fetch_scan_images(coords, cfg):
+    """Fetch images for a scan grid from one shared tile mosaic.
+    Returns a list aligned with coords (None entries if the fetch failed)."""
+    centers = [(c.get("lat"), c.get("lon")) for c in coords]
+
+    images = get_images_mosaic(centers, cfg.zoom_level)
+    if images is None:
+        return [None] * len(coords)
+
+    return images
+
+def run_prediction(model, lat, lon, cfg, use_cache=True):
     """
     Fetch image → predict → save prediction → return data.
+    A recent result for (nearly) the same coordinates is returned from the
+    result cache instead; use_cache=False forces a fresh prediction.
     Returns:
-        image_base64, label, confidence
+        image_id, label, confidence (all None if the image could not be fetched)
     """
+    cache = get_result_cache()
+
+    # 0. Reuse a recent nearby prediction
+    if cache is not None and use_cache:
+        cached = lookup_cached_result(cache, lat, lon)
+        if cached is not None:
+            return cached["image_id"], cached["label"], cached["confidence"]
 
     # 1. Fetch image
     image = fetch_satellite_image(lat, lon, cfg)
@@ -52,172 +116,551 @@ def run_prediction(model, lat, lon, cfg):
     # predict_image(image, model) -> (label, confidence)
     label, confidence = predict_image(image, model)
 
-    # 3. save prediction to CSV (append)
+    # 3. save prediction to the history store
     try:
-        save_prediction(lat, lon, label, confidence, cfg.predictions_file)
+        save_prediction(lat, lon, label, confidence, cfg)
     except Exception as e:
-        logging.error(f"Failed to save prediction CSV: {str(e)}")
+        logging.error(f"Failed to save prediction: {str(e)}")
 
-    # 4. encode image for UI
-    image_base64 = image_to_base64(image)
+    # 4. encode image once for the UI (served by id from the image cache)
+    image_id = store_image(image)
 
+    if cache is not None and label not in UNCACHEABLE_LABELS:
+        cache.put(lat, lon, {"label": label, "confidence": confidence, "image_id": image_id})
 
-    return image_base64, label, confidence
+    return image_id, label, confidence
 
 
-def run_prediction_batch(model, coords, cfg, sleep_seconds):
+def run_prediction_batch(model, coords, cfg, images=None, use_cache=True, image_limit=None):
     """
     Run predictions for list of coords -> returns dict with results.
-    coords: list of [lat, lon]
+    coords: list (or any iterable) of {"lat", "lon"}
+    images: optional list of already fetched images aligned with coords
+            (e.g. from fetch_scan_images); skips the per-coordinate fetch.
+    use_cache: reuse recent nearby results from the result cache.
+    image_limit: only the first image_limit results get an image_id (None = all).
     """
 
-    results = []
-    for c in coords:
-        lat = c.get("lat")
-        lon = c.get("lon")
+    results = list(iter_prediction_batch(model, coords, cfg, images, use_cache, image_limit))
 
-        img_b64, label, confidence = run_prediction(model, lat, lon, cfg)
+    return {
+        "predictions": results
+    }
 
-        if img_b64 is None:
-            label = "N/A"
-            confidence = 0.0
-        
-        results.append({
-            "lat": lat,
-            "lon": lon,
-            "label": label,
-            "confidence": confidence,
-            "image_base64": img_b64
-        })
 
-        if sleep_seconds > 0:
-            time.sleep(sleep_seconds)
+_STAGE_DONE = object()
 
 
-    return {
-        "predictions": results
-    }
+class _StageError:
+    def __init__(self, exc):
+        self.exc = exc
+
+
+def _stage_put(q, item, stop):
+    """Blocking put on a bounded queue that gives up once the pipeline is stopped."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _stage_get(q, stop):
+    while True:
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            if stop.is_set():
+                return _STAGE_DONE
+
+
+def iter_prediction_batch(model, coords, cfg, images=None, use_cache=True, image_limit=None, fetch=None, persist=True,
+                          cache_results=True, cached=None):
+    """
+    Streaming fetch -> infer -> persist pipeline. Yields one result dict per
+    coordinate, in input order, as soon as it is ready. coords may be a lazy
+    iterable (e.g. CoordinateStore.iter_coords); it is consumed as the fetch
+    stage advances.
+
+    Stages run on their own threads and are connected by bounded queues:
+        fetch   : up to cfg.pipeline_prefetch images in flight ahead of inference
+        infer   : takes whatever fetched images are ready (up to
+                  cfg.inference_batch_size) and runs them as one batch
+        persist : saves the prediction and encodes the image for the UI
+                  (only for the first image_limit results, if given)
+    so tile downloads for coordinate N+1..N+k overlap with inference and
+    persistence for coordinate N. Request pacing is left to the per-provider
+    rate limiter in the tile fetch layer. Coordinates with a recent result
+    in the result cache skip the fetch and inference stages.
+
+    fetch: optional fetch(lat, lon, cfg) -> image replacing fetch_satellite_image.
+    persist: False skips the history store and the result cache (used for
+             screening passes whose results are not real z18 predictions).
+    cache_results: False keeps results out of the result cache but still saves
+                   them (e.g. windows of a local raster, not satellite tiles).
+    images may be any sequence indexable by position, read lazily as the
+    fetch stage reaches each coordinate (e.g. RasterPlan.images).
+    cached: optional list aligned with coords of result cache entries already
+            looked up (None = miss), e.g. from scan_inputs; replaces the
+            per-coordinate lookup.
+    """
+    cache = get_result_cache()
+
+    stop = threading.Event()
+    prefetch = max(1, cfg.pipeline_prefetch)
+    fetch_q = queue.Queue(maxsize=prefetch)
+    persist_q = queue.Queue(maxsize=cfg.pipeline_queue_size)
+    out_q = queue.Queue(maxsize=cfg.pipeline_queue_size)
+    fetch_pool = ThreadPoolExecutor(max_workers=cfg.pipeline_fetch_workers, thread_name_prefix="pipeline-fetch")
+
+    def fetch_stage():
+        try:
+            for i, c in enumerate(coords):
+                if stop.is_set():
+                    return
+                lat = c.get("lat")
+                lon = c.get("lon")
+
+                if cached is not None:
+                    hit = cached[i]
+                elif cache is not None and use_cache and persist:
+                    hit = lookup_cached_result(cache, lat, lon)
+                else:
+                    hit = None
+
+                if hit is not None or images is not None:
+                    future = Future()
+                    future.set_result(None if hit is not None else images[i])
+                else:
+                    future = fetch_pool.submit(in_context(fetch or fetch_satellite_image), lat, lon, cfg)
+
+                if not _stage_put(fetch_q, (lat, lon, future, hit), stop):
+                    return
+        except Exception as e:
+            _stage_put(fetch_q, _StageError(e), stop)
+            return
+
+        _stage_put(fetch_q, _STAGE_DONE, stop)
+
+    def infer_stage():
+        carry = None
+        try:
+            while True:
+                item = carry if carry is not None else _stage_get(fetch_q, stop)
+                carry = None
+                if item is _STAGE_DONE or isinstance(item, _StageError):
+                    _stage_put(persist_q, item, stop)
+                    return
+
+                # Block for the next image in order, then sweep up any that are already fetched
+                batch = [item]
+                while len(batch) < cfg.inference_batch_size:
+                    try:
+                        nxt = fetch_q.get_nowait()
+                    except queue.Empty:
+                        break
+                    if not isinstance(nxt, tuple) or not nxt[2].done():
+                        carry = nxt
+                        break
+                    batch.append(nxt)
+
+                fetched = [(lat, lon, future.result(), cached) for lat, lon, future, cached in batch]
+                ready = [image for _, _, image, _ in fetched if image is not None]
+                outputs = iter(predict_images(ready, model, batch_size=cfg.inference_batch_size))
+
+                for lat, lon, image, cached in fetched:
+                    if cached is not None:
+                        label, confidence = cached["label"], cached["confidence"]
+                    else:
+                        label, confidence = next(outputs) if image is not None else ("N/A", 0.0)
+                    if not _stage_put(persist_q, (lat, lon, image, label, confidence, cached), stop):
+                        return
+        except Exception as e:
+            _stage_put(persist_q, _StageError(e), stop)
+
+    def flush(pending):
+        if not pending:
+            return
+        try:
+            save_predictions(pending, cfg)
+        except Exception as e:
+            logging.error(f"Failed to save predictions: {str(e)}")
+        pending.clear()
+
+    def persist_stage():
+        # Records are grouped into one insert per burst of ready results
+        pending = []
+        emitted = 0
+        try:
+            while True:
+                item = _stage_get(persist_q, stop)
+                if item is _STAGE_DONE or isinstance(item, _StageError):
+                    flush(pending)
+                    _stage_put(out_q, item, stop)
+                    return
+
+                lat, lon, image, label, confidence, cached = item
+                if cached is not None:
+                    result = {
+                        "lat": lat,
+                        "lon": lon,
+                        "label": label,
+                        "confidence": confidence,
+                        "image_id": cached["image_id"]
+                    }
+                elif image is None:
+                    result = {
+                        "lat": lat,
+                        "lon": lon,
+                        "label": label,
+                        "confidence": confidence,
+                        "image_id": None
+                    }
+                else:
+                    if persist:
+                        pending.append(make_record(lat, lon, label, confidence))
+                    keep_image = image_limit is None or emitted < image_limit
+
+                    result = {
+                        "lat": lat,
+                        "lon": lon,
+                        "label": label,
+                        "confidence": confidence,
+                        "image_id": store_image(image) if keep_image else None
+                    }
+
+                    if cache is not None and persist and cache_results and result["image_id"] is not None \
+                            and label not in UNCACHEABLE_LABELS:
+                        cache.put(lat, lon, result)
+
+                if persist_q.empty():
+                    flush(pending)
+
+                emitted += 1
+                if not _stage_put(out_q, result, stop):
+                    return
+        except Exception as e:
+            flush(pending)
+            _stage_put(out_q, _StageError(e), stop)
+
+    # Stage threads keep the caller's route label for the stage timers
+    threads = [
+        threading.Thread(target=in_context(fetch_stage), name="pipeline-fetch-feeder", daemon=True),
+        threading.Thread(target=in_context(infer_stage), name="pipeline-infer", daemon=True),
+        threading.Thread(target=in_context(persist_stage), name="pipeline-persist", daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
 
-def predict_image(img_np, model, threshold=0.49):
-    """Enhanced with better error handling and debug info"""
     try:
-        if not isinstance(img_np, np.ndarray):
-            raise ValueError("Input must be a numpy array")
-            
-        # Convert and validate image
-        img_rgb = cv2.cvtColor(img_np, cv2.COLOR_BGR2RGB)
-
-        if img_rgb.shape[2] != 3:
-            raise ValueError(f"Expected 3 channels, got {img_rgb.shape[2]}")
-            
-        # Preprocessing pipeline
-        transform = transforms.Compose([
-            transforms.ToPILImage(),
-            transforms.Resize(model.cfg.image_size),
-            transforms.ToTensor(),
-            transforms.Normalize(
-                mean=[0.485, 0.456, 0.406], 
-                std=[0.229, 0.224, 0.225]
-            )
-        ])
-        
-        img_tensor = transform(img_rgb).unsqueeze(0).to(model.cfg.device)
-        
-        with torch.no_grad():
-            output = model(img_tensor)
-            probs = torch.softmax(output, dim=1)
-            confidence = probs[0, 1].item()
-            label = "Solar Panel" if confidence > threshold else "Not a Solar Panel"
-            
-            
-        return label, confidence
-        
-    except Exception as e:
-        logging.error(f"Prediction error: {str(e)}", exc_info=True)
-        return "Error", 0.0
+        while True:
+            item = _stage_get(out_q, stop)
+            if item is _STAGE_DONE:
+                return
+            if isinstance(item, _StageError):
+                raise item.exc
+            yield item
+    finally:
+        # Also runs when the caller stops consuming early
+        stop.set()
+        fetch_pool.shutdown(wait=False, cancel_futures=True)
+        for thread in threads:
+            thread.join()
+
+def _classify(logits, threshold):
+    import torch
+
+    probs = torch.softmax(logits, dim=1)
+    confidences = probs[:, 1].tolist()
+
+    return [
+        ("Solar Panel" if confidence > threshold else "Not a Solar Panel", confidence)
+        for confidence in confidences
+    ]
+
+
+def predict_images(images, model, threshold=0.49, batch_size=32):
+    """
+    Batched version of predict_image.
+    Preprocesses images in chunks of at most batch_size with the model's
+    cached Preprocessor and runs one forward pass per chunk. Returns a list
+    of (label, confidence) in input order; invalid images get
+    ("Error", 0.0) like predict_image.
+    """
+    results = [("Error", 0.0)] * len(images)
+    if not images:
+        return results
+
+    import torch
+    from ml.preprocess import Preprocessor, get_preprocessor
+
+    valid = []
+    for idx, img_np in enumerate(images):
+        try:
+            Preprocessor.validate(img_np)
+            valid.append(idx)
+        except ValueError as e:
+            logging.error(f"Prediction error: {str(e)}")
+
+    batch_size = max(1, int(batch_size))
 
-def get_scan_coordinates(lat, lon):
-    """Get coordinates for scan"""
+    for start in range(0, len(valid), batch_size):
+        chunk = valid[start:start + batch_size]
+        try:
+            with stage("preprocess", len(chunk)):
+                batch = get_preprocessor(model)([images[idx] for idx in chunk])
+
+            with stage("forward", len(chunk)), torch.no_grad():
+                output = model(batch)
+                if output.is_cuda:
+                    # CUDA kernels run asynchronously; wait so the timer covers them
+                    torch.cuda.synchronize(output.device)
+
+            for idx, result in zip(chunk, _classify(output, threshold)):
+                results[idx] = result
+
+        except Exception as e:
+            logging.error(f"Prediction error: {str(e)}", exc_info=True)
+
+    return results
+
+
+def predict_image(img_np, model, threshold=0.49):
+    """
+    Predict one image. With micro-batching enabled, concurrent calls are
+    coalesced into shared forward passes (see micro_batcher.MicroBatcher).
+    """
+    cfg = getattr(model, "cfg", None)
+    if cfg is not None and cfg.micro_batch_enabled:
+        return get_micro_batcher(model).predict(img_np, threshold)
+
+    return predict_images([img_np], model, threshold, batch_size=1)[0]
+
+def get_scan_coordinates(lat, lon, rows=5, cols=5):
+    """Get coordinates for a rows x cols scan grid centred on (lat, lon)"""
     try:
         lat, lon = validate_latlon(lat, lon)
     except ValueError:
         raise ValueError("Invalid latitude or longitude values.")
-    
-    meters_per_degree_lat = 111000
-    meters_per_degree_lon = 111000 * np.cos(np.radians(lat))
 
-    tile_width_m = 333
-    tile_height_m = 177
+    return list(ScanPlan({"shape": "grid", "lat": lat, "lon": lon, "rows": rows, "cols": cols}))
 
-    tile_width_deg = tile_width_m / meters_per_degree_lon
-    tile_height_deg = tile_height_m / meters_per_degree_lat
 
-    total_width_deg = tile_width_deg * 5  
-    total_height_deg = tile_height_deg * 5
+def scan_inputs(plan, cfg, use_cache=True):
+    """
+    (coords, images, cached) to feed iter_prediction_batch for a ScanPlan.
+    Small plans are checked against the result cache first and only the
+    misses are fetched, as one shared tile mosaic; larger ones stay a lazy
+    coordinate stream fetched tile by tile (neighbouring windows still share
+    XYZ tiles through the tile cache) and are looked up as they stream.
+    """
+    if len(plan) > cfg.scan_mosaic_max_tiles:
+        return plan, None, None
 
-    start_lat = lat - (total_height_deg / 2) + (tile_height_deg / 2)
-    start_lon = lon - (total_width_deg / 2) + (tile_width_deg / 2)
+    coords = list(plan)
+    cache = get_result_cache() if use_cache else None
+    cached = [lookup_cached_result(cache, c["lat"], c["lon"]) if cache is not None else None for c in coords]
 
-    scan_coords = []
-    for i in range(5):
-        for j in range(5):
-            tile_lat = start_lat + (i * tile_height_deg)
-            tile_lon = start_lon + (j * tile_width_deg)
-            scan_coords.append({"lat": round(tile_lat,6), "lon": round(tile_lon,6)})
-    
-    return scan_coords
+    misses = [i for i, hit in enumerate(cached) if hit is None]
+    images = [None] * len(coords)
+    if misses:
+        for i, image in zip(misses, fetch_scan_images([coords[i] for i in misses], cfg)):
+            images[i] = image
 
+    return coords, images, cached
 
-def get_scan_stats(predictions):
-    """Get scan statistics from predictions list"""
-    solar_count = sum(1 for p in predictions if p.get("label") == "Solar Panel")
-    total_count = len(predictions)
 
-    percentage_solar = round(solar_count / total_count * 100, 2) if total_count > 0 else 0.0
+class ScanStats:
+    """Scan summary statistics, updated one prediction at a time."""
 
-    confidences = [p.get("confidence", 0.0) for p in predictions if p.get("label") == "Solar Panel"]
-    average_confidence = np.mean(confidences) if confidences else 0.0
+    def __init__(self):
+        self.total_tiles = 0
+        self.solar_count = 0
+        self.confidence_sum = 0.0
+        self.confidence_min = None
+        self.confidence_max = None
 
-    confidence_range = f"{min(confidences):.4f} - {max(confidences):.4f}" if confidences else "N/A"
+    def add(self, prediction):
+        self.total_tiles += 1
 
-    summary_stats = {
-        "solar_count": solar_count,
-        "total_tiles": total_count,
-        "percentage_solar": percentage_solar,
-        "avg_confidence": average_confidence,
-        "confidence_range": confidence_range
-    }
+        if prediction.get("label") != "Solar Panel":
+            return
 
-    return summary_stats
+        confidence = prediction.get("confidence", 0.0)
+        self.solar_count += 1
+        self.confidence_sum += confidence
+        self.confidence_min = confidence if self.confidence_min is None else min(self.confidence_min, confidence)
+        self.confidence_max = confidence if self.confidence_max is None else max(self.confidence_max, confidence)
 
+    def update(self, predictions):
+        for prediction in predictions:
+            self.add(prediction)
+        return self
 
+    def summary(self, hierarchical=None):
+        """Summary dict; with a HierarchicalScan, tiles it skipped count as scanned
+        without detections and its per-level counts are included."""
+        skipped = hierarchical.skipped if hierarchical is not None else 0
+        total_count = self.total_tiles + skipped
+        solar_count = self.solar_count
 
-def save_prediction(lat, lon, label, confidence, file_path):
+        percentage_solar = round(solar_count / total_count * 100, 2) if total_count > 0 else 0.0
+        average_confidence = self.confidence_sum / solar_count if solar_count else 0.0
+        confidence_range = f"{self.confidence_min:.4f} - {self.confidence_max:.4f}" if solar_count else "N/A"
 
-    directory = os.path.dirname(file_path)
-    if not os.path.exists(directory):
-        os.makedirs(directory)
-        
+        summary_stats = {
+            "solar_count": solar_count,
+            "total_tiles": total_count,
+            "percentage_solar": percentage_solar,
+            "avg_confidence": average_confidence,
+            "confidence_range": confidence_range
+        }
 
-    data = {
-        'Latitude': lat,
-        'Longitude': lon,
-        'Label': label,
-        'Confidence': confidence,
-        'Timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    }
-    
-    df = pd.DataFrame([data])
+        if hierarchical is not None:
+            summary_stats["levels"] = hierarchical.levels()
 
-    file_exists = os.path.exists(file_path)
-    file_empty = file_exists and os.path.getsize(file_path) == 0
+        return summary_stats
 
-    if not file_exists:
-        df.to_csv(file_path, mode='w', header=True, index=False)
-        return
-    
-    if file_empty:
-        df.to_csv(file_path, mode='w', header=True, index=False)
-        return 
-    
-    df.to_csv(file_path, mode='a', header=False, index=False)
+
+class HierarchicalScan:
+    """
+    Coarse-to-fine scan of a ScanPlan.
+
+    Level 0 screens coarse cells of 2**scan_screen_levels x 2**scan_screen_levels
+    tiles, each with one image of the whole cell (screen_extent) fetched that
+    many zoom levels lower. Only the tiles of coarse cells whose screening
+    confidence reaches scan_screen_threshold, or whose screening failed, are
+    predicted at cfg.zoom_level (level 1); the others are counted as skipped. Both levels stream through iter_prediction_batch,
+    the refine level consuming coarse cells as they pass screening.
+
+    Iterating yields the level 1 result dicts. levels() reports per-level
+    counts so the threshold can be tuned for recall against cost.
+    """
+
+    def __init__(self, model, plan, cfg, use_cache=True, image_limit=None):
+        self.model = model
+        self.plan = plan
+        self.cfg = cfg
+        self.use_cache = use_cache
+        self.image_limit = image_limit
+
+        self.screened = 0
+        self.passed = 0
+        self.refined = 0
+        self.skipped = 0
+
+    def screen_extent(self):
+        """
+        (half_lat, half_lon) in degrees of a coarse cell's screening image: the
+        factor x plan stride of the cell, widened where the model windows of its
+        edge tiles reach past their stride (e.g. the latitude window).
+        """
+        factor = 1 << self.cfg.scan_screen_levels
+        half_lat = (factor - 1) * self.plan.step_lat / 2 + max(self.plan.step_lat / 2, MODEL_WINDOW[0])
+        half_lon = (factor - 1) * self.plan.step_lon / 2 + max(self.plan.step_lon / 2, MODEL_WINDOW[1])
+        return half_lat, half_lon
+
+    def _refine_coords(self, screening):
+        threshold = self.cfg.scan_screen_threshold
+        groups = deque()
+
+        def coarse_cells():
+            for group in self.plan.iter_groups(1 << self.cfg.scan_screen_levels):
+                groups.append(group)
+                yield group
+
+        screened = screening(coarse_cells())
+        try:
+            # Results come back in input order, so each one pairs with the oldest queued group
+            for result in screened:
+                group = groups.popleft()
+                self.screened += 1
+
+                # A missing or failed screening image is refined rather than risking a miss
+                passed = result["label"] in FAILED_LABELS or result["confidence"] >= threshold
+
+                if not passed:
+                    self.skipped += len(group["cells"])
+                    continue
+
+                self.passed += 1
+                yield from group["cells"]
+        finally:
+            screened.close()
+
+    def __iter__(self):
+        cfg = self.cfg
+        fetch = functools.partial(fetch_screen_image, extent=self.screen_extent())
+
+        def screening(coarse):
+            return iter_prediction_batch(self.model, coarse, cfg, fetch=fetch, persist=False, image_limit=0)
+
+        coords = self._refine_coords(screening)
+        results = iter_prediction_batch(self.model, coords, cfg, use_cache=self.use_cache, image_limit=self.image_limit)
+
+        try:
+            for result in results:
+                self.refined += 1
+                yield result
+        finally:
+            results.close()
+            coords.close()
+
+    def levels(self):
+        return {
+            "screen": {
+                "zoom": self.cfg.zoom_level - self.cfg.scan_screen_levels,
+                "tiles": self.screened,
+                "passed": self.passed,
+                "threshold": self.cfg.scan_screen_threshold
+            },
+            "refine": {
+                "zoom": self.cfg.zoom_level,
+                "tiles": self.refined,
+                "skipped": self.skipped
+            }
+        }
+
+
+def iter_scan(model, plan, cfg, use_cache=True, image_limit=None):
+    """
+    Results for a ScanPlan, as (results, hierarchical): hierarchical is the
+    HierarchicalScan when the area asks for coarse-to-fine screening (its
+    levels() and skipped count are final once results is exhausted), else None.
+    """
+    if plan.area.get("hierarchical"):
+        scan = HierarchicalScan(model, plan, cfg, use_cache, image_limit)
+        return iter(scan), scan
+
+    coords, images, cached = scan_inputs(plan, cfg, use_cache)
+    return iter_prediction_batch(
+        model, coords, cfg, images, use_cache=use_cache, image_limit=image_limit, cached=cached
+    ), None
+
+
+def get_scan_stats(predictions):
+    """Get scan statistics from predictions list"""
+    return ScanStats().update(predictions).summary()
+
+
+
+def save_predictions(records, cfg):
+    """
+    Persist prediction records (see prediction_store.make_record).
+    With async persistence on, this only enqueues them for the background
+    writer (timed as "enqueue"; the writer times its inserts as "persist");
+    otherwise they are inserted in one transaction.
+    """
+    writer = get_prediction_writer()
+    if writer is not None:
+        with stage("enqueue", len(records)):
+            return writer.submit(records)
+
+    with stage("persist", len(records)):
+        return get_prediction_store(cfg).add_many(records)
+
+
+def save_prediction(lat, lon, label, confidence, cfg):
+    return save_predictions([make_record(lat, lon, label, confidence)], cfg)
@@ -0,0 +1,286 @@
+import io
+import os
+import csv
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+
+CSV_COLUMNS = ["Latitude", "Longitude", "Label", "Confidence", "Timestamp"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    label TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_predictions_lat ON predictions (latitude);
+CREATE INDEX IF NOT EXISTS idx_predictions_lon ON predictions (longitude);
+CREATE INDEX IF NOT EXISTS idx_predictions_timestamp ON predictions (timestamp);
+CREATE INDEX IF NOT EXISTS idx_predictions_label ON predictions (label);
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def now_timestamp():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def make_record(lat, lon, label, confidence, timestamp=None):
+    return {
+        "latitude": float(lat),
+        "longitude": float(lon),
+        "label": label,
+        "confidence": float(confidence),
+        "timestamp": timestamp or now_timestamp()
+    }
+
+
+class PredictionStore:
+    """
+    Prediction history in SQLite (WAL mode).
+
+    One connection per thread; WAL lets gunicorn workers read while another
+    worker writes, and busy_timeout serializes concurrent writers instead of
+    failing. Inserts are grouped with add_many so a batch request costs one
+    transaction.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def add_many(self, records):
+        """Insert records (dicts from make_record) in a single transaction."""
+        if not records:
+            return 0
+
+        rows = [
+            (r["latitude"], r["longitude"], r["label"], r["confidence"], r["timestamp"])
+            for r in records
+        ]
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT INTO predictions (latitude, longitude, label, confidence, timestamp) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+        return len(rows)
+
+    def add(self, lat, lon, label, confidence):
+        return self.add_many([make_record(lat, lon, label, confidence)])
+
+    def count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+    def recent(self, limit):
+        """Newest predictions first, at most limit rows."""
+        rows, _ = self.page(limit)
+        return rows
+
+    @staticmethod
+    def _where(filters):
+        """SQL WHERE clause + params for history filters (all optional).
+        filters: start / end (timestamp strings), label, min_confidence, max_confidence."""
+        clauses = []
+        params = []
+        filters = filters or {}
+
+        if filters.get("start"):
+            clauses.append("timestamp >= ?")
+            params.append(filters["start"])
+        if filters.get("end"):
+            clauses.append("timestamp <= ?")
+            params.append(filters["end"])
+        if filters.get("label"):
+            clauses.append("label = ?")
+            params.append(filters["label"])
+        if filters.get("min_confidence") is not None:
+            clauses.append("confidence >= ?")
+            params.append(filters["min_confidence"])
+        if filters.get("max_confidence") is not None:
+            clauses.append("confidence <= ?")
+            params.append(filters["max_confidence"])
+
+        return clauses, params
+
+    def page(self, limit, cursor=None, filters=None):
+        """
+        Keyset pagination, newest first.
+        cursor: id of the last row of the previous page (rows with a smaller id follow).
+        Returns (rows, next_cursor); next_cursor is None on the last page.
+        Cost depends on the page size, not on the total history size.
+        """
+        clauses, params = self._where(filters)
+        if cursor is not None:
+            clauses.append("id < ?")
+            params.append(int(cursor))
+
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        limit = max(1, int(limit))
+
+        rows = self._conn().execute(
+            "SELECT id, latitude, longitude, label, confidence, timestamp "
+            f"FROM predictions {where}ORDER BY id DESC LIMIT ?",
+            (*params, limit + 1)
+        ).fetchall()
+
+        rows = [dict(row) for row in rows]
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return rows, rows[-1]["id"]
+
+        return rows, None
+
+    def labels(self):
+        """Distinct labels, sorted. Each step seeks the next label on idx_predictions_label,
+        so the cost grows with the number of labels, not the number of rows."""
+        rows = self._conn().execute(
+            "WITH RECURSIVE labels(label) AS ("
+            " SELECT MIN(label) FROM predictions"
+            " UNION ALL"
+            " SELECT (SELECT MIN(label) FROM predictions WHERE label > labels.label) FROM labels"
+            " WHERE labels.label IS NOT NULL"
+            ") SELECT label FROM labels WHERE label IS NOT NULL"
+        )
+        return [row[0] for row in rows]
+
+    def iter_rows(self, chunk_size=1000, filters=None):
+        """Matching predictions in insertion order, fetched chunk_size rows at a time."""
+        clauses, params = self._where(filters)
+        clauses.append("id > ?")
+        where = " AND ".join(clauses)
+
+        last_id = 0
+        conn = self._conn()
+        while True:
+            rows = conn.execute(
+                "SELECT id, latitude, longitude, label, confidence, timestamp "
+                f"FROM predictions WHERE {where} ORDER BY id LIMIT ?",
+                (*params, last_id, chunk_size)
+            ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield dict(row)
+            last_id = rows[-1]["id"]
+
+    def iter_csv(self, chunk_size=1000, filters=None):
+        """Stream the history as CSV text in the legacy layout, one chunk of rows per yield."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CSV_COLUMNS)
+
+        count = 0
+        for row in self.iter_rows(chunk_size, filters):
+            writer.writerow([row["latitude"], row["longitude"], row["label"], row["confidence"], row["timestamp"]])
+            count += 1
+            if count % chunk_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+        yield buffer.getvalue()
+
+    def checkpoint(self):
+        """Copy the WAL into the database file; this is where data is fsynced."""
+        self._conn().execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def clear(self):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM predictions")
+
+    def import_csv_once(self, file_path):
+        """
+        One-time migration of the legacy predictions.csv into the database.
+        The database is marked as migrated even when there is nothing to
+        import, so later CSV exports to the same path are never re-imported.
+        """
+        conn = self._conn()
+        if conn.execute("SELECT value FROM store_meta WHERE key = 'csv_imported'").fetchone():
+            return 0
+
+        records = []
+        if os.path.exists(file_path):
+            try:
+                with open(file_path, newline="") as f:
+                    for row in csv.DictReader(f):
+                        row = {k.strip().lower(): v for k, v in row.items() if k}
+                        try:
+                            records.append(make_record(
+                                row["latitude"], row["longitude"], row["label"], row["confidence"], row["timestamp"]
+                            ))
+                        except (KeyError, TypeError, ValueError):
+                            continue
+            except OSError as e:
+                logging.error(f"Failed to read legacy predictions CSV: {str(e)}")
+                return 0
+
+        # Re-check under a write lock so only one worker performs the import
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT value FROM store_meta WHERE key = 'csv_imported'").fetchone():
+                conn.rollback()
+                return 0
+
+            conn.executemany(
+                "INSERT INTO predictions (latitude, longitude, label, confidence, timestamp) VALUES (?, ?, ?, ?, ?)",
+                [(r["latitude"], r["longitude"], r["label"], r["confidence"], r["timestamp"]) for r in records]
+            )
+            conn.execute("INSERT OR REPLACE INTO store_meta (key, value) VALUES ('csv_imported', ?)", (now_timestamp(),))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        logging.info(f"Imported {len(records)} predictions from {file_path}")
+        return len(records)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_prediction_store(cfg):
+    """Process-wide store for cfg.predictions_db (legacy CSV is imported on first open)."""
+    store = _stores.get(cfg.predictions_db)
+    if store is not None:
+        return store
+
+    with _stores_lock:
+        store = _stores.get(cfg.predictions_db)
+        if store is None:
+            store = PredictionStore(cfg.predictions_db)
+            try:
+                store.import_csv_once(cfg.predictions_file)
+            except sqlite3.Error as e:
+                logging.error(f"Legacy CSV import failed: {str(e)}")
+            _stores[cfg.predictions_db] = store
+
+    return store
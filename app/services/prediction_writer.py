@@ -0,0 +1,263 @@
+import time
+import queue
+import atexit
+import logging
+import threading
+
+from app.services.prediction_store import get_prediction_store
+from app.services.metrics import stage, set_route
+
+
+class _FlushRequest:
+    def __init__(self):
+        self.done = threading.Event()
+
+
+_STOP = object()
+
+
+class PredictionWriter:
+    """
+    Background persistence stage for prediction records.
+
+    Requests only enqueue records; a single writer thread drains the bounded
+    queue and inserts them in groups of up to flush_count, or whatever has
+    arrived after flush_interval seconds. Commits do not fsync (WAL with
+    synchronous=NORMAL); instead the WAL is checkpointed to the database
+    file every fsync_interval seconds and on shutdown.
+
+    A failed insert is retried with exponential backoff for up to
+    retry_deadline seconds before the group is dropped. Records submitted
+    once close() has started are written synchronously.
+    """
+
+    def __init__(self, store, max_queue=10000, flush_count=200, flush_interval=0.5,
+                 fsync_interval=5.0, enqueue_timeout=0.05, retry_deadline=30.0,
+                 retry_backoff=0.1, retry_backoff_max=2.0):
+        self.store = store
+        self.flush_count = max(1, flush_count)
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.retry_deadline = retry_deadline
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        # Orders enqueues against close(): nothing is queued behind _STOP
+        self._submit_lock = threading.Lock()
+        self._closed = False
+
+        self.enqueued = 0
+        self.written = 0
+        self.flushes = 0
+        self.errors = 0
+        self.retries = 0
+        self.dropped = 0
+        self.sync_fallbacks = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+        self._last_fsync = time.monotonic()
+
+        self._thread = threading.Thread(target=self._run, name="prediction-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, records):
+        """Queue records for writing. Falls back to a direct write if the queue stays full."""
+        if not records:
+            return 0
+
+        for i, record in enumerate(records):
+            with self._submit_lock:
+                closed = self._closed
+                queued = False
+                if not closed:
+                    try:
+                        self._queue.put(record, timeout=self.enqueue_timeout)
+                        queued = True
+                    except queue.Full:
+                        pass
+
+            if closed:
+                # close() has started: the writer may already be past its last record
+                return i + self.store.add_many(records[i:])
+
+            if not queued:
+                # Backpressure: never drop history, write inline instead
+                logging.warning("Prediction writer queue full, writing synchronously")
+                with self._lock:
+                    self.sync_fallbacks += 1
+                self.store.add_many([record])
+                continue
+
+            with self._lock:
+                self.enqueued += 1
+
+        return len(records)
+
+    def flush(self, timeout=10):
+        """Block until everything queued before this call has been written."""
+        if self._closed or not self._thread.is_alive():
+            return True
+
+        request = _FlushRequest()
+        try:
+            self._queue.put(request, timeout=timeout)
+        except queue.Full:
+            return False
+        return request.done.wait(timeout)
+
+    def close(self, timeout=30):
+        """Drain the queue, checkpoint and stop the writer thread."""
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                logging.error("Prediction writer queue full on shutdown")
+        self._thread.join(timeout)
+
+    def _write(self, batch):
+        started = time.perf_counter()
+        deadline = time.monotonic() + self.retry_deadline
+        delay = self.retry_backoff
+
+        while True:
+            try:
+                with stage("persist", len(batch)):
+                    self.store.add_many(batch)
+                break
+            except Exception as e:
+                # Retry (e.g. a locked database) until the deadline, then give up on
+                # this group so the writer keeps going
+                if time.monotonic() + delay > deadline:
+                    logging.error(f"Dropped {len(batch)} predictions after {self.retry_deadline}s of retries: {str(e)}")
+                    with self._lock:
+                        self.errors += 1
+                        self.dropped += len(batch)
+                    return
+
+                logging.error(f"Failed to write {len(batch)} predictions, retrying in {delay:.1f}s: {str(e)}")
+                with self._lock:
+                    self.retries += 1
+                time.sleep(delay)
+                delay = min(delay * 2, self.retry_backoff_max)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.written += len(batch)
+            self.flushes += 1
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
+
+    def _checkpoint(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_fsync < self.fsync_interval:
+            return
+
+        try:
+            self.store.checkpoint()
+        except Exception as e:
+            logging.error(f"Prediction store checkpoint failed: {str(e)}")
+        self._last_fsync = now
+
+    def _run(self):
+        # Groups mix records from every route, so the inserts get their own label
+        set_route("prediction-writer")
+
+        batch = []
+        waiters = []
+        deadline = None
+
+        while True:
+            timeout = self.flush_interval if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            stop = item is _STOP
+            if isinstance(item, _FlushRequest):
+                waiters.append(item)
+            elif item is not None and not stop:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            due = deadline is not None and time.monotonic() >= deadline
+            if batch and (len(batch) >= self.flush_count or due or waiters or stop):
+                self._write(batch)
+                batch = []
+                deadline = None
+
+            for waiter in waiters:
+                waiter.done.set()
+            waiters = []
+
+            if stop:
+                self._checkpoint(force=True)
+                return
+
+            self._checkpoint()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "flushes": self.flushes,
+                "errors": self.errors,
+                "retries": self.retries,
+                "dropped": self.dropped,
+                "sync_fallbacks": self.sync_fallbacks,
+                "last_flush_ms": round(self.last_flush_ms, 3),
+                "max_flush_ms": round(self.max_flush_ms, 3),
+                "avg_flush_ms": round(self._total_flush_ms / self.flushes, 3) if self.flushes else 0.0,
+            }
+
+
+_writer = None
+
+
+def configure_prediction_writer(cfg):
+    """Start the process-wide writer (or disable async persistence)."""
+    global _writer
+
+    if _writer is not None:
+        _writer.close()
+        _writer = None
+
+    if cfg.async_persistence:
+        _writer = PredictionWriter(
+            get_prediction_store(cfg),
+            max_queue=cfg.writer_queue_size,
+            flush_count=cfg.writer_flush_count,
+            flush_interval=cfg.writer_flush_interval,
+            fsync_interval=cfg.writer_fsync_interval,
+            retry_deadline=cfg.writer_retry_deadline
+        )
+
+    return _writer
+
+
+def get_prediction_writer():
+    return _writer
+
+
+def flush_pending_predictions(timeout=10):
+    """Make queued records visible before reading or clearing history."""
+    if _writer is not None:
+        _writer.flush(timeout)
+
+
+@atexit.register
+def _close_writer():
+    if _writer is not None:
+        _writer.close()
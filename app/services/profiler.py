@@ -0,0 +1,102 @@
+import os
+import sys
+import time
+import threading
+from collections import Counter
+
+
+# Threads a request hands work to (prediction pipeline, shared tile fetch pool,
+# micro-batcher); their samples are included with the request thread's
+WORKER_THREAD_PREFIXES = ("pipeline-", "tile-fetch", "micro-batcher")
+
+
+class SamplingProfiler:
+    """
+    Low-overhead statistical profiler for one request.
+
+    A background thread snapshots Python stacks (sys._current_frames) every
+    interval seconds: the thread that started the profiler plus the worker
+    threads named by thread_prefixes, so the profile shows the work a
+    request hands off, not just its own thread. Shared workers also run
+    other requests' work; profile on a quiet worker.
+
+    Stacks are written in collapsed format ("thread;outer;...;inner count"),
+    which flamegraph.pl, speedscope and inferno read directly.
+    """
+
+    def __init__(self, interval=0.005, max_depth=64, thread_prefixes=WORKER_THREAD_PREFIXES):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.thread_prefixes = tuple(thread_prefixes)
+        self.target = None
+
+        self.stacks = Counter()
+        self.samples = 0
+        self.started = None
+        self.elapsed = 0.0
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        names = {}
+
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+
+            if names.keys() != frames.keys():
+                names = {t.ident: t.name for t in threading.enumerate()}
+
+            for ident, frame in frames.items():
+                name = names.get(ident, str(ident))
+                if ident != self.target and not name.startswith(self.thread_prefixes):
+                    continue
+
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+
+                stack.append(name)
+                self.stacks[";".join(reversed(stack))] += 1
+
+            self.samples += 1
+
+    def start(self):
+        self.target = threading.get_ident()
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    def collapsed(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+    def write(self, directory, name):
+        """Write the collapsed stacks to directory/<timestamp>-<name>.txt; returns the path."""
+        os.makedirs(directory, exist_ok=True)
+
+        safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in name).strip("_") or "request"
+        path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}-{safe}.txt")
+
+        with open(path, "w") as f:
+            f.write(self.collapsed())
+
+        return path
+
+
+def wants_profile(request, cfg):
+    """Per-request toggle: ?profile=1 or an X-Profile: 1 header, when cfg.profiling_enabled."""
+    if not cfg.profiling_enabled:
+        return False
+
+    flag = request.args.get("profile") or request.headers.get("X-Profile")
+    return flag not in (None, "", "0", "false")
@@ -0,0 +1,408 @@
+import os
+import json
+import math
+import mmap
+import struct
+
+import numpy as np
+
+GEOGRAPHIC = "EPSG:4326"
+WEB_MERCATOR = "EPSG:3857"
+EARTH_RADIUS_M = 6378137.0
+
+TIFF_EXTENSIONS = (".tif", ".tiff")
+
+# TIFF field type -> struct format (types we never need, e.g. RATIONAL, are skipped)
+_TIFF_TYPES = {1: "B", 2: "B", 3: "H", 4: "I", 6: "b", 7: "B", 8: "h", 9: "i", 11: "f", 12: "d", 16: "Q", 17: "q", 18: "Q"}
+
+# Baseline and GeoTIFF tags used here
+_WIDTH, _HEIGHT, _BITS, _COMPRESSION = 256, 257, 258, 259
+_STRIP_OFFSETS, _SAMPLES, _STRIP_COUNTS, _PLANAR = 273, 277, 279, 284
+_TILE_WIDTH, _SAMPLE_FORMAT = 322, 339
+_PIXEL_SCALE, _TIEPOINT, _TRANSFORMATION, _GEOKEYS = 33550, 33922, 34264, 34735
+
+# Tags open_geotiff cannot do without
+_REQUIRED_TAGS = {_WIDTH: "ImageWidth", _HEIGHT: "ImageLength", _STRIP_OFFSETS: "StripOffsets", _STRIP_COUNTS: "StripByteCounts"}
+
+# GeoKeys
+_MODEL_TYPE, _RASTER_TYPE, _GEOGRAPHIC_TYPE, _PROJECTED_TYPE = 1024, 1025, 2048, 3072
+
+
+class Raster:
+    """
+    A large local raster read through a read-only memory map: pixels stay on
+    disk and only the windows being predicted are paged in and copied.
+
+    pixels      : uint8 memmap, (height, width, bands) or (bands, height, width) if planar
+    geotransform: GDAL-style (x0, pixel_w, row_rot, y0, col_rot, pixel_h) in crs units
+    crs         : EPSG:4326 (x = lon, y = lat) or EPSG:3857 (Web Mercator metres)
+    """
+
+    def __init__(self, path, pixels, geotransform, crs=GEOGRAPHIC, planar=False):
+        if crs not in (GEOGRAPHIC, WEB_MERCATOR):
+            raise ValueError(f"Unsupported raster CRS {crs}; reproject to {GEOGRAPHIC} or {WEB_MERCATOR}.")
+
+        self.path = path
+        self.pixels = pixels
+        self.geotransform = tuple(float(v) for v in geotransform)
+        self.crs = crs
+        self.planar = planar
+
+        if planar:
+            self.bands, self.height, self.width = pixels.shape
+        else:
+            self.height, self.width, self.bands = pixels.shape
+
+    def read(self, row, col, height, width):
+        """BGR uint8 copy of one window (the layout the model's preprocessor expects)."""
+        if self.planar:
+            window = np.moveaxis(self.pixels[:, row:row + height, col:col + width], 0, -1)
+        else:
+            window = self.pixels[row:row + height, col:col + width]
+
+        if self.bands >= 3:
+            # RGB, RGBA or RGB + extra bands
+            return np.ascontiguousarray(window[..., 2::-1])
+        return np.ascontiguousarray(np.repeat(window[..., :1], 3, axis=2))
+
+    def release(self, end_row):
+        """
+        Drop this process's mapped pages for rows above end_row once the
+        windows have moved past them, so resident memory stays at a band of
+        rows instead of growing with the raster. Pages are re-read from disk
+        if touched again. (Pixel-interleaved rasters only.)
+        """
+        mapping = getattr(self.pixels, "_mmap", None)
+        if mapping is None or self.planar or not hasattr(mmap, "MADV_DONTNEED"):
+            return
+
+        start = self.pixels.offset % mmap.ALLOCATIONGRANULARITY
+        end = (start + end_row * self.width * self.bands) // mmap.PAGESIZE * mmap.PAGESIZE
+        if end > 0:
+            mapping.madvise(mmap.MADV_DONTNEED, 0, end)
+
+    def to_latlon(self, px, py):
+        """(lats, lons) of pixel positions (arrays of column / row coordinates)."""
+        x0, pixel_w, row_rot, y0, col_rot, pixel_h = self.geotransform
+        x = x0 + px * pixel_w + py * row_rot
+        y = y0 + px * col_rot + py * pixel_h
+
+        if self.crs == WEB_MERCATOR:
+            return np.degrees(2 * np.arctan(np.exp(y / EARTH_RADIUS_M)) - math.pi / 2), np.degrees(x / EARTH_RADIUS_M)
+        return y, x
+
+
+def _read_tiff_tags(path):
+    """Tags of the first IFD (classic TIFF or BigTIFF) as numpy arrays.
+    Raises ValueError if the file is not a TIFF or its header / IFD is truncated or corrupt."""
+    with open(path, "rb") as f:
+        head = f.read(16)
+        order = {b"II": "<", b"MM": ">"}.get(head[:2])
+        if order is None or len(head) < 8:
+            raise ValueError("Not a TIFF file.")
+
+        magic = struct.unpack(order + "H", head[2:4])[0]
+        if magic not in (42, 43):
+            raise ValueError("Not a TIFF file.")
+
+        try:
+            return _read_ifd(f, head, order, big=magic == 43)
+        except (struct.error, ValueError, OverflowError) as e:
+            # Offsets past the end of the file, short tag data, ...
+            raise ValueError(f"Malformed TIFF: truncated or corrupt header ({str(e)}).")
+
+
+def _read_ifd(f, head, order, big):
+    if big:
+        offset_fmt = "Q"
+        ifd = struct.unpack(order + "Q", head[8:16])[0]
+    else:
+        offset_fmt = "I"
+        ifd = struct.unpack(order + "I", head[4:8])[0]
+
+    entry_size, inline = (20, 8) if big else (12, 4)
+    f.seek(ifd)
+    count = struct.unpack(order + ("Q" if big else "H"), f.read(8 if big else 2))[0]
+    entries = f.read(count * entry_size)
+
+    tags = {}
+    for i in range(count):
+        entry = entries[i * entry_size:(i + 1) * entry_size]
+        tag, kind = struct.unpack(order + "HH", entry[:4])
+        n = struct.unpack(order + offset_fmt, entry[4:4 + inline])[0]
+        value = entry[4 + inline:]
+
+        fmt = _TIFF_TYPES.get(kind)
+        if fmt is None:
+            continue
+
+        size = struct.calcsize(fmt) * n
+        if size > inline:
+            f.seek(struct.unpack(order + offset_fmt, value)[0])
+            raw = f.read(size)
+        else:
+            raw = value[:size]
+
+        tags[tag] = np.frombuffer(raw, dtype=np.dtype(order + fmt), count=n)
+
+    return tags
+
+
+def _geokeys(tags):
+    """GeoKeyDirectory entries stored inline (all the ones read here are SHORT)."""
+    directory = tags.get(_GEOKEYS)
+    if directory is None or len(directory) < 4:
+        return {}
+
+    keys = {}
+    for i in range(int(directory[3])):
+        entry = directory[4 + i * 4:8 + i * 4].tolist()
+        if len(entry) < 4:
+            raise ValueError("Malformed TIFF: GeoKeyDirectory is shorter than its key count.")
+        key, location, _, value = entry
+        if location == 0:
+            keys[key] = value
+    return keys
+
+
+def _first(tags, tag, default):
+    """First value of an integer tag, or default if the tag is missing or empty."""
+    values = tags.get(tag)
+    return int(values[0]) if values is not None and len(values) else default
+
+
+def _tiff_georeference(tags):
+    if len(tags.get(_TRANSFORMATION, ())) >= 16:
+        m = tags[_TRANSFORMATION].tolist()
+        geotransform = [m[3], m[0], m[1], m[7], m[4], m[5]]
+    elif len(tags.get(_PIXEL_SCALE, ())) >= 2 and len(tags.get(_TIEPOINT, ())) >= 6:
+        scale_x, scale_y = tags[_PIXEL_SCALE][:2].tolist()
+        i, j, _, x, y, _ = tags[_TIEPOINT][:6].tolist()
+        geotransform = [x - i * scale_x, scale_x, 0.0, y + j * scale_y, 0.0, -scale_y]
+    else:
+        raise ValueError("TIFF is not georeferenced (no ModelTransformation or ModelTiepoint/ModelPixelScale).")
+
+    keys = _geokeys(tags)
+
+    if keys.get(_RASTER_TYPE) == 2:
+        # PixelIsPoint: the tie point is a pixel centre, not its corner
+        geotransform[0] -= (geotransform[1] + geotransform[2]) / 2
+        geotransform[3] -= (geotransform[4] + geotransform[5]) / 2
+
+    if keys.get(_MODEL_TYPE) == 1:
+        crs = f"EPSG:{keys.get(_PROJECTED_TYPE)}"
+        crs = WEB_MERCATOR if crs in (WEB_MERCATOR, "EPSG:900913") else crs
+    else:
+        crs = f"EPSG:{keys.get(_GEOGRAPHIC_TYPE, 4326)}"
+
+    return geotransform, crs
+
+
+def open_geotiff(path):
+    """
+    Memory-map an uncompressed, stripped 8-bit GeoTIFF (classic or BigTIFF).
+    The strips must be stored back to back, as GDAL writes them by default
+    (e.g. gdal_translate -co COMPRESS=NONE -co TILED=NO).
+    Every malformed file (truncated, missing tags, out-of-range offsets)
+    raises ValueError.
+    """
+    tags = _read_tiff_tags(path)
+
+    missing = [name for tag, name in _REQUIRED_TAGS.items() if not len(tags.get(tag, ()))]
+    if missing:
+        raise ValueError(f"Malformed TIFF: missing required tags {', '.join(missing)}.")
+
+    if _first(tags, _COMPRESSION, 1) != 1:
+        raise ValueError("Only uncompressed TIFFs can be memory-mapped.")
+    if _TILE_WIDTH in tags:
+        raise ValueError("Tiled TIFFs are not supported; write the raster with TILED=NO.")
+    if any(int(b) != 8 for b in tags.get(_BITS, [1])) or _first(tags, _SAMPLE_FORMAT, 1) != 1:
+        raise ValueError("Only 8-bit unsigned rasters are supported.")
+
+    width, height = _first(tags, _WIDTH, 0), _first(tags, _HEIGHT, 0)
+    bands = _first(tags, _SAMPLES, 1)
+    planar = _first(tags, _PLANAR, 1) == 2
+    if min(width, height, bands) < 1:
+        raise ValueError("Malformed TIFF: the image has no pixels.")
+
+    offsets = tags[_STRIP_OFFSETS].astype(np.int64)
+    counts = tags[_STRIP_COUNTS].astype(np.int64)
+    if len(offsets) != len(counts):
+        raise ValueError("Malformed TIFF: StripOffsets and StripByteCounts differ in length.")
+    if np.any(offsets[1:] != offsets[:-1] + counts[:-1]) or counts.sum() < width * height * bands:
+        raise ValueError("TIFF strips are not contiguous and cannot be memory-mapped.")
+    if int(offsets[0]) + width * height * bands > os.path.getsize(path):
+        raise ValueError("Malformed TIFF: pixel data runs past the end of the file.")
+
+    shape = (bands, height, width) if planar else (height, width, bands)
+    pixels = np.memmap(path, dtype=np.uint8, mode="r", offset=int(offsets[0]), shape=shape)
+
+    geotransform, crs = _tiff_georeference(tags)
+    return Raster(path, pixels, geotransform, crs, planar)
+
+
+def open_raw(path):
+    """
+    Memory-map a headerless 8-bit raster described by a <path>.json sidecar:
+        {"width": 60000, "height": 40000, "bands": 3, "interleave": "pixel",
+         "offset": 0, "geotransform": [x0, pixel_w, 0, y0, 0, -pixel_h], "crs": "EPSG:4326"}
+    interleave is "pixel" (RGBRGB...) or "band" (all R, then G, then B).
+    """
+    try:
+        with open(f"{path}.json") as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        raise ValueError("Raw rasters need a <raster>.json sidecar with their size and geotransform.")
+
+    try:
+        width, height = int(meta["width"]), int(meta["height"])
+        bands = int(meta.get("bands", 3))
+        planar = meta.get("interleave", "pixel") == "band"
+        geotransform = meta["geotransform"]
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Raster sidecar needs width, height and geotransform.")
+
+    if len(geotransform) != 6:
+        raise ValueError("geotransform must have 6 values.")
+
+    shape = (bands, height, width) if planar else (height, width, bands)
+    pixels = np.memmap(path, dtype=np.uint8, mode="r", offset=int(meta.get("offset", 0)), shape=shape)
+
+    return Raster(path, pixels, geotransform, meta.get("crs", GEOGRAPHIC), planar)
+
+
+def open_raster(path):
+    """Raster for a GeoTIFF (.tif/.tiff) or a raw file with a JSON sidecar. Raises ValueError."""
+    if path.lower().endswith(TIFF_EXTENSIONS):
+        return open_geotiff(path)
+    return open_raw(path)
+
+
+def _window_offsets(size, window, stride):
+    """Window start offsets along one axis; the last window ends flush with the edge."""
+    offsets = list(range(0, size - window + 1, stride))
+    if offsets[-1] + window < size:
+        offsets.append(size - window)
+    return offsets
+
+
+class _Windows:
+    """Window pixels by plan index (the images argument of iter_prediction_batch)."""
+
+    def __init__(self, plan):
+        self.plan = plan
+        self._row = 0
+
+    def __len__(self):
+        return len(self.plan)
+
+    def __getitem__(self, index):
+        plan = self.plan
+        row, col = divmod(index, len(plan.col_offsets))
+
+        if row != self._row:
+            # Windows are read in order: rows above this one are done
+            plan.raster.release(plan.row_offsets[row])
+            self._row = row
+
+        return plan.raster.read(plan.row_offsets[row], plan.col_offsets[col], *plan.window)
+
+
+class RasterPlan:
+    """
+    Sliding windows over a Raster, row by row from the top-left corner.
+
+    window: (height, width) in pixels, usually the model's image_size so
+            windows go into the model without resizing
+    stride: (row_step, col_step), defaults to window (no overlap)
+
+    Iterating yields the {"lat", "lon"} centre of each window; plan.images[i]
+    reads window i from the memory map. Neither is materialized up front.
+    """
+
+    def __init__(self, raster, window, stride=None):
+        stride = stride or window
+        if min(window) < 1 or min(stride) < 1:
+            raise ValueError("Window and stride must be at least 1 pixel.")
+
+        self.raster = raster
+        self.window = (min(int(window[0]), raster.height), min(int(window[1]), raster.width))
+        self.stride = (int(stride[0]), int(stride[1]))
+
+        self.row_offsets = _window_offsets(raster.height, self.window[0], self.stride[0])
+        self.col_offsets = _window_offsets(raster.width, self.window[1], self.stride[1])
+
+    @property
+    def images(self):
+        return _Windows(self)
+
+    def __iter__(self):
+        height, width = self.window
+        centres_x = np.asarray(self.col_offsets, dtype=np.float64) + width / 2
+
+        for row in self.row_offsets:
+            lats, lons = self.raster.to_latlon(centres_x, np.full(len(centres_x), row + height / 2))
+            for lat, lon in zip(np.round(lats, 6).tolist(), np.round(lons, 6).tolist()):
+                yield {"lat": lat, "lon": lon}
+
+    def __len__(self):
+        return len(self.row_offsets) * len(self.col_offsets)
+
+
+def _pair(value, default):
+    """(h, w) from "N", "HxW" or an [h, w] list; default if empty."""
+    if value in (None, ""):
+        return default
+    if isinstance(value, (list, tuple)):
+        return int(value[0]), int(value[1])
+
+    parts = str(value).lower().split("x")
+    if len(parts) == 1:
+        return int(parts[0]), int(parts[0])
+    return int(parts[0]), int(parts[1])
+
+
+def parse_raster_job(form, cfg):
+    """
+    Raster job parameters from request/job fields. Raises ValueError on bad input.
+        path   : raster file, relative to cfg.raster_dir
+        window : "N" or "HxW" pixels (default cfg.raster_window, else the model's image_size)
+        stride : "N" or "HxW" pixels (default cfg.raster_stride, else the window)
+    """
+    path = (form.get("path") or "").strip()
+    if not path:
+        raise ValueError("A raster path is required.")
+
+    try:
+        window = _pair(form.get("window"), cfg.raster_window or tuple(cfg.image_size))
+        stride = _pair(form.get("stride"), cfg.raster_stride or window)
+    except (TypeError, ValueError, IndexError):
+        raise ValueError("Invalid window or stride.")
+
+    return {"path": path, "window": list(window), "stride": list(stride)}
+
+
+def resolve_raster_path(path, cfg):
+    """Absolute path of a raster inside cfg.raster_dir; anything outside it is refused."""
+    root = os.path.realpath(cfg.raster_dir)
+    full = os.path.realpath(os.path.join(root, path))
+
+    if not full.startswith(root + os.sep) or not os.path.isfile(full):
+        raise ValueError("Raster not found.")
+
+    return full
+
+
+def plan_raster(params, cfg):
+    """RasterPlan for parse_raster_job parameters, checked against cfg.raster_max_windows."""
+    try:
+        raster = open_raster(resolve_raster_path(params["path"], cfg))
+    except OSError as e:
+        raise ValueError(f"Could not open raster: {str(e)}")
+
+    plan = RasterPlan(raster, params["window"], params["stride"])
+
+    if len(plan) > cfg.raster_max_windows:
+        raise ValueError(f"Raster too large for this stride (maximum {cfg.raster_max_windows} windows).")
+
+    return plan
@@ -0,0 +1,226 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+    rate  : tokens added per second (sustained request rate)
+    burst : bucket capacity (requests allowed back to back)
+    """
+
+    def __init__(self, rate, burst):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be > 0 and burst >= 1")
+
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+        self.acquired = 0
+        self.waited_seconds = 0.0
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout=None):
+        """
+        Take one token, sleeping until it is available.
+        Returns False (without taking a token) if the wait would exceed timeout.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+
+            wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if timeout is not None and wait > timeout:
+                return False
+
+            # Reserve the token now so concurrent callers queue up fairly
+            self._tokens -= 1
+            self.acquired += 1
+            self.waited_seconds += wait
+
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    def stats(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "tokens": round(self._tokens, 3),
+                "acquired": self.acquired,
+                "waited_seconds": round(self.waited_seconds, 3),
+            }
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS token_buckets (
+    provider TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    Token bucket whose state lives in a SQLite row, so every process on the
+    host (gunicorn workers, job pool processes) draws from the same quota.
+
+    Each acquire is one BEGIN IMMEDIATE transaction: refill from the wall
+    clock, reserve a token, write the row back. If the database cannot be
+    used the request goes ahead unthrottled (logged), the limiter never
+    takes the fetch path down.
+    """
+
+    def __init__(self, db_path, provider, rate, burst):
+        super().__init__(rate, burst)
+        self.db_path = db_path
+        self.provider = provider
+        self._local = threading.local()
+
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit: transactions are opened explicitly with BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _tokens_at(self, row, now):
+        if row is None:
+            return self.burst
+        return min(self.burst, row[0] + max(0.0, now - row[1]) * self.rate)
+
+    def acquire(self, timeout=None):
+        try:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = conn.execute(
+                    "SELECT tokens, updated FROM token_buckets WHERE provider = ?", (self.provider,)
+                ).fetchone()
+                tokens = self._tokens_at(row, now)
+
+                wait = 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+                if timeout is not None and wait > timeout:
+                    conn.execute("ROLLBACK")
+                    return False
+
+                conn.execute(
+                    "INSERT OR REPLACE INTO token_buckets (provider, tokens, updated) VALUES (?, ?, ?)",
+                    (self.provider, tokens - 1, now)
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            logging.warning(f"Shared rate limit unavailable for {self.provider}, not throttling: {e}")
+            return True
+
+        with self._lock:
+            self.acquired += 1
+            self.waited_seconds += wait
+
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    def stats(self):
+        try:
+            row = self._conn().execute(
+                "SELECT tokens, updated FROM token_buckets WHERE provider = ?", (self.provider,)
+            ).fetchone()
+            tokens = round(self._tokens_at(row, time.time()), 3)
+        except sqlite3.Error:
+            tokens = None
+
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "tokens": tokens,
+                "acquired": self.acquired,
+                "waited_seconds": round(self.waited_seconds, 3),
+                "shared": True,
+            }
+
+
+_limits = {}
+_default_limit = None
+_shared_db = None
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def configure_rate_limits(cfg):
+    """Load per-provider limits from Config; existing buckets are dropped."""
+    global _limits, _default_limit, _shared_db
+
+    with _buckets_lock:
+        _limits = dict(cfg.tile_rate_limits or {})
+        _default_limit = cfg.tile_rate_limit_default
+        _shared_db = cfg.tile_rate_limit_db
+        _buckets.clear()
+
+
+def provider_key(url):
+    """Providers are identified by URL host; local sources share one key."""
+    return urlparse(url).netloc or "local"
+
+
+def get_rate_limiter(provider):
+    """Return the shared bucket for a provider, or None if it is unlimited."""
+    bucket = _buckets.get(provider)
+    if bucket is not None:
+        return bucket
+
+    limit = _limits.get(provider, _default_limit)
+    if not limit:
+        return None
+
+    with _buckets_lock:
+        bucket = _buckets.get(provider)
+        if bucket is None:
+            bucket = _new_bucket(provider, limit)
+            _buckets[provider] = bucket
+
+    return bucket
+
+
+def _new_bucket(provider, limit):
+    if _shared_db:
+        try:
+            return SharedTokenBucket(_shared_db, provider, limit["rate"], limit["burst"])
+        except (OSError, sqlite3.Error) as e:
+            logging.error(f"Shared rate limit disabled, cannot use {_shared_db}: {e}")
+
+    return TokenBucket(limit["rate"], limit["burst"])
+
+
+def rate_limit_stats():
+    with _buckets_lock:
+        buckets = dict(_buckets)
+    return {provider: bucket.stats() for provider, bucket in buckets.items()}
@@ -0,0 +1,138 @@
+import math
+import time
+import threading
+from collections import OrderedDict
+
+METERS_PER_DEGREE = 111000
+
+
+class SpatialResultCache:
+    """
+    Recent predictions indexed by a lat/lon grid hash.
+
+    Cells are radius_m tall, so a lookup only scans the 3 rows of cells
+    around the query point (and as many columns as the radius spans in
+    longitude at that latitude) instead of every cached result. Entries
+    expire after ttl seconds; the oldest entries are dropped beyond
+    max_entries.
+    """
+
+    def __init__(self, radius_m=10, ttl=3600, max_entries=500):
+        self.radius_m = radius_m
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.cell_deg = radius_m / METERS_PER_DEGREE
+
+        self._cells = {}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        cell = self._cells.get(entry["cell"])
+        if cell is not None:
+            cell.discard(entry_id)
+            if not cell:
+                del self._cells[entry["cell"]]
+
+    def _expire(self, now):
+        # Entries are in insertion order, so expired ones are at the front
+        while self._entries:
+            entry_id, entry = next(iter(self._entries.items()))
+            if now - entry["created"] <= self.ttl and len(self._entries) <= self.max_entries:
+                break
+            self._remove(entry_id)
+
+    def get(self, lat, lon):
+        """Nearest fresh result within radius_m of lat/lon, or None."""
+        now = time.time()
+        ci, cj = self._cell(lat, lon)
+
+        cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+        lon_span = math.ceil(1 / cos_lat)
+
+        best = None
+        best_dist = self.radius_m
+
+        with self._lock:
+            self._expire(now)
+
+            for i in range(ci - 1, ci + 2):
+                for j in range(cj - lon_span, cj + lon_span + 1):
+                    for entry_id in self._cells.get((i, j), ()):
+                        entry = self._entries[entry_id]
+                        dy = (entry["lat"] - lat) * METERS_PER_DEGREE
+                        dx = (entry["lon"] - lon) * METERS_PER_DEGREE * cos_lat
+                        dist = math.hypot(dx, dy)
+                        if dist <= best_dist:
+                            best, best_dist = entry, dist
+
+            if best is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return dict(best["result"])
+
+    def put(self, lat, lon, result):
+        """Cache a result dict (label, confidence, ...) for lat/lon."""
+        now = time.time()
+        cell = self._cell(lat, lon)
+
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+
+            self._entries[entry_id] = {
+                "lat": lat,
+                "lon": lon,
+                "cell": cell,
+                "created": now,
+                "result": dict(result)
+            }
+            self._cells.setdefault(cell, set()).add(entry_id)
+            self._expire(now)
+
+    def clear(self):
+        with self._lock:
+            self._cells.clear()
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_result_cache = None
+
+
+def configure_result_cache(cfg):
+    global _result_cache
+
+    if not cfg.result_cache_enabled:
+        _result_cache = None
+        return None
+
+    _result_cache = SpatialResultCache(
+        radius_m=cfg.result_cache_radius_m,
+        ttl=cfg.result_cache_ttl,
+        max_entries=cfg.result_cache_max_entries
+    )
+    return _result_cache
+
+
+def get_result_cache():
+    return _result_cache
@@ -1,10 +1,13 @@
-import cv2
 import numpy as np
-import requests
-import threading
 import logging
 import time
 
+from app.services.tile_cache import get_tile_cache
+from app.services.tile_fetcher import get_tile_fetcher
+from app.services.rate_limiter import get_rate_limiter, provider_key
+from app.services.tile_providers import get_tile_provider, read_local_tile, is_remote
+from app.services.metrics import stage
+
 DEFAULT_HEADERS = {
     'User-Agent': 'SolarDetectionApp/1.0',
     'Accept': 'image/webp,image/*,*/*;q=0.8',
@@ -20,15 +23,54 @@ def project_with_scale(lat, lon, scale):
     y = scale * (0.5 - np.log((1 + siny) / (1 - siny)) / (4 * np.pi))
     return x, y
 
-def download_tile(url, headers, channels):
-    """Downloads a single tile with safe error handling."""
+def decode_tile(data, channels):
+    import cv2
+
+    with stage("decode"):
+        arr = np.asarray(bytearray(data), dtype=np.uint8)
+        return cv2.imdecode(arr, 1) if channels == 3 else cv2.imdecode(arr, -1)
+
+
+def download_tile(url, headers, channels, tile_key=None):
+    """Downloads a single tile with safe error handling.
+    url: a remote http(s) tile URL, or a local file:// / mbtiles:// one (see tile_providers).
+    tile_key: optional (url_template, z, x, y) used to read/write the on-disk tile cache."""
+    if not is_remote(url):
+        # Local sources are already on disk: no tile cache, no rate limit
+        try:
+            with stage("fetch"):
+                data = read_local_tile(url)
+            if data is None:
+                raise Exception("Tile not found")
+            return decode_tile(data, channels)
+        except Exception as e:
+            logging.error(f"Error reading tile {url}: {e}")
+            return None
+
+    cache = get_tile_cache() if tile_key is not None else None
+
     try:
-        response = requests.get(url, headers=headers)
+        if cache is not None:
+            data = cache.get_tile(*tile_key)
+            if data is not None:
+                tile = decode_tile(data, channels)
+                if tile is not None:
+                    return tile
+
+        # Cache hits are free; only network requests spend provider quota
+        with stage("fetch"):
+            limiter = get_rate_limiter(provider_key(url))
+            response = get_tile_fetcher().get(url, headers=headers, limiter=limiter)
         if response.status_code != 200:
             raise Exception(f"Failed to download tile: Status {response.status_code}")
         
-        arr = np.asarray(bytearray(response.content), dtype=np.uint8)
-        return cv2.imdecode(arr, 1) if channels == 3 else cv2.imdecode(arr, -1)
+        tile = decode_tile(response.content, channels)
+
+        # Only cache bytes that actually decode
+        if cache is not None and tile is not None:
+            cache.put_tile(*tile_key, response.content)
+
+        return tile
     
     except Exception as e:
         logging.error(f"Error downloading tile: {e}")
@@ -57,54 +99,84 @@ def download_image(lat1: float, lon1: float, lat2: float, lon2: float,zoom: int,
 
     img = np.zeros((img_h, img_w, channels), np.uint8)
 
-    def build_row(tile_y):
-        for tile_x in range(tl_tile_x, br_tile_x + 1):
-            tile = download_tile(url.format(x=tile_x, y=tile_y, z=zoom), headers, channels)
-            if tile is not None:
+    def build_tile(tile_x, tile_y):
+        tile = download_tile(url.format(x=tile_x, y=tile_y, z=zoom), headers, channels, (url, zoom, tile_x, tile_y))
+        if tile is not None:
 
-                tl_rel_x = tile_x * tile_size - tl_pixel_x
-                tl_rel_y = tile_y * tile_size - tl_pixel_y
-                br_rel_x = tl_rel_x + tile_size
-                br_rel_y = tl_rel_y + tile_size
+            tl_rel_x = tile_x * tile_size - tl_pixel_x
+            tl_rel_y = tile_y * tile_size - tl_pixel_y
+            br_rel_x = tl_rel_x + tile_size
+            br_rel_y = tl_rel_y + tile_size
 
-                img_x_l = max(0, tl_rel_x)
-                img_x_r = min(img_w, br_rel_x)
-                img_y_l = max(0, tl_rel_y)
-                img_y_r = min(img_h, br_rel_y)
+            img_x_l = max(0, tl_rel_x)
+            img_x_r = min(img_w, br_rel_x)
+            img_y_l = max(0, tl_rel_y)
+            img_y_r = min(img_h, br_rel_y)
 
-                cr_x_l = max(0, -tl_rel_x)
-                cr_x_r = tile_size + min(0, img_w - br_rel_x)
-                cr_y_l = max(0, -tl_rel_y)
-                cr_y_r = tile_size + min(0, img_h - br_rel_y)
+            cr_x_l = max(0, -tl_rel_x)
+            cr_x_r = tile_size + min(0, img_w - br_rel_x)
+            cr_y_l = max(0, -tl_rel_y)
+            cr_y_r = tile_size + min(0, img_h - br_rel_y)
 
-                try:
+            try:
+                with stage("stitch"):
                     img[img_y_l:img_y_r, img_x_l:img_x_r] = tile[cr_y_l:cr_y_r, cr_x_l:cr_x_r]
-                except Exception as e:
-                    logging.error(f"Tile merge error at tile ({tile_x}, {tile_y}): {e}")
+            except Exception as e:
+                logging.error(f"Tile merge error at tile ({tile_x}, {tile_y}): {e}")
 
-    threads = []
-    for tile_y in range(tl_tile_y, br_tile_y + 1):
-        thread = threading.Thread(target=build_row, args=[tile_y])
-        thread.start()
-        threads.append(thread)
+    # Tiles go through the shared bounded executor instead of one thread per row
+    fetcher = get_tile_fetcher()
+    futures = [
+        fetcher.submit(build_tile, tile_x, tile_y)
+        for tile_y in range(tl_tile_y, br_tile_y + 1)
+        for tile_x in range(tl_tile_x, br_tile_x + 1)
+    ]
 
-    for thread in threads:
-        thread.join()
+    for future in futures:
+        future.result()
 
     return img
 
-def get_image(lat, lon, zoom=18, channels=3, retries=3):
-    """Enhanced with retry logic and timeout"""
-    lat1 = round(lat + 0.0008, 4)
-    lon1 = round(lon - 0.0015, 4)
-    lat2 = round(lat - 0.0008, 4)
-    lon2 = round(lon + 0.0015, 4)
-    
-    url = 'https://mt.google.com/vt/lyrs=s&x={x}&y={y}&z={z}'
-    
+# Default remote provider (Config.tile_provider selects the source in use)
+GOOGLE_SATELLITE_URL = 'https://mt.google.com/vt/lyrs=s&x={x}&y={y}&z={z}'
+
+
+# Half height / half width in degrees of the window fed to the model
+MODEL_WINDOW = (0.0008, 0.0015)
+
+
+def get_bbox(lat, lon, extent=None):
+    """Bounding box (lat1, lon1, lat2, lon2) of the model window centred on lat/lon.
+    extent: optional (half_lat, half_lon) in degrees replacing MODEL_WINDOW, e.g. a screening cell."""
+    half_lat, half_lon = extent or MODEL_WINDOW
+    lat1 = round(lat + half_lat, 4)
+    lon1 = round(lon - half_lon, 4)
+    lat2 = round(lat - half_lat, 4)
+    lon2 = round(lon + half_lon, 4)
+    return lat1, lon1, lat2, lon2
+
+
+def pixel_window(lat1, lon1, lat2, lon2, zoom, tile_size=256):
+    """Global pixel (x, y, width, height) covered by a bbox, as computed in download_image."""
+    scale = 1 << zoom
+
+    tl_proj_x, tl_proj_y = project_with_scale(lat1, lon1, scale)
+    br_proj_x, br_proj_y = project_with_scale(lat2, lon2, scale)
+
+    tl_pixel_x = int(tl_proj_x * tile_size)
+    tl_pixel_y = int(tl_proj_y * tile_size)
+    br_pixel_x = int(br_proj_x * tile_size)
+    br_pixel_y = int(br_proj_y * tile_size)
+
+    return tl_pixel_x, tl_pixel_y, abs(tl_pixel_x - br_pixel_x), br_pixel_y - tl_pixel_y
+
+
+def _download_with_retries(lat1, lon1, lat2, lon2, zoom, channels, retries):
+    provider = get_tile_provider()
+
     for attempt in range(retries):
         try:
-            img = download_image(lat1, lon1, lat2, lon2, zoom, url, DEFAULT_HEADERS, 256, channels)
+            img = download_image(lat1, lon1, lat2, lon2, zoom, provider.url_template, provider.headers, 256, channels)
             
             if img is not None:
                 return img
@@ -114,5 +186,56 @@ def get_image(lat, lon, zoom=18, channels=3, retries=3):
 
         time.sleep(0.5 * (attempt + 1))  # exponential backoff
 
+    return None
+
+
+def get_image(lat, lon, zoom=18, channels=3, retries=3, extent=None):
+    """Enhanced with retry logic and timeout"""
+    lat1, lon1, lat2, lon2 = get_bbox(lat, lon, extent)
+
+    img = _download_with_retries(lat1, lon1, lat2, lon2, zoom, channels, retries)
+    if img is not None:
+        return img
+
     logging.error(f"All {retries} attempts to download image failed for coordinates ({lat}, {lon})")
-    return None
\ No newline at end of file
+    return None
+
+
+def get_images_mosaic(centers, zoom=18, channels=3, retries=3):
+    """
+    Fetch the windows for many nearby centers from one shared mosaic.
+
+    The union of all bounding boxes is downloaded once (every XYZ tile is
+    fetched and decoded a single time) and each center's window is returned
+    as a view into that array, pixel-identical to what get_image would
+    produce on its own.
+
+    centers: list of (lat, lon)
+    Returns a list of ndarray views in the same order, or None if the
+    mosaic could not be downloaded.
+    """
+    if not centers:
+        return []
+
+    boxes = [get_bbox(lat, lon) for lat, lon in centers]
+
+    mosaic_lat1 = max(b[0] for b in boxes)
+    mosaic_lon1 = min(b[1] for b in boxes)
+    mosaic_lat2 = min(b[2] for b in boxes)
+    mosaic_lon2 = max(b[3] for b in boxes)
+
+    mosaic = _download_with_retries(mosaic_lat1, mosaic_lon1, mosaic_lat2, mosaic_lon2, zoom, channels, retries)
+    if mosaic is None:
+        logging.error(f"All {retries} attempts to download scan mosaic failed for {len(centers)} centers")
+        return None
+
+    origin_x, origin_y, _, _ = pixel_window(mosaic_lat1, mosaic_lon1, mosaic_lat2, mosaic_lon2, zoom)
+
+    windows = []
+    for box in boxes:
+        x, y, w, h = pixel_window(*box, zoom)
+        x -= origin_x
+        y -= origin_y
+        windows.append(mosaic[y:y + h, x:x + w])
+
+    return windows
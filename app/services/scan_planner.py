@@ -0,0 +1,274 @@
+import json
+import math
+
+import numpy as np
+
+from app.utils.helper import validate_latlon
+
+METERS_PER_DEGREE = 111000
+
+SHAPES = ("grid", "radius", "polygon")
+
+
+def _polygons(geojson):
+    """List of polygons (each a list of (N, 2) lon/lat ring arrays) from a GeoJSON
+    Polygon, MultiPolygon, Feature or FeatureCollection."""
+    if isinstance(geojson, str):
+        geojson = json.loads(geojson)
+
+    kind = geojson.get("type")
+
+    if kind == "FeatureCollection":
+        return [p for feature in geojson.get("features", []) for p in _polygons(feature)]
+    if kind == "Feature":
+        return _polygons(geojson.get("geometry") or {})
+    if kind == "Polygon":
+        parts = [geojson["coordinates"]]
+    elif kind == "MultiPolygon":
+        parts = geojson["coordinates"]
+    else:
+        raise ValueError("GeoJSON must be a Polygon or MultiPolygon.")
+
+    polygons = []
+    for rings in parts:
+        arrays = [np.asarray(ring, dtype=np.float64)[:, :2] for ring in rings]
+        if not arrays or any(len(a) < 3 for a in arrays):
+            raise ValueError("Polygon rings need at least 3 points.")
+        polygons.append(arrays)
+
+    return polygons
+
+
+def points_in_polygon(lons, lats, rings, edge_chunk=512):
+    """
+    Even-odd ray casting for many points at once. Holes are handled by the
+    rule itself (a point inside a hole crosses the outer ring and the hole).
+    lons, lats: 1-D arrays of the same length. Returns a bool mask.
+    """
+    x = lons[:, None]
+    y = lats[:, None]
+    crossings = np.zeros(len(lons), dtype=np.int64)
+
+    for ring in rings:
+        x1, y1 = ring[:, 0], ring[:, 1]
+        x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+
+        for start in range(0, len(ring), edge_chunk):
+            ex1, ey1 = x1[start:start + edge_chunk], y1[start:start + edge_chunk]
+            ex2, ey2 = x2[start:start + edge_chunk], y2[start:start + edge_chunk]
+
+            straddles = (ey1 > y) != (ey2 > y)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                x_cross = ex1 + (y - ey1) * (ex2 - ex1) / (ey2 - ey1)
+            crossings += np.count_nonzero(straddles & (x < x_cross), axis=1)
+
+    return crossings % 2 == 1
+
+
+def _with_mode(area, form):
+    if form.get("hierarchical") not in (None, "", "0", "false", False):
+        area["hierarchical"] = True
+    return area
+
+
+def parse_scan_area(form):
+    """
+    Scan area from request/job parameters. Raises ValueError on bad input.
+        shape=grid    : lat, lon, rows, cols (default 5 x 5)
+        shape=radius  : lat, lon, radius_m
+        shape=polygon : polygon (GeoJSON text)
+    hierarchical (any shape): screen coarse cells at a lower zoom first.
+    """
+    shape = form.get("shape") or "grid"
+    if shape not in SHAPES:
+        raise ValueError(f"Unknown scan shape '{shape}'.")
+
+    if shape == "polygon":
+        text = form.get("polygon")
+        if not text:
+            raise ValueError("A GeoJSON polygon is required.")
+        try:
+            geometry = json.loads(text) if isinstance(text, str) else text
+            _polygons(geometry)
+        except (ValueError, KeyError, TypeError, IndexError, AttributeError):
+            raise ValueError("Invalid GeoJSON polygon.")
+        return _with_mode({"shape": shape, "polygon": geometry}, form)
+
+    try:
+        lat, lon = validate_latlon(form.get("lat"), form.get("lon"))
+    except (TypeError, ValueError):
+        raise ValueError("Invalid latitude or longitude values.")
+
+    if shape == "radius":
+        try:
+            radius_m = float(form.get("radius_m"))
+        except (TypeError, ValueError):
+            raise ValueError("Invalid scan radius.")
+        if not radius_m > 0:
+            raise ValueError("Scan radius must be positive.")
+        return _with_mode({"shape": shape, "lat": lat, "lon": lon, "radius_m": radius_m}, form)
+
+    try:
+        rows = int(form.get("rows") or 5)
+        cols = int(form.get("cols") or 5)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid scan grid size.")
+    if rows < 1 or cols < 1:
+        raise ValueError("Scan grid size must be at least 1 x 1.")
+    return _with_mode({"shape": shape, "lat": lat, "lon": lon, "rows": rows, "cols": cols}, form)
+
+
+class ScanPlan:
+    """
+    Lazy tile plan for a scan area.
+
+    The area is covered by a rows x cols grid of tile_width_m x tile_height_m
+    cells (row 0 in the south, columns west to east). Radius and polygon
+    areas keep only the cells whose centre lies inside the shape. Cells are
+    generated and filtered with NumPy a block of rows at a time, so iterating
+    a 100k-tile plan never holds more than one block in memory.
+
+    Iterating yields {"lat", "lon"} dicts, the input the prediction pipeline
+    consumes; len() is the number of tiles.
+    """
+
+    def __init__(self, area, tile_width_m=333, tile_height_m=177, block_cells=4096):
+        self.area = area
+        self.block_cells = block_cells
+
+        shape = area["shape"]
+
+        if shape == "polygon":
+            self._polygons = _polygons(area["polygon"])
+            points = np.concatenate([ring for rings in self._polygons for ring in rings])
+            lon_min, lat_min = points.min(axis=0)
+            lon_max, lat_max = points.max(axis=0)
+            lat, lon = float(lat_min + lat_max) / 2, float(lon_min + lon_max) / 2
+        else:
+            lat, lon = area["lat"], area["lon"]
+
+        meters_per_degree_lon = METERS_PER_DEGREE * np.cos(np.radians(lat))
+        self.step_lat = tile_height_m / METERS_PER_DEGREE
+        self.step_lon = tile_width_m / meters_per_degree_lon
+
+        if shape == "grid":
+            self.rows, self.cols = area["rows"], area["cols"]
+        elif shape == "radius":
+            self.rows = 2 * int(area["radius_m"] // tile_height_m) + 1
+            self.cols = 2 * int(area["radius_m"] // tile_width_m) + 1
+        else:
+            self.rows = max(1, math.ceil((lat_max - lat_min) / self.step_lat))
+            self.cols = max(1, math.ceil((lon_max - lon_min) / self.step_lon))
+
+        # Grid centred on (lat, lon), same layout as the original 5 x 5 scan
+        self.center = (lat, lon)
+        self.start_lat = lat - (self.step_lat * self.rows / 2) + (self.step_lat / 2)
+        self.start_lon = lon - (self.step_lon * self.cols / 2) + (self.step_lon / 2)
+
+        self._count = None
+
+    @property
+    def candidates(self):
+        """Cells in the bounding grid, before shape filtering."""
+        return self.rows * self.cols
+
+    def _mask(self, lats, lons):
+        shape = self.area["shape"]
+
+        if shape == "radius":
+            dy = (lats - self.center[0]) * METERS_PER_DEGREE
+            dx = (lons - self.center[1]) * METERS_PER_DEGREE * np.cos(np.radians(self.center[0]))
+            return dx * dx + dy * dy <= self.area["radius_m"] ** 2
+
+        if shape == "polygon":
+            inside = np.zeros(len(lats), dtype=bool)
+            for rings in self._polygons:
+                inside |= points_in_polygon(lons, lats, rings)
+            return inside
+
+        return None
+
+    def _iter_cells(self, rows_per_block):
+        """(row_idx, col_idx, lats, lons) arrays per block of grid rows, filtered to the shape."""
+        col_idx_row = np.arange(self.cols)
+        lons_row = self.start_lon + col_idx_row * self.step_lon
+
+        for first in range(0, self.rows, rows_per_block):
+            row_idx = np.repeat(np.arange(first, min(first + rows_per_block, self.rows)), self.cols)
+            col_idx = np.tile(col_idx_row, len(row_idx) // self.cols)
+            lats = self.start_lat + row_idx * self.step_lat
+            lons = lons_row[col_idx]
+
+            mask = self._mask(lats, lons)
+            if mask is not None:
+                row_idx, col_idx, lats, lons = row_idx[mask], col_idx[mask], lats[mask], lons[mask]
+
+            if len(lats):
+                yield row_idx, col_idx, lats, lons
+
+    def iter_blocks(self):
+        """(lats, lons) arrays per block of grid rows, already filtered to the shape."""
+        for _, _, lats, lons in self._iter_cells(max(1, self.block_cells // self.cols)):
+            yield np.round(lats, 6), np.round(lons, 6)
+
+    def iter_groups(self, factor):
+        """
+        Coarse cells of factor x factor grid cells, for screening scans.
+        Yields {"lat", "lon", "cells"}: the centre of the coarse cell and the
+        {"lat", "lon"} tiles of this plan inside it. Coarse cells without any
+        tile (outside a radius or polygon) are not yielded.
+        """
+        if self.count() == 0:
+            cell = next(iter(self))
+            yield {"lat": cell["lat"], "lon": cell["lon"], "cells": [cell]}
+            return
+
+        coarse_cols = -(-self.cols // factor)
+        # Blocks hold whole rows of coarse cells
+        rows_per_block = factor * max(1, self.block_cells // (self.cols * factor))
+
+        for row_idx, col_idx, lats, lons in self._iter_cells(rows_per_block):
+            keys = (row_idx // factor) * coarse_cols + col_idx // factor
+            order = np.argsort(keys, kind="stable")
+            keys, lats, lons = keys[order], np.round(lats[order], 6), np.round(lons[order], 6)
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+            for start, end in zip(starts.tolist(), np.r_[starts[1:], len(keys)].tolist()):
+                coarse_row, coarse_col = divmod(int(keys[start]), coarse_cols)
+                yield {
+                    "lat": round(self.start_lat + (coarse_row * factor + (factor - 1) / 2) * self.step_lat, 6),
+                    "lon": round(self.start_lon + (coarse_col * factor + (factor - 1) / 2) * self.step_lon, 6),
+                    "cells": [
+                        {"lat": lat, "lon": lon}
+                        for lat, lon in zip(lats[start:end].tolist(), lons[start:end].tolist())
+                    ]
+                }
+
+    def __iter__(self):
+        if self.count() == 0:
+            # Polygon smaller than one cell: scan the tile at its centre
+            yield {"lat": round(self.center[0], 6), "lon": round(self.center[1], 6)}
+            return
+
+        for lats, lons in self.iter_blocks():
+            for lat, lon in zip(lats.tolist(), lons.tolist()):
+                yield {"lat": lat, "lon": lon}
+
+    def count(self):
+        if self._count is None:
+            self._count = sum(len(lats) for lats, _ in self.iter_blocks())
+        return self._count
+
+    def __len__(self):
+        return max(self.count(), 1) if self.area["shape"] == "polygon" else self.count()
+
+
+def plan_scan(area, cfg):
+    """ScanPlan for an area (see parse_scan_area), checked against cfg.scan_max_tiles."""
+    plan = ScanPlan(area, cfg.scan_tile_width_m, cfg.scan_tile_height_m)
+
+    # Refuse before filtering: a huge bounding grid is slow to even count
+    if plan.candidates > cfg.scan_max_tiles * 16 or len(plan) > cfg.scan_max_tiles:
+        raise ValueError(f"Scan area too large (maximum {cfg.scan_max_tiles} tiles).")
+
+    return plan
@@ -0,0 +1,218 @@
+import os
+import hashlib
+import logging
+import tempfile
+import threading
+
+
+class DiskCache:
+    """
+    Size-capped on-disk byte cache with LRU eviction.
+
+    Entries are plain files, so several gunicorn workers can share one
+    cache directory:
+        - writes go to a temp file in the target directory and are moved
+          into place with os.replace (atomic on POSIX and Windows)
+        - a hit bumps the file mtime, which is the LRU clock
+        - eviction deletes the oldest files until the cache is back under
+          low_water * max_bytes; files already removed by another worker
+          are simply skipped
+    """
+
+    SUFFIX = ".bin"
+
+    def __init__(self, root, max_bytes, low_water=0.9):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self.low_water = low_water
+
+        self._lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+        os.makedirs(self.root, exist_ok=True)
+        self._size = self._scan_size()
+
+    def _path(self, key):
+        parts = [str(k) for k in key]
+        return os.path.join(self.root, *parts[:-1], parts[-1] + self.SUFFIX)
+
+    def _iter_entries(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if not name.endswith(self.SUFFIX):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._iter_entries())
+
+    def get(self, key):
+        """Return cached bytes for key or None."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except (FileNotFoundError, NotADirectoryError):
+            with self._lock:
+                self.misses += 1
+            return None
+        except OSError as e:
+            logging.warning(f"Cache read error for {path}: {e}")
+            with self._lock:
+                self.misses += 1
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """Store bytes for key. Errors are logged, never raised."""
+        if not data or len(data) > self.max_bytes:
+            return
+
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                # An overwrite replaces the old file's bytes rather than adding to them
+                try:
+                    replaced = os.path.getsize(path)
+                except OSError:
+                    replaced = 0
+                os.replace(tmp_path, path)
+            except Exception:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+        except OSError as e:
+            logging.warning(f"Cache write error for {path}: {e}")
+            return
+
+        with self._lock:
+            self.writes += 1
+            self._size += len(data) - replaced
+            over_budget = self._size > self.max_bytes
+
+        if over_budget:
+            self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until under the low-water mark."""
+        if not self._evict_lock.acquire(blocking=False):
+            return  # another thread is already evicting
+
+        try:
+            entries = list(self._iter_entries())
+            total = sum(size for _, size, _ in entries)
+            target = int(self.max_bytes * self.low_water)
+            removed = 0
+
+            if total > target:
+                entries.sort(key=lambda e: e[2])
+                for path, size, _ in entries:
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(path)
+                        removed += 1
+                    except FileNotFoundError:
+                        pass
+                    except OSError as e:
+                        logging.warning(f"Cache evict error for {path}: {e}")
+                        continue
+                    total -= size
+
+            with self._lock:
+                self._size = total
+                self.evictions += removed
+        finally:
+            self._evict_lock.release()
+
+    def clear(self):
+        for path, _, _ in list(self._iter_entries()):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        with self._lock:
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
+
+
+class TileCache(DiskCache):
+    """
+    Encoded XYZ tile bytes keyed by (source, z, x, y).
+
+    source is the provider URL template the tile was fetched from; each
+    provider gets its own subdirectory (a hash of the template), so
+    switching tile_provider never serves another provider's imagery.
+    """
+
+    SUFFIX = ".tile"
+
+    @staticmethod
+    def namespace(source):
+        return hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+
+    def get_tile(self, source, z, x, y):
+        return self.get((self.namespace(source), z, x, y))
+
+    def put_tile(self, source, z, x, y, data):
+        self.put((self.namespace(source), z, x, y), data)
+
+
+_tile_cache = None
+
+
+def configure_tile_cache(cfg):
+    """Create the process-wide tile cache from Config (or disable it)."""
+    global _tile_cache
+
+    if not cfg.tile_cache_enabled:
+        _tile_cache = None
+        return None
+
+    try:
+        _tile_cache = TileCache(cfg.tile_cache_dir, cfg.tile_cache_max_bytes)
+    except OSError as e:
+        logging.error(f"Tile cache disabled, cannot use {cfg.tile_cache_dir}: {e}")
+        _tile_cache = None
+
+    return _tile_cache
+
+
+def get_tile_cache():
+    return _tile_cache
@@ -0,0 +1,183 @@
+import time
+import atexit
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.services.metrics import in_context
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Longest Retry-After honoured; a provider asking for more fails the tile instead
+MAX_RETRY_AFTER = 30.0
+
+
+def retry_after_seconds(response):
+    """Seconds from a Retry-After header (delta or HTTP date), or None."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TileFetcher:
+    """
+    Process-wide tile fetch engine.
+
+    Owns one pooled requests.Session (keep-alive connections are reused
+    across tiles and requests) and one bounded ThreadPoolExecutor, so the
+    number of concurrent tile downloads stays fixed no matter how many
+    scans run at once.
+
+    Retries (connection errors, 429 and 5xx) are done here rather than by
+    urllib3, so every attempt takes a rate limiter token and a Retry-After
+    header is honoured.
+    """
+
+    def __init__(self, max_workers=16, pool_size=32, connect_timeout=3.05, read_timeout=10, retries=2,
+                 backoff_factor=0.2):
+        self.max_workers = max_workers
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = max(0, int(retries))
+        self.backoff_factor = backoff_factor
+
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tile-fetch")
+
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._completed = 0
+        self._failed = 0
+
+    def get(self, url, headers=None, limiter=None):
+        """
+        GET a url through the pooled session with connect/read timeouts.
+        limiter: optional rate limiter; a token is taken before every attempt.
+        The last response is returned even if its status is still retryable.
+        """
+        for attempt in range(self.retries + 1):
+            if limiter is not None:
+                limiter.acquire()
+
+            delay = self.backoff_factor * (2 ** attempt)
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    return response
+
+                retry_after = retry_after_seconds(response)
+                if retry_after is not None:
+                    if retry_after > MAX_RETRY_AFTER:
+                        return response
+                    delay = max(delay, retry_after)
+                response.close()
+
+            time.sleep(delay)
+
+    def submit(self, fn, *args, **kwargs):
+        """Run fn on the shared executor, tracking queue depth."""
+        with self._lock:
+            self._queued += 1
+
+        def task():
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                with self._lock:
+                    self._failed += 1
+                raise
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._completed += 1
+            return result
+
+        try:
+            # Tiles keep the caller's route label for the stage timers
+            return self.executor.submit(in_context(task))
+        except Exception:
+            with self._lock:
+                self._queued -= 1
+            raise
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "queue_depth": self._queued,
+                "active": self._active,
+                "completed": self._completed,
+                "failed": self._failed,
+            }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def configure_tile_fetcher(cfg):
+    """(Re)create the process-wide fetcher from Config."""
+    global _fetcher
+
+    with _fetcher_lock:
+        if _fetcher is not None:
+            _fetcher.shutdown()
+
+        _fetcher = TileFetcher(
+            max_workers=cfg.fetch_max_workers,
+            pool_size=cfg.fetch_pool_size,
+            connect_timeout=cfg.fetch_connect_timeout,
+            read_timeout=cfg.fetch_read_timeout,
+            retries=cfg.fetch_retries
+        )
+
+    return _fetcher
+
+
+def get_tile_fetcher():
+    """Return the shared fetcher, creating one with defaults if needed."""
+    global _fetcher
+
+    if _fetcher is None:
+        with _fetcher_lock:
+            if _fetcher is None:
+                logging.info("Tile fetcher not configured, using defaults")
+                _fetcher = TileFetcher()
+
+    return _fetcher
+
+
+@atexit.register
+def _shutdown_fetcher():
+    if _fetcher is not None:
+        _fetcher.shutdown()
@@ -0,0 +1,226 @@
+import queue
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+from urllib.request import url2pathname
+
+# Remote XYZ tiles are fetched over HTTP by the shared TileFetcher; local sources
+# are addressed with their own URL schemes so download_image can format any
+# provider's template the same way:
+#   file:///data/tiles/{z}/{x}/{y}.png
+#   mbtiles:///data/imagery.mbtiles?z={z}&x={x}&y={y}
+REMOTE_SCHEMES = ("http", "https")
+
+
+class TileProvider:
+    """
+    A tile source: the URL template download_image formats per tile, plus
+    the request headers for remote providers.
+    """
+
+    def __init__(self, kind, url_template, headers=None):
+        self.kind = kind
+        self.url_template = url_template
+        self.headers = headers or {}
+
+    @property
+    def remote(self):
+        return is_remote(self.url_template)
+
+    @classmethod
+    def from_config(cls, spec, default_headers=None):
+        """
+        Provider from a Config.tile_provider dict:
+            {"type": "xyz", "url": "https://.../{z}/{x}/{y}", "headers": {...}}
+            {"type": "directory", "path": "/data/tiles", "pattern": "{z}/{x}/{y}.png"}
+            {"type": "mbtiles", "path": "/data/imagery.mbtiles"}
+        """
+        kind = spec.get("type", "xyz")
+
+        if kind == "xyz":
+            return cls(kind, spec["url"], spec.get("headers", default_headers))
+
+        if kind == "directory":
+            root = Path(spec["path"]).resolve().as_uri()
+            return cls(kind, f"{root}/{spec.get('pattern', '{z}/{x}/{y}.png')}")
+
+        if kind == "mbtiles":
+            path = Path(spec["path"]).resolve().as_uri()[len("file://"):]
+            return cls(kind, f"mbtiles://{path}?z={{z}}&x={{x}}&y={{y}}")
+
+        raise ValueError(f"Unknown tile provider type: {kind}")
+
+
+# Put in a closed reader's pool to wake threads waiting for a pooled connection
+_CLOSED = object()
+
+
+class MBTilesReader:
+    """
+    Read-only access to one MBTiles file through a small pool of SQLite
+    connections shared by the fetch threads. MBTiles rows are TMS (y counted
+    from the south) unless the metadata says scheme=xyz.
+
+    Every connection the reader opens is tracked. close() closes the idle
+    ones at once and the ones in use when their read finishes; reads that
+    still reach a closed reader run on a connection that is closed right after.
+    """
+
+    def __init__(self, path, pool_size=8):
+        self.path = path
+        self.pool_size = max(1, pool_size)
+        self._pool = queue.LifoQueue()
+        self._connections = set()
+        self._created = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+        conn = self._acquire()
+        try:
+            row = conn.execute("SELECT value FROM metadata WHERE name = 'scheme'").fetchone()
+            self.flip_y = not (row and str(row[0]).lower() == "xyz")
+        except sqlite3.Error:
+            self.flip_y = True
+        finally:
+            self._release(conn)
+
+    def _connect(self):
+        uri = f"{Path(self.path).resolve().as_uri()}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        with self._lock:
+            self._connections.add(conn)
+        return conn
+
+    def _acquire(self):
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._closed or self._created < self.pool_size
+                if create:
+                    self._created += 1
+
+            conn = self._connect() if create else self._pool.get()
+
+        if conn is _CLOSED:
+            # Closed while waiting: pass the wake-up on and read on a one-off connection
+            self._pool.put(_CLOSED)
+            conn = self._connect()
+
+        return conn
+
+    def _release(self, conn):
+        with self._lock:
+            if not self._closed:
+                self._pool.put(conn)
+                return
+            self._connections.discard(conn)
+
+        conn.close()
+
+    def read(self, z, x, y):
+        """Tile bytes, or None if the file has no such tile."""
+        row_y = (1 << z) - 1 - y if self.flip_y else y
+
+        conn = self._acquire()
+        try:
+            row = conn.execute(
+                "SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                (z, x, row_y)
+            ).fetchone()
+        finally:
+            self._release(conn)
+
+        return bytes(row[0]) if row else None
+
+    def open_connections(self):
+        with self._lock:
+            return len(self._connections)
+
+    def close(self):
+        """Close idle connections now; connections in use are closed when released."""
+        with self._lock:
+            self._closed = True
+            while True:
+                try:
+                    conn = self._pool.get_nowait()
+                except queue.Empty:
+                    break
+                if conn is not _CLOSED:
+                    self._connections.discard(conn)
+                    conn.close()
+            self._pool.put(_CLOSED)
+
+
+def is_remote(url):
+    return urlparse(url).scheme in REMOTE_SCHEMES
+
+
+_provider = None
+_mbtiles_readers = {}
+_mbtiles_pool_size = 8
+_readers_lock = threading.Lock()
+
+
+def _mbtiles_reader(path):
+    reader = _mbtiles_readers.get(path)
+    if reader is not None:
+        return reader
+
+    with _readers_lock:
+        reader = _mbtiles_readers.get(path)
+        if reader is None:
+            reader = MBTilesReader(path, _mbtiles_pool_size)
+            _mbtiles_readers[path] = reader
+
+    return reader
+
+
+def read_local_tile(url):
+    """Bytes of a tile addressed by a file:// or mbtiles:// URL, None if it does not exist."""
+    parts = urlparse(url)
+
+    if parts.scheme == "file":
+        try:
+            with open(url2pathname(parts.path), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    if parts.scheme == "mbtiles":
+        query = parse_qs(parts.query)
+        z, x, y = (int(query[k][0]) for k in ("z", "x", "y"))
+        return _mbtiles_reader(url2pathname(parts.path)).read(z, x, y)
+
+    raise ValueError(f"Unsupported tile URL: {url}")
+
+
+def configure_tile_provider(cfg):
+    """Create the process-wide tile provider from Config."""
+    global _provider, _mbtiles_pool_size
+
+    from app.services.satellite_img_service import DEFAULT_HEADERS
+
+    with _readers_lock:
+        _mbtiles_pool_size = cfg.mbtiles_pool_size
+        for reader in _mbtiles_readers.values():
+            reader.close()
+        _mbtiles_readers.clear()
+
+    _provider = TileProvider.from_config(cfg.tile_provider, DEFAULT_HEADERS)
+    logging.info(f"Tile provider: {_provider.kind} ({_provider.url_template})")
+
+    return _provider
+
+
+def get_tile_provider():
+    """The configured provider; the default remote XYZ source if none was configured."""
+    global _provider
+
+    if _provider is None:
+        from app.services.satellite_img_service import GOOGLE_SATELLITE_URL, DEFAULT_HEADERS
+        _provider = TileProvider("xyz", GOOGLE_SATELLITE_URL, DEFAULT_HEADERS)
+
+    return _provider
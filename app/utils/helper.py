@@ -1,11 +1,28 @@
 import os
 import sys
-from flask import jsonify
+from functools import wraps
+from flask import jsonify, current_app
 
 
 def _return_json(payload, status_code=200):
     return jsonify(payload), status_code
 
+def model_required(view):
+    """Return 503 (with Retry-After) until the background model load has finished."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        state = getattr(current_app, "model_state", None)
+
+        if getattr(current_app, "model", None) is None or (state is not None and not state.is_ready):
+            status = state.to_dict() if state is not None else {"status": "unavailable"}
+            payload = {"status": "error", "message": "Model is not ready yet. Please retry shortly.", "model": status}
+            response, code = _return_json(payload, 503)
+            response.headers["Retry-After"] = "5"
+            return response, code
+
+        return view(*args, **kwargs)
+    return wrapper
+
 def resource_path(relative_path):
     """Get absolute path to resource, works for dev and for PyInstaller"""
     if getattr(sys, 'frozen', False):
@@ -56,7 +73,19 @@ def validate_latlon(lat, lon):
     except ValueError:
         raise ValueError("Invalid latitude or longitude")
 
-    
+
+def int_arg(args, key, default=None):
+    """Integer query arg. Missing or empty gives default; anything else that is
+    not an integer raises ValueError (args.get(type=int) would silently return default)."""
+    value = (args.get(key) or "").strip()
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"Invalid integer for {key}: {value}")
+
+
 def coordinates_match(c, lat, lon, tolerance=0.0001):
     """
     Compare coordinates with tolerance.
@@ -0,0 +1,137 @@
+"""Timing, memory and baseline-comparison helpers for the benchmark suite."""
+import os
+import time
+import json
+import resource
+import threading
+
+import numpy as np
+
+
+def summarize(samples, items=None):
+    """Latency percentiles (ms) of a list of durations in seconds, plus throughput.
+    items: work items processed over all samples (default: one per sample)."""
+    if not samples:
+        return {"count": 0}
+
+    ms = np.asarray(samples) * 1000.0
+    total = float(np.sum(samples))
+    items = len(samples) if items is None else items
+
+    return {
+        "count": len(samples),
+        "mean_ms": round(float(ms.mean()), 4),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "throughput_per_s": round(items / total, 2) if total > 0 else None,
+    }
+
+
+def time_calls(fn, args_list, warmup=1):
+    """Call fn(*args) for each args tuple; returns the per-call durations in seconds."""
+    for args in args_list[:warmup]:
+        fn(*args)
+
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def current_rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is the lifetime peak (KiB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+class PeakRSS:
+    """Samples resident memory on a background thread while the block runs."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = current_rss_bytes()
+        self._thread = threading.Thread(target=self._sample, name="rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_bytes())
+
+    @property
+    def peak_mb(self):
+        return round(self.peak / (1024 * 1024), 1)
+
+
+# Metric name suffix -> True if a larger value is better
+_DIRECTION = {
+    "throughput_per_s": True,
+    "mean_ms": False,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "peak_rss_mb": False,
+}
+
+
+def _flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and key in _DIRECTION:
+            flat[name] = value
+    return flat
+
+
+def compare(current, baseline, threshold_pct=10.0):
+    """
+    Compare two result files (their "stages" and "workloads" sections).
+    Returns rows of (metric, baseline, current, change_pct, regressed) for
+    metrics present in both; regressed means worse by more than threshold_pct.
+    """
+    old = _flatten({k: baseline.get(k, {}) for k in ("stages", "workloads")})
+    new = _flatten({k: current.get(k, {}) for k in ("stages", "workloads")})
+
+    rows = []
+    for metric in sorted(old.keys() & new.keys()):
+        before, after = old[metric], new[metric]
+        if not before:
+            continue
+
+        change = (after - before) / before * 100.0
+        higher_is_better = _DIRECTION[metric.rsplit(".", 1)[1]]
+        regressed = (-change if higher_is_better else change) > threshold_pct
+        rows.append((metric, before, after, round(change, 1), regressed))
+
+    return rows
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_results(results, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
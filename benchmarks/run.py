@@ -0,0 +1,319 @@
+"""
+Offline benchmark suite for the fetch -> decode -> infer -> encode -> persist path.
+
+Tiles come from a local FixtureTileServer (or a local tile directory /
+MBTiles file with --tiles-dir / --mbtiles), history/images go to a temporary
+directory, and the tile and result caches are off so every iteration does
+the real work. Reports per-stage p50/p95/p99 latency and throughput, plus
+peak RSS for the single, batch and scan workloads, and writes everything to
+JSON. Pass --baseline to compare against an earlier run.
+
+    python -m benchmarks.run --quick
+    python -m benchmarks.run --baseline benchmarks/results/baseline.json
+"""
+import os
+import sys
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+
+import numpy as np
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _PROJECT_ROOT)
+
+import app  # noqa: E402,F401  (config imports app.utils)
+from config import Config  # noqa: E402
+import app.services.satellite_img_service as satellite_img_service  # noqa: E402
+
+from benchmarks.tile_server import FixtureTileServer, make_fixture_tiles  # noqa: E402
+from benchmarks.harness import summarize, time_calls, PeakRSS, compare, load_results, save_results  # noqa: E402
+
+WORKLOADS = ("single", "batch", "scan")
+
+
+def bench_config(workdir, args, tile_url):
+    """Config writing into workdir, with caches and rate limits out of the way.
+    Tiles come from tile_url (the fixture server) unless a local source is given."""
+    cfg = Config()
+
+    if args.mbtiles:
+        cfg.tile_provider = {"type": "mbtiles", "path": args.mbtiles}
+    elif args.tiles_dir:
+        cfg.tile_provider = {"type": "directory", "path": args.tiles_dir, "pattern": args.tiles_pattern}
+    else:
+        cfg.tile_provider = {"type": "xyz", "url": tile_url}
+
+    if args.model:
+        cfg.model_path = os.path.abspath(args.model)
+    if args.backend:
+        cfg.inference_backend = args.backend
+
+    cfg.predictions_db = os.path.join(workdir, "predictions.db")
+    cfg.predictions_file = os.path.join(workdir, "predictions.csv")
+    cfg.image_cache_dir = os.path.join(workdir, "image_cache")
+    cfg.tile_cache_dir = os.path.join(workdir, "tile_cache")
+    cfg.tile_cache_enabled = args.warm_tiles
+    cfg.result_cache_enabled = False
+    cfg.tile_rate_limits = {}
+    cfg.tile_rate_limit_default = None
+
+    return cfg
+
+
+def configure_services(cfg):
+    from app.services.tile_cache import configure_tile_cache
+    from app.services.tile_fetcher import configure_tile_fetcher
+    from app.services.tile_providers import configure_tile_provider
+    from app.services.rate_limiter import configure_rate_limits
+    from app.services.prediction_writer import configure_prediction_writer
+    from app.services.result_cache import configure_result_cache
+    from app.services.image_cache import configure_image_cache
+
+    configure_tile_cache(cfg)
+    configure_tile_fetcher(cfg)
+    configure_tile_provider(cfg)
+    configure_rate_limits(cfg)
+    configure_prediction_writer(cfg)
+    configure_result_cache(cfg)
+    configure_image_cache(cfg)
+
+
+def load_bench_model(cfg, random_weights=False):
+    """The configured model; with random_weights, the same architecture untrained
+    (timings do not depend on the weights)."""
+    from ml.loader import load_model
+
+    model = load_model(cfg) if os.path.exists(cfg.model_path) else None
+    if model is not None or not random_weights:
+        return model
+
+    import torch
+    from ml.solar_model import SolarModel
+    from ml.preprocess import Preprocessor
+    from ml.backends import build_backend
+
+    torch.manual_seed(0)
+    model = SolarModel(cfg).to(cfg.device).eval()
+    model.preprocessor = Preprocessor.from_config(cfg)
+    return build_backend(model, cfg)
+
+
+def bench_coordinates(count, seed):
+    rng = np.random.default_rng(seed)
+    lats = rng.uniform(10.0, 30.0, count)
+    lons = rng.uniform(70.0, 90.0, count)
+    return [(round(float(lat), 6), round(float(lon), 6)) for lat, lon in zip(lats, lons)]
+
+
+def run_stages(model, cfg, coords, args):
+    """Micro-benchmarks of the individual hot-path functions."""
+    from app.services.prediction_service import predict_image, predict_images, image_to_base64, store_image, save_prediction
+    from app.services.prediction_writer import flush_pending_predictions
+    from app.services.tile_providers import get_tile_provider
+
+    sis = satellite_img_service
+    provider = get_tile_provider()
+    url, headers = provider.url_template, provider.headers
+    n = args.iterations
+    results = {}
+
+    scale = 1 << cfg.zoom_level
+    results["project_with_scale"] = summarize(
+        time_calls(sis.project_with_scale, [(lat, lon, scale) for lat, lon in coords * 20])
+    )
+
+    fixture = make_fixture_tiles(count=4)
+    results["decode_tile"] = summarize(time_calls(sis.decode_tile, [(fixture[i % 4], 3) for i in range(n * 4)]))
+
+    windows = [sis.get_bbox(lat, lon) + (cfg.zoom_level, url, headers) for lat, lon in coords[:n]]
+    results["download_image"] = summarize(time_calls(sis.download_image, windows))
+
+    images = [sis.download_image(*w) for w in windows]
+
+    results["predict_image"] = summarize(time_calls(predict_image, [(img, model) for img in images]))
+
+    batches = [
+        ([images[(i + j) % len(images)] for j in range(args.batch_size)], model, 0.49, args.batch_size)
+        for i in range(max(2, n // args.batch_size))
+    ]
+    results[f"predict_images[batch={args.batch_size}]"] = summarize(
+        time_calls(predict_images, batches), items=len(batches) * args.batch_size
+    )
+
+    results["image_to_base64"] = summarize(time_calls(image_to_base64, [(img,) for img in images]))
+    results["store_image"] = summarize(time_calls(store_image, [(img,) for img in images]))
+
+    records = [(lat, lon, "Not a Solar Panel", 0.1, cfg) for lat, lon in coords[:n]]
+    results["save_prediction"] = summarize(time_calls(save_prediction, records))
+    flush_pending_predictions()
+
+    return results
+
+
+def run_workloads(model, cfg, coords, args):
+    """End-to-end workloads: latency per call, throughput and peak RSS."""
+    from app.services.prediction_service import run_prediction, run_prediction_batch, iter_prediction_batch, scan_inputs
+    from app.services.prediction_writer import flush_pending_predictions
+    from app.services.scan_planner import plan_scan
+
+    results = {}
+    n = args.iterations
+
+    if "single" in args.workloads:
+        calls = [(model, lat, lon, cfg, False) for lat, lon in coords[:n]]
+        with PeakRSS() as rss:
+            samples = time_calls(run_prediction, calls)
+        results["single"] = dict(summarize(samples), items=len(calls), peak_rss_mb=rss.peak_mb)
+
+    if "batch" in args.workloads:
+        size = args.batch_size
+        groups = [
+            [{"lat": lat, "lon": lon} for lat, lon in coords[i * size:(i + 1) * size]]
+            for i in range(max(2, n // size))
+        ]
+        calls = [(model, group, cfg, None, False) for group in groups if group]
+        with PeakRSS() as rss:
+            samples = time_calls(run_prediction_batch, calls)
+        items = sum(len(call[1]) for call in calls)
+        results["batch"] = dict(summarize(samples, items=items), items=items, batch_size=size, peak_rss_mb=rss.peak_mb)
+
+    if "scan" in args.workloads:
+        def scan(lat, lon):
+            plan = plan_scan({"shape": "grid", "lat": lat, "lon": lon, "rows": 5, "cols": 5}, cfg)
+            scan_coords, images, _ = scan_inputs(plan, cfg, use_cache=False)
+            return list(iter_prediction_batch(model, scan_coords, cfg, images, use_cache=False))
+
+        calls = coords[:max(2, n // 10)]
+        with PeakRSS() as rss:
+            samples = time_calls(scan, calls)
+        results["scan"] = dict(summarize(samples, items=25 * len(calls)), items=25 * len(calls), peak_rss_mb=rss.peak_mb)
+
+    flush_pending_predictions()
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=_PROJECT_ROOT,
+            capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_meta(cfg, args, server):
+    import torch
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+        "tile_provider": cfg.tile_provider.get("type"),
+        "tile_latency_ms": args.tile_latency_ms,
+        "tile_requests": server.requests,
+        "iterations": args.iterations,
+        "config": {
+            "device": str(cfg.device),
+            "inference_backend": cfg.inference_backend,
+            "inference_batch_size": cfg.inference_batch_size,
+            "micro_batch_enabled": cfg.micro_batch_enabled,
+            "async_persistence": cfg.async_persistence,
+            "pipeline_prefetch": cfg.pipeline_prefetch,
+            "pipeline_fetch_workers": cfg.pipeline_fetch_workers,
+            "tile_cache_enabled": cfg.tile_cache_enabled,
+        },
+    }
+
+
+def print_results(results):
+    header = f"{'':<32}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'per s':>10}{'RSS MB':>9}"
+
+    for section in ("stages", "workloads"):
+        print(f"\n{section.upper()}\n{header}")
+        for name, r in results[section].items():
+            print(
+                f"{name:<32}{r.get('p50_ms', 0):>10.3f}{r.get('p95_ms', 0):>10.3f}{r.get('p99_ms', 0):>10.3f}"
+                f"{r.get('throughput_per_s') or 0:>10.1f}{r.get('peak_rss_mb', ''):>9}"
+            )
+
+
+def print_comparison(rows, threshold):
+    print(f"\nCOMPARISON (regression = worse by more than {threshold}%)")
+    for metric, before, after, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{metric:<56}{before:>12.3f}{after:>12.3f}{change:>+9.1f}%{flag}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline VIKAS pipeline benchmarks.")
+    parser.add_argument("--iterations", type=int, default=50, help="calls per stage / single workload")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--workloads", default=",".join(WORKLOADS), help="comma separated: single,batch,scan")
+    parser.add_argument("--tile-latency-ms", type=float, default=0.0, help="simulated provider latency per tile")
+    parser.add_argument("--tiles-dir", help="read tiles from a local {z}/{x}/{y} directory instead")
+    parser.add_argument("--tiles-pattern", default="{z}/{x}/{y}.png", help="file pattern inside --tiles-dir")
+    parser.add_argument("--mbtiles", help="read tiles from an MBTiles file instead")
+    parser.add_argument("--warm-tiles", action="store_true", help="keep the on-disk tile cache enabled")
+    parser.add_argument("--model", help="model weights (default: Config.model_path)")
+    parser.add_argument("--backend", help="override Config.inference_backend")
+    parser.add_argument("--random-weights", action="store_true", help="use an untrained model if the weights are unavailable")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quick", action="store_true", help="few iterations, for a smoke run")
+    parser.add_argument("--output", help="result JSON (default: benchmarks/results/bench-<time>.json)")
+    parser.add_argument("--baseline", help="result JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 on any regression")
+
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.iterations = min(args.iterations, 10)
+    args.workloads = [w for w in args.workloads.split(",") if w in WORKLOADS]
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="vikas-bench-") as workdir, \
+            FixtureTileServer(latency_ms=args.tile_latency_ms) as server:
+        cfg = bench_config(workdir, args, server.url_template)
+        configure_services(cfg)
+
+        model = load_bench_model(cfg, args.random_weights)
+        if model is None:
+            print(f"Model could not be loaded from {cfg.model_path} (use --model or --random-weights).", file=sys.stderr)
+            return 2
+
+        coords = bench_coordinates(max(args.iterations, args.batch_size * 2), args.seed)
+
+        results = {
+            "stages": run_stages(model, cfg, coords, args),
+            "workloads": run_workloads(model, cfg, coords, args),
+        }
+        results = {"meta": run_meta(cfg, args, server), **results}
+
+    output = args.output or os.path.join(_PROJECT_ROOT, "benchmarks", "results", f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    save_results(results, output)
+
+    print_results(results)
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        rows = compare(results, load_results(args.baseline), args.threshold)
+        print_comparison(rows, args.threshold)
+        if args.fail_on_regression and any(row[4] for row in rows):
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Local stand-in for the satellite tile provider.
+
+Serves a fixed set of fixture tiles (deterministic, JPEG encoded like real
+satellite tiles) for any /{z}/{x}/{y} request, so benchmarks exercise the
+real HTTP fetch -> decode -> stitch path without touching the internet.
+"""
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import numpy as np
+
+
+def make_fixture_tiles(count=16, seed=0, tile_size=256):
+    """JPEG bytes of `count` textured tiles; same seed, same bytes."""
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:tile_size, 0:tile_size]
+
+    tiles = []
+    for _ in range(count):
+        # Smooth gradients plus noise compress like aerial imagery, not like flat colour
+        base = rng.integers(40, 200, 3)
+        gradient = (np.sin(xx / rng.uniform(8, 40)) + np.cos(yy / rng.uniform(8, 40))) * 30
+        noise = rng.normal(0, 12, (tile_size, tile_size, 3))
+        tile = np.clip(base + gradient[..., None] + noise, 0, 255).astype(np.uint8)
+        tiles.append(cv2.imencode(".jpg", tile, [cv2.IMWRITE_JPEG_QUALITY, 85])[1].tobytes())
+
+    return tiles
+
+
+class _TileHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        try:
+            z, x, y = (int(part.split(".")[0]) for part in self.path.strip("/").split("/")[-3:])
+        except ValueError:
+            self.send_error(404)
+            return
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        data = server.tiles[(x * 31 + y * 17 + z) % len(server.tiles)]
+        with server.lock:
+            server.requests += 1
+
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureTileServer:
+    """
+    Threaded HTTP tile server on 127.0.0.1 (ephemeral port by default).
+    latency_ms adds a fixed delay per tile to model a remote provider.
+
+        with FixtureTileServer() as server:
+            url = server.url_template  # http://127.0.0.1:PORT/{z}/{x}/{y}.jpg
+    """
+
+    def __init__(self, port=0, latency_ms=0.0, tiles=None):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), _TileHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.tiles = tiles or make_fixture_tiles()
+        self.httpd.latency = latency_ms / 1000.0
+        self.httpd.requests = 0
+        self.httpd.lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url_template(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/{{z}}/{{x}}/{{y}}.jpg"
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fixture-tiles", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve fixture satellite tiles locally.")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with FixtureTileServer(args.port, args.latency_ms) as server:
+        print(f"Serving fixture tiles at {server.url_template} (Ctrl+C to stop)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
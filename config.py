@@ -1,22 +1,197 @@
-import torch
+import os
 from app.utils.helper import resource_path
 
 class Config:
     def __init__(self):
         # Use resource_path for all file paths
         self.model_path = resource_path("models/model_final.pth")  # absolute path
-        self.predictions_file = resource_path("app/data/predictions.csv")  # absolute path
+        self.predictions_file = resource_path("app/data/predictions.csv")  # CSV export / legacy import
+        self.predictions_db = resource_path("app/data/predictions.db")  # SQLite history store
 
         # Rest of your config remains the same
         self.image_size = (224, 224)
         self.in_channels = 3
         self.num_classes = 2
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self._device = None  # resolved on first use so importing Config stays torch-free
         self.model_name = "resnet18"
         self.title = "VIKAS"
         self.map_default = {"lat": 34.137470, "lon": 77.571188, "zoom": 12.5}
         self.zoom_level = 18
 
+        # Max images stacked into one forward pass for batch/scan predictions
+        self.inference_batch_size = 32
+
+        # Background prediction writer: requests only enqueue, a writer thread
+        # inserts in groups (count or interval) and checkpoints/fsyncs on a schedule.
+        # A failed insert is retried with backoff for up to writer_retry_deadline seconds.
+        self.async_persistence = True
+        self.writer_queue_size = 10000
+        self.writer_flush_count = 200
+        self.writer_flush_interval = 0.5
+        self.writer_fsync_interval = 5.0
+        self.writer_retry_deadline = 30.0
+
+        # Prediction history paging (cursor based) and CSV streaming
+        self.history_page_size = 100
+        self.history_page_size_max = 1000
+        self.history_export_chunk_rows = 1000
+
+        # Coalesce concurrent single predictions into one forward pass: a batch is
+        # run once micro_batch_max_size images are waiting or micro_batch_max_wait_ms
+        # after the first one arrived
+        self.micro_batch_enabled = True
+        self.micro_batch_max_size = 16
+        self.micro_batch_max_wait_ms = 5
+
+        # Inference runtime: eager | torchscript | compile | dynamic_int8 | static_int8 | onnx
+        # Exported artifacts are cached next to model_path, keyed on the weights and
+        # image_size; a backend that fails its first inference or the parity check
+        # against eager on the reference images falls back to eager.
+        # "onnx" needs the optional onnxruntime package (pip install onnxruntime).
+        self.inference_backend = "eager"
+        self.backend_check_parity = True
+        self.backend_parity_tolerance = 0.02
+        self.backend_reference_dir = resource_path("models/reference")
+
+        # Streaming fetch -> infer -> persist pipeline for batch/scan predictions
+        self.pipeline_prefetch = 8  # images fetched ahead of inference
+        self.pipeline_fetch_workers = 4
+        self.pipeline_queue_size = 64
+
+        # On-disk XYZ tile cache shared by all workers (LRU, size capped)
+        self.tile_cache_enabled = True
+        self.tile_cache_dir = resource_path("app/data/tile_cache")
+        self.tile_cache_max_bytes = 512 * 1024 * 1024
+
+        # Tile source used for predictions (see app/services/tile_providers.py):
+        #   {"type": "xyz", "url": "https://.../{z}/{x}/{y}", "headers": {...}}  remote XYZ template
+        #   {"type": "directory", "path": "/data/tiles", "pattern": "{z}/{x}/{y}.png"}
+        #   {"type": "mbtiles", "path": "/data/imagery.mbtiles"}  read through pooled read-only connections
+        # Local sources skip the tile cache and rate limits and work fully offline.
+        self.tile_provider = {"type": "xyz", "url": "https://mt.google.com/vt/lyrs=s&x={x}&y={y}&z={z}"}
+        self.mbtiles_pool_size = 8
+
+        # Shared tile fetch engine (pooled session + bounded executor)
+        self.fetch_max_workers = 16
+        self.fetch_pool_size = 32
+        self.fetch_connect_timeout = 3.05
+        self.fetch_read_timeout = 10
+        self.fetch_retries = 2
+
+        # Token bucket per tile provider host: rate = sustained req/s, burst = bucket size.
+        # Providers not listed use the default; None means unlimited. Every request,
+        # retries included, takes a token. The buckets live in tile_rate_limit_db, so
+        # the rate is shared by all processes on the host (gunicorn workers and job
+        # pool processes). With tile_rate_limit_db = None each process has its own
+        # bucket and the effective rate is rate x number of processes.
+        self.tile_rate_limits = {
+            "mt.google.com": {"rate": 20, "burst": 40}
+        }
+        self.tile_rate_limit_default = {"rate": 20, "burst": 40}
+        self.tile_rate_limit_db = resource_path("app/data/rate_limits.db")
+
+        # Uploaded coordinate CSVs are ingested in chunks into a server-side set
+        # (the session only stores the set id); duplicates are points closer than
+        # coordinate_tolerance degrees in both lat and lon.
+        self.coordinates_db = resource_path("app/data/coordinates.db")
+        self.coordinate_tolerance = 0.0001
+        self.upload_chunk_rows = 50000
+        self.upload_max_coordinates = 1000000
+        # Sets outlive their session (e.g. after a restart); older ones are deleted
+        # at startup and on upload. Keep it above the longest expected set job.
+        self.coordinate_set_ttl = 7 * 24 * 3600  # seconds
+        self.bulk_display_limit = 100  # results rendered with images for a set prediction
+
+        # Area scans: N x M grid, radius or GeoJSON polygon covered by tiles of
+        # scan_tile_width_m x scan_tile_height_m. Plans are generated lazily; scans
+        # larger than scan_sync_max_tiles must run as a background job.
+        self.scan_tile_width_m = 333
+        self.scan_tile_height_m = 177
+        self.scan_max_tiles = 100000
+        self.scan_sync_max_tiles = 400
+        self.scan_mosaic_max_tiles = 100  # up to this many tiles are fetched as one shared mosaic
+
+        # Coarse-to-fine scans: screen cells of 2**scan_screen_levels x 2**scan_screen_levels
+        # tiles at zoom_level - scan_screen_levels, refine at zoom_level only the cells whose
+        # screening confidence reaches scan_screen_threshold (lower = better recall, more work)
+        self.scan_screen_levels = 2
+        self.scan_screen_threshold = 0.2
+
+        # Large local rasters (uncompressed GeoTIFF or raw + .json sidecar, in EPSG:4326
+        # or EPSG:3857) are memory-mapped and walked with a sliding window; only rasters
+        # under raster_dir can be submitted. Window/stride None = the model's image_size.
+        self.raster_dir = resource_path("app/data/rasters")
+        self.raster_window = None
+        self.raster_stride = None
+        self.raster_max_windows = 500000
+
+        # Background jobs (batch / scan / uploaded set / raster) run on a local process pool;
+        # each pool process loads its own model. Progress and results go to jobs_db.
+        # Every web worker owns a pool, so a host holds up to web workers x (1 + job_workers)
+        # model copies in memory; with inference_server = True the pool processes use the
+        # shared server instead and only that process holds the model.
+        self.jobs_db = resource_path("app/data/jobs.db")
+        self.job_workers = 1
+        self.job_progress_every = 25  # results per progress/result write
+        self.job_image_limit = 200  # results per job stored with their image
+        self.job_results_page_size = 50
+
+        # Encoded prediction images, served by id at /images/<id> (shared by all workers)
+        self.image_cache_dir = resource_path("app/data/image_cache")
+        self.image_cache_max_bytes = 256 * 1024 * 1024
+        self.image_thumbnail_sizes = (128, 256)  # allowed ?size= values
+        self.image_max_age = 7 * 24 * 3600  # Cache-Control max-age; ids are content hashes
+
+        # Reuse recent predictions for nearly identical coordinates (per process).
+        # A request within result_cache_radius_m of a cached result younger than
+        # result_cache_ttl seconds gets that result without a fetch or forward pass.
+        self.result_cache_enabled = True
+        self.result_cache_radius_m = 11  # ~0.0001 deg, the coordinates_match tolerance
+        self.result_cache_ttl = 3600
+        self.result_cache_max_entries = 5000
+
+        # Optional dedicated inference process: one process owns the model and web/job
+        # workers send preprocessed batches through shared memory. Started on demand
+        # by the first worker (or run it yourself: python -m ml.inference_server).
+        # The connection authkey is VIKAS_INFERENCE_KEY, or else a random key generated
+        # once into inference_server_key_file (mode 0600) and read by every process.
+        # A server started by a worker is detached and outlives worker restarts; its
+        # pid is kept in inference_server_pid_file (python -m ml.inference_server --stop).
+        self.inference_server = False
+        self.inference_server_address = ("127.0.0.1", 6011)
+        self.inference_server_authkey = os.environ.get("VIKAS_INFERENCE_KEY")
+        self.inference_server_key_file = resource_path("app/data/inference_server.key")
+        self.inference_server_pid_file = resource_path("app/data/inference_server.pid")
+        self.inference_server_threads = 0  # torch intra-op threads in the server, 0 = torch default
+        self.inference_server_start_timeout = 120
+
+        # Latency histograms per hot-path stage (fetch, decode, stitch, preprocess, forward,
+        # encode, persist) labelled by route and batch size, served at /metrics.
+        # Each process keeps its own; job pool processes are not included.
+        self.metrics_enabled = True
+        self.metrics_buckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+        # Sampling profiler per request (?profile=1 or X-Profile: 1) when enabled; collapsed
+        # stacks (flamegraph / speedscope input) are written to profile_dir
+        self.profiling_enabled = False
+        self.profile_interval_ms = 5
+        self.profile_dir = resource_path("logs/profiles")
+
+        # Load the model on a background thread; /readyz reports when it is warmed
+        self.model_background_load = True
+        self.model_warmup = True
+
+    @property
+    def device(self):
+        if self._device is None:
+            import torch
+            self._device = "cuda" if torch.cuda.is_available() else "cpu"
+        return self._device
+
+    @device.setter
+    def device(self, value):
+        self._device = value
+
     def to_dict(self):
         return {
             "map_default": self.map_default,
@@ -0,0 +1,311 @@
+import os
+import re
+import copy
+import glob
+import hashlib
+import logging
+import tempfile
+
+import cv2
+import numpy as np
+import torch
+
+from .preprocess import get_preprocessor
+
+BACKENDS = ("eager", "torchscript", "compile", "dynamic_int8", "static_int8", "onnx")
+
+# Exported artifacts live next to the weights, named by a fingerprint of what they
+# were exported from, e.g. models/model_final.3f9c2a1b7d04.onnx
+ARTIFACT_SUFFIXES = {
+    "torchscript": ".torchscript.pt",
+    "static_int8": ".int8.torchscript.pt",
+    "onnx": ".onnx",
+}
+
+
+class BackendModel:
+    """
+    Callable stand-in for SolarModel backed by an optimized runtime.
+    Exposes the same surface the prediction code uses: model(batch) -> logits,
+    plus .cfg and .preprocessor.
+    """
+
+    def __init__(self, name, forward, cfg, preprocessor):
+        self.backend = name
+        self.forward = forward
+        self.cfg = cfg
+        self.preprocessor = preprocessor
+
+    def __call__(self, x):
+        return self.forward(x)
+
+    def eval(self):
+        return self
+
+
+def _fingerprint(cfg):
+    """Hash of the weights plus the input shape an artifact is traced with."""
+    digest = hashlib.sha1()
+    with open(cfg.model_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+
+    h, w = cfg.image_size
+    digest.update(f"{cfg.in_channels}x{h}x{w}".encode())
+    return digest.hexdigest()[:12]
+
+
+def artifact_path(cfg, backend):
+    stem, _ = os.path.splitext(cfg.model_path)
+    return f"{stem}.{_fingerprint(cfg)}{ARTIFACT_SUFFIXES[backend]}"
+
+
+def _remove_stale(path, backend):
+    """Delete exports of the same backend made from other weights or input sizes."""
+    stem = path[:-len(ARTIFACT_SUFFIXES[backend])].rsplit(".", 1)[0]
+    pattern = re.compile(re.escape(os.path.basename(stem)) + r"\.[0-9a-f]{12}" + re.escape(ARTIFACT_SUFFIXES[backend]) + "$")
+
+    for other in glob.glob(glob.escape(stem) + ".*" + ARTIFACT_SUFFIXES[backend]):
+        if other != path and pattern.match(os.path.basename(other)):
+            try:
+                os.remove(other)
+            except OSError as e:
+                logging.warning(f"Could not remove stale artifact {other}: {e}")
+
+
+def _save_atomic(path, save):
+    """
+    Call save(tmp_path) on a temp file next to path, then os.replace it into
+    place, so an interrupted export never leaves a truncated artifact that
+    would be reused (same pattern as DiskCache.put).
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=os.path.splitext(path)[1] + ".tmp")
+    os.close(fd)
+
+    try:
+        save(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def load_reference_images(cfg, count=16):
+    """
+    Reference image set for calibration and parity checks.
+    Uses the images in cfg.backend_reference_dir when present, otherwise a
+    deterministic synthetic set (smoothed noise) so checks can still run.
+    """
+    images = []
+    directory = cfg.backend_reference_dir
+
+    if directory and os.path.isdir(directory):
+        paths = sorted(
+            p for ext in ("*.png", "*.jpg", "*.jpeg")
+            for p in glob.glob(os.path.join(directory, ext))
+        )
+        for path in paths:
+            img = cv2.imread(path, cv2.IMREAD_COLOR)
+            if img is not None:
+                images.append(img)
+
+    if images:
+        return images
+
+    logging.warning("No backend reference images found, using a synthetic set")
+    rng = np.random.default_rng(0)
+    for _ in range(count):
+        noise = rng.integers(0, 256, (360, 559, 3), dtype=np.uint8)
+        images.append(cv2.GaussianBlur(noise, (0, 0), 3))
+    return images
+
+
+def _example_input(cfg, batch=1):
+    h, w = cfg.image_size
+    return torch.zeros(batch, cfg.in_channels, h, w)
+
+
+def _torchscript(model, cfg):
+    path = artifact_path(cfg, "torchscript")
+
+    if not os.path.exists(path):
+        with torch.no_grad():
+            traced = torch.jit.trace(model, _example_input(cfg).to(cfg.device))
+        traced = torch.jit.freeze(traced)
+        _save_atomic(path, traced.save)
+        _remove_stale(path, "torchscript")
+        logging.info(f"Exported TorchScript model to {path}")
+
+    scripted = torch.jit.load(path, map_location=cfg.device)
+    scripted.eval()
+    return scripted
+
+
+def _compile(model, cfg):
+    return torch.compile(model)
+
+
+def _dynamic_int8(model, cfg):
+    # Dynamic quantization only covers Linear layers (the resnet head)
+    from torch.ao.quantization import quantize_dynamic
+
+    return quantize_dynamic(copy.deepcopy(model).cpu().eval(), {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _static_int8(model, cfg):
+    path = artifact_path(cfg, "static_int8")
+
+    if not os.path.exists(path):
+        from torch.ao.quantization import get_default_qconfig_mapping
+        from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+        example = _example_input(cfg)
+        float_model = copy.deepcopy(model).cpu().eval()
+        prepared = prepare_fx(float_model, get_default_qconfig_mapping("x86"), (example,))
+
+        # Calibrate activation ranges on the reference images
+        preprocessor = get_preprocessor(model)
+        with torch.no_grad():
+            for img in load_reference_images(cfg):
+                prepared(preprocessor([img]).cpu())
+
+        quantized = convert_fx(prepared)
+        with torch.no_grad():
+            traced = torch.jit.freeze(torch.jit.trace(quantized, example))
+        _save_atomic(path, traced.save)
+        _remove_stale(path, "static_int8")
+        logging.info(f"Exported static int8 model to {path}")
+
+    scripted = torch.jit.load(path, map_location="cpu")
+    scripted.eval()
+    return scripted
+
+
+def _onnx(model, cfg):
+    import onnxruntime as ort
+
+    path = artifact_path(cfg, "onnx")
+
+    if not os.path.exists(path):
+        # Export a CPU copy: moving the caller's model would leave it off its device
+        export_model = copy.deepcopy(model).cpu().eval()
+        _save_atomic(path, lambda tmp_path: torch.onnx.export(
+            export_model,
+            (_example_input(cfg),),
+            tmp_path,
+            input_names=["input"],
+            output_names=["logits"],
+            dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+            dynamo=False
+        ))
+        _remove_stale(path, "onnx")
+        logging.info(f"Exported ONNX model to {path}")
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def forward(x):
+        logits = session.run(["logits"], {"input": x.detach().cpu().numpy()})[0]
+        return torch.from_numpy(logits)
+
+    return forward
+
+
+_BUILDERS = {
+    "torchscript": _torchscript,
+    "compile": _compile,
+    "dynamic_int8": _dynamic_int8,
+    "static_int8": _static_int8,
+    "onnx": _onnx,
+}
+
+# Quantized kernels and onnxruntime CPUExecutionProvider run on the CPU only
+_CPU_ONLY = ("dynamic_int8", "static_int8", "onnx")
+
+
+def _confidences(model, images, batch_size=16):
+    preprocessor = get_preprocessor(model)
+    confidences = []
+
+    with torch.no_grad():
+        for start in range(0, len(images), batch_size):
+            logits = model(preprocessor(images[start:start + batch_size]))
+            confidences.extend(torch.softmax(logits.float(), dim=1)[:, 1].tolist())
+
+    return confidences
+
+
+def check_backend_parity(reference, candidate, images, tolerance=0.02, threshold=0.49):
+    """
+    Run both models on the same images and compare solar-panel confidences.
+    Returns a dict with ok, max_confidence_diff, label_mismatches and count.
+    """
+    expected = _confidences(reference, images)
+    actual = _confidences(candidate, images)
+
+    diffs = [abs(e - a) for e, a in zip(expected, actual)]
+    mismatches = sum(1 for e, a in zip(expected, actual) if (e > threshold) != (a > threshold))
+    max_diff = max(diffs) if diffs else 0.0
+
+    return {
+        "ok": max_diff <= tolerance and mismatches == 0,
+        "max_confidence_diff": max_diff,
+        "label_mismatches": mismatches,
+        "count": len(images),
+    }
+
+
+def build_backend(model, cfg):
+    """
+    Wrap a loaded eager SolarModel in the backend selected by cfg.inference_backend.
+    Falls back to the eager model if the backend cannot be built, fails on
+    its first inference (torch.compile and onnxruntime only fail then) or
+    fails the parity check on the reference images.
+    """
+    name = cfg.inference_backend
+    if name == "eager":
+        return model
+
+    if name not in _BUILDERS:
+        logging.error(f"Unknown inference backend '{name}', using eager. Options: {', '.join(BACKENDS)}")
+        return model
+
+    if name in _CPU_ONLY and str(cfg.device) != "cpu":
+        logging.error(f"Inference backend '{name}' is CPU only, using eager on {cfg.device}")
+        return model
+
+    preprocessor = get_preprocessor(model)
+
+    try:
+        built = _BUILDERS[name](model, cfg)
+    except Exception as e:
+        logging.error(f"Failed to build '{name}' backend, using eager: {str(e)}", exc_info=True)
+        return model
+
+    candidate = BackendModel(name, built, cfg, preprocessor)
+
+    try:
+        if cfg.backend_check_parity:
+            report = check_backend_parity(model, candidate, load_reference_images(cfg), cfg.backend_parity_tolerance)
+        else:
+            # Still run one forward pass so lazy compilation errors surface here
+            with torch.no_grad():
+                candidate(_example_input(cfg).to(cfg.device))
+            report = None
+    except Exception as e:
+        logging.error(f"Backend '{name}' failed on its first inference, using eager: {str(e)}", exc_info=True)
+        return model
+
+    if report is not None:
+        logging.info(f"Backend '{name}' parity: {report}")
+
+        if not report["ok"]:
+            logging.error(f"Backend '{name}' failed the parity check, using eager")
+            return model
+
+    return candidate
@@ -0,0 +1,462 @@
+"""
+Optional dedicated inference process.
+
+One server process owns the model; web workers talk to it through a
+multiprocessing.connection socket. Each client thread owns a shared memory
+segment holding an input region (N, 3, H, W) float32 and an output region
+(N, num_classes) float32. The client's preprocessor writes straight into
+the input region, the server runs the forward pass on a tensor view of it
+and writes the logits into the output region, so only a tiny control
+message goes over the socket.
+
+Run standalone with `python -m ml.inference_server`, or let the web app
+start it on demand (Config.inference_server = True). A server started by a
+web/job worker runs detached, so recycling that worker does not interrupt
+the others; either way it runs until stopped with
+`python -m ml.inference_server --stop` (or a SIGTERM to its pid file's pid).
+
+Messages are unpickled after the authkey handshake, so the key must stay
+secret: it comes from VIKAS_INFERENCE_KEY or a random per-deployment key
+file readable only by its owner (see authkey).
+"""
+import os
+import sys
+import time
+import atexit
+import signal
+import logging
+import secrets
+import threading
+import subprocess
+import weakref
+from multiprocessing import resource_tracker
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import torch
+
+from .preprocess import Preprocessor
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _attach(name):
+    """Attach to a segment owned by the other side without taking over its cleanup."""
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name=name, track=False)
+
+    shm = SharedMemory(name=name)
+    # Before 3.13 attaching registers the segment with this process's resource
+    # tracker, which would unlink it when this process exits
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+def _regions(buf, capacity, n, image_size, num_classes):
+    """(inputs, outputs) numpy views of the first n slots of a channel buffer."""
+    h, w = image_size
+    inputs = np.ndarray((n, 3, h, w), dtype=np.float32, buffer=buf)
+    outputs = np.ndarray(
+        (n, num_classes), dtype=np.float32, buffer=buf,
+        offset=capacity * 3 * h * w * 4
+    )
+    return inputs, outputs
+
+
+def _channel_bytes(capacity, image_size, num_classes):
+    h, w = image_size
+    return capacity * (3 * h * w + num_classes) * 4
+
+
+def authkey(cfg):
+    """
+    Connection authkey: cfg.inference_server_authkey (VIKAS_INFERENCE_KEY) if
+    set, else the key in cfg.inference_server_key_file, generated on first
+    use with mode 0600. Refuses a key file other users can read.
+    """
+    if cfg.inference_server_authkey:
+        key = cfg.inference_server_authkey
+        return key if isinstance(key, bytes) else key.encode()
+
+    path = cfg.inference_server_key_file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    if not os.path.exists(path):
+        # Written in full, then linked into place: concurrent workers never read a partial key
+        tmp = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+        try:
+            os.link(tmp, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp)
+
+    if os.name == "posix" and os.stat(path).st_mode & 0o077:
+        raise RuntimeError(f"Inference server key file {path} must not be readable by other users (chmod 600).")
+
+    with open(path) as f:
+        key = f.read().strip()
+
+    if not key:
+        raise RuntimeError(f"Inference server key file {path} is empty.")
+
+    return key.encode()
+
+
+class InferenceServer:
+    """Serves forward passes of one model to any number of local clients."""
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.model = None
+        self._ready = threading.Event()
+        self._failed = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        from .loader import load_model
+
+        try:
+            self.model = load_model(self.cfg)
+            if self.model is None:
+                self._failed = "Model could not be loaded."
+        except Exception as e:
+            self._failed = str(e)
+        finally:
+            self._ready.set()
+
+        if self._failed:
+            logging.error(f"Inference server model load failed: {self._failed}")
+        else:
+            logging.info("Inference server model ready")
+
+    def forward(self, inputs):
+        with self._lock, torch.no_grad():
+            logits = self.model(torch.from_numpy(inputs).to(self.cfg.device))
+        return logits.float().cpu().numpy()
+
+    def handle(self, conn):
+        shm = None
+        try:
+            self._ready.wait()
+            while True:
+                try:
+                    msg = conn.recv()
+                except EOFError:
+                    return
+
+                if self._failed:
+                    conn.send(("error", self._failed))
+                    continue
+
+                _, name, n, capacity = msg
+                try:
+                    if shm is None or shm.name != name:
+                        if shm is not None:
+                            shm.close()
+                        shm = _attach(name)
+
+                    inputs, outputs = _regions(shm.buf, capacity, n, self.cfg.image_size, self.cfg.num_classes)
+                    outputs[:] = self.forward(inputs)
+                    del inputs, outputs
+                    conn.send(("ok",))
+                except Exception as e:
+                    logging.error(f"Inference server request failed: {str(e)}")
+                    conn.send(("error", str(e)))
+        finally:
+            conn.close()
+            if shm is not None:
+                shm.close()
+
+    def serve_forever(self, listener):
+        threading.Thread(target=self.load, name="inference-load", daemon=True).start()
+
+        while True:
+            try:
+                conn = listener.accept()
+            except (EOFError, OSError, AuthenticationError) as e:
+                # A client that disconnects or fails auth mid-handshake must not stop the server
+                logging.warning(f"Inference server rejected a connection: {str(e)}")
+                continue
+            threading.Thread(target=self.handle, args=(conn,), name="inference-conn", daemon=True).start()
+
+
+def serve(cfg):
+    """Bind the server address, then load the model and serve until killed.
+    Binding first makes the address the lock: a second server exits here."""
+    # The server process always runs the model itself
+    cfg.inference_server = False
+
+    if cfg.inference_server_threads:
+        torch.set_num_threads(cfg.inference_server_threads)
+
+    try:
+        listener = Listener(tuple(cfg.inference_server_address), backlog=64, authkey=authkey(cfg))
+    except OSError as e:
+        logging.info(f"Inference server not started, address in use: {str(e)}")
+        return
+
+    _write_pid_file(cfg)
+
+    # SIGTERM (stop_inference_server, systemd) exits through atexit, removing the pid file
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    logging.info(f"Inference server listening on {cfg.inference_server_address} (pid {os.getpid()})")
+    with listener:
+        InferenceServer(cfg).serve_forever(listener)
+
+
+def _write_pid_file(cfg):
+    path = cfg.inference_server_pid_file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(str(os.getpid()))
+
+    def remove():
+        try:
+            with open(path) as f:
+                if f.read().strip() == str(os.getpid()):
+                    os.remove(path)
+        except OSError:
+            pass
+
+    atexit.register(remove)
+
+
+def stop_inference_server(cfg, timeout=10):
+    """SIGTERM the server recorded in the pid file and wait for it to exit. Returns True if one was stopped."""
+    try:
+        with open(cfg.inference_server_pid_file) as f:
+            pid = int(f.read().strip())
+    except (OSError, ValueError):
+        return False
+
+    try:
+        os.kill(pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return False
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        time.sleep(0.1)
+
+    logging.warning(f"Inference server (pid {pid}) did not exit within {timeout}s")
+    return False
+
+
+class _Channel:
+    """One client thread's connection and shared memory segment."""
+
+    def __init__(self, cfg, conn):
+        self.cfg = cfg
+        self.conn = conn
+        self.shm = None
+        self.capacity = 0
+        self.inputs = None
+        self.outputs = None
+
+    def reserve(self, n):
+        if n <= self.capacity:
+            return
+
+        capacity = max(n, self.capacity * 2, 1)
+        shm = SharedMemory(create=True, size=_channel_bytes(capacity, self.cfg.image_size, self.cfg.num_classes))
+
+        self._release_shm()
+        self.shm = shm
+        self.capacity = capacity
+        self.inputs, self.outputs = _regions(shm.buf, capacity, capacity, self.cfg.image_size, self.cfg.num_classes)
+
+    def _release_shm(self):
+        if self.shm is None:
+            return
+
+        self.inputs = self.outputs = None
+        self.shm.unlink()
+        try:
+            self.shm.close()
+        except BufferError:
+            # A tensor from the preprocessor still views it; freed once that is gone
+            pass
+        self.shm = None
+        self.capacity = 0
+
+    def close(self):
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+        self._release_shm()
+
+    def __del__(self):
+        # Thread-local channels are dropped when their thread exits
+        self.close()
+
+
+class SharedMemoryPreprocessor(Preprocessor):
+    """Preprocessor whose per-thread buffer is the thread's shared memory input region."""
+
+    def __init__(self, image_size, channel_for, **kwargs):
+        super().__init__(image_size, device="cpu", **kwargs)
+        self._channel_for = channel_for
+
+    def _buffer(self, n):
+        return self._channel_for(n).inputs[:n]
+
+
+class RemoteModel:
+    """
+    Client side stand-in for the model, served by the inference process.
+    Same surface as SolarModel/BackendModel: model(batch) -> logits, .cfg,
+    .preprocessor (which preprocesses straight into shared memory).
+    """
+
+    backend = "remote"
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self._local = threading.local()
+        self._channels = weakref.WeakSet()
+        self.preprocessor = SharedMemoryPreprocessor(cfg.image_size, self._channel)
+        _clients.add(self)
+
+    def _connect(self):
+        return Client(tuple(self.cfg.inference_server_address), authkey=authkey(self.cfg))
+
+    def _channel(self, n=1):
+        channel = getattr(self._local, "channel", None)
+        if channel is None:
+            channel = _Channel(self.cfg, self._connect())
+            self._local.channel = channel
+            self._channels.add(channel)
+        channel.reserve(n)
+        return channel
+
+    def _reset_channel(self):
+        channel = getattr(self._local, "channel", None)
+        if channel is not None:
+            channel.close()
+            self._local.channel = None
+
+    def _request(self, x):
+        n = x.shape[0]
+        channel = self._channel(n)
+
+        # Batches from our own preprocessor already live in the input region
+        array = x.detach().cpu().numpy()
+        if array.ctypes.data != channel.inputs.ctypes.data:
+            channel.inputs[:n] = array
+
+        channel.conn.send(("infer", channel.shm.name, n, channel.capacity))
+        reply = channel.conn.recv()
+        if reply[0] != "ok":
+            raise RuntimeError(f"Inference server error: {reply[1]}")
+
+        return torch.from_numpy(channel.outputs[:n].copy())
+
+    def __call__(self, x):
+        try:
+            return self._request(x)
+        except (EOFError, ConnectionError, OSError):
+            # Server restarted or went away: start/reconnect once, then retry
+            self._reset_channel()
+            ensure_inference_server(self.cfg)
+            return self._request(x)
+
+    def eval(self):
+        return self
+
+    def close(self):
+        for channel in list(self._channels):
+            channel.close()
+
+
+_clients = weakref.WeakSet()
+
+
+def _server_reachable(cfg):
+    try:
+        conn = Client(tuple(cfg.inference_server_address), authkey=authkey(cfg))
+    except (ConnectionError, OSError):
+        return False
+    conn.close()
+    return True
+
+
+def ensure_inference_server(cfg):
+    """Start the inference server process unless one is already listening, then wait for it."""
+    if _server_reachable(cfg):
+        return True
+
+    os.makedirs(os.path.join(_PROJECT_ROOT, "logs"), exist_ok=True)
+    log = open(os.path.join(_PROJECT_ROOT, "logs", "inference_server.log"), "ab")
+
+    # Detached (own session, not stopped when this worker exits): the server is
+    # shared by every worker, so a worker recycle must not take it down. Stop it
+    # through its pid file (python -m ml.inference_server --stop).
+    # Same working directory as this worker, so Config's resource paths (key file,
+    # model) resolve to the same files; the project root goes on the import path
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (_PROJECT_ROOT, env.get("PYTHONPATH")) if p)
+
+    subprocess.Popen(
+        [sys.executable, "-m", "ml.inference_server"],
+        cwd=os.getcwd(),
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=log,
+        stderr=log,
+        start_new_session=True
+    )
+    log.close()
+
+    deadline = time.monotonic() + cfg.inference_server_start_timeout
+    while time.monotonic() < deadline:
+        if _server_reachable(cfg):
+            return True
+        time.sleep(0.2)
+
+    raise RuntimeError("Inference server did not start in time.")
+
+
+def connect_inference_server(cfg):
+    """RemoteModel for cfg, starting the server process if needed."""
+    ensure_inference_server(cfg)
+    return RemoteModel(cfg)
+
+
+@atexit.register
+def _close_clients():
+    for client in list(_clients):
+        client.close()
+
+
+def main():
+    import argparse
+    import app  # noqa: F401  (config imports app.utils)
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="Dedicated VIKAS inference server.")
+    parser.add_argument("--stop", action="store_true", help="stop the running server (from the pid file)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    if args.stop:
+        print("Inference server stopped." if stop_inference_server(Config()) else "No inference server running.")
+        return
+
+    serve(Config())
+
+
+if __name__ == "__main__":
+    main()
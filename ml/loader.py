@@ -1,9 +1,16 @@
 import torch
 import logging
 from .solar_model import SolarModel
+from .preprocess import Preprocessor
+from .backends import build_backend
 import os
 
 def load_model(cfg):
+    # The model lives in the shared inference process; this returns a proxy to it
+    if getattr(cfg, "inference_server", False):
+        from .inference_server import connect_inference_server
+        return connect_inference_server(cfg)
+
     try:
         if not os.path.exists(cfg.model_path):
             logging.error(f"Model file not found: {cfg.model_path}")
@@ -20,8 +27,12 @@ def load_model(cfg):
 
         model.to(cfg.device)    
         model.eval()
-        
-        return model
+
+        # Built once per loaded model and reused by every prediction
+        model.preprocessor = Preprocessor.from_config(cfg)
+
+        # Optionally swap in an optimized runtime (TorchScript, ONNX, int8, ...)
+        return build_backend(model, cfg)
     except Exception as e:
         logging.error(f"Model load error: {str(e)}")
         return None
@@ -0,0 +1,52 @@
+"""GridDeduper keeps exactly the points the pairwise coordinates_match scan would keep."""
+import numpy as np
+
+from app.services.coordinate_ingest import GridDeduper
+from app.utils.helper import coordinates_match
+
+TOLERANCE = 0.0001
+
+
+def brute_force(lats, lons, tolerance=TOLERANCE):
+    accepted = []
+    mask = []
+    for lat, lon in zip(lats.tolist(), lons.tolist()):
+        keep = not any(coordinates_match(c, lat, lon, tolerance) for c in accepted)
+        if keep:
+            accepted.append((lat, lon))
+        mask.append(keep)
+    return np.array(mask)
+
+
+def clustered_points(n, seed):
+    # Points a fraction of the tolerance apart, so many are near-duplicates across cell borders
+    rng = np.random.default_rng(seed)
+    lats = 45.0 + rng.integers(0, 40, n) * TOLERANCE * 0.37
+    lons = 10.0 + rng.integers(0, 40, n) * TOLERANCE * 0.61
+    return lats, lons
+
+
+def test_matches_pairwise_scan():
+    lats, lons = clustered_points(2000, seed=1)
+
+    deduper = GridDeduper(TOLERANCE)
+
+    expected = brute_force(lats, lons)
+    assert np.array_equal(deduper.add(lats, lons), expected)
+    assert len(deduper) == expected.sum()
+
+
+def test_duplicates_are_found_across_chunks():
+    lats, lons = clustered_points(1500, seed=2)
+
+    deduper = GridDeduper(TOLERANCE)
+    masks = [deduper.add(lats[i:i + 500], lons[i:i + 500]) for i in range(0, len(lats), 500)]
+
+    assert np.array_equal(np.concatenate(masks), brute_force(lats, lons))
+
+
+def test_points_just_outside_the_tolerance_are_kept():
+    lats = np.array([45.0, 45.0 + TOLERANCE * 0.5, 45.0 + TOLERANCE * 1.5])
+    lons = np.array([10.0, 10.0, 10.0])
+
+    assert GridDeduper(TOLERANCE).add(lats, lons).tolist() == [True, False, True]
@@ -0,0 +1,96 @@
+"""Coarse-to-fine scans screen the whole coarse cell and refine every cell they cannot rule out."""
+import numpy as np
+import pytest
+
+import app  # noqa: F401  (config imports app.utils)
+from app.services import prediction_service as ps
+from app.services.satellite_img_service import get_bbox
+from app.services.scan_planner import ScanPlan
+from config import Config
+
+# Away from the equator the lon stride (333 m) is wider than the model window
+AREA = {"shape": "grid", "lat": 45.0, "lon": 10.0, "rows": 8, "cols": 8, "hierarchical": True}
+
+
+@pytest.fixture
+def cfg():
+    cfg = Config()
+    cfg.scan_screen_levels = 2
+    cfg.scan_screen_threshold = 0.5
+    cfg.pipeline_fetch_workers = 2
+    return cfg
+
+
+@pytest.fixture
+def imagery(monkeypatch):
+    """Fake imagery with one solar panel: a window is positive when its bbox contains the panel."""
+    state = {"panel": None, "screen_label": None}
+
+    def get_image(lat, lon, zoom=18, channels=3, retries=3, extent=None):
+        lat1, lon1, lat2, lon2 = get_bbox(lat, lon, extent)
+        panel_lat, panel_lon = state["panel"]
+        inside = lat2 <= panel_lat <= lat1 and lon1 <= panel_lon <= lon2
+        image = np.zeros((1, 1, 3), dtype=np.uint8)
+        image[..., 0] = 255 if inside else 0
+        image[..., 1] = zoom
+        return image
+
+    def predict_images(images, model, threshold=0.49, batch_size=32):
+        results = []
+        for image in images:
+            if state["screen_label"] and image[0, 0, 1] < 18:
+                results.append((state["screen_label"], 0.0))
+            elif image[0, 0, 0] == 255:
+                results.append(("Solar Panel", 0.9))
+            else:
+                results.append(("Not a Solar Panel", 0.01))
+        return results
+
+    monkeypatch.setattr(ps, "get_image", get_image)
+    monkeypatch.setattr(ps, "predict_images", predict_images)
+    monkeypatch.setattr(ps, "save_predictions", lambda records, cfg: None)
+    return state
+
+
+def run(plan, cfg):
+    scan = ps.HierarchicalScan(None, plan, cfg, use_cache=False, image_limit=0)
+    return scan, {(r["lat"], r["lon"]): r for r in scan}
+
+
+def test_positive_tile_at_coarse_cell_edge_is_refined(cfg, imagery):
+    plan = ScanPlan(AREA)
+    group = next(plan.iter_groups(1 << cfg.scan_screen_levels))
+    edge = max(group["cells"], key=lambda c: (c["lon"], c["lat"]))
+    imagery["panel"] = (edge["lat"], edge["lon"])
+
+    scan, results = run(plan, cfg)
+
+    assert results[(edge["lat"], edge["lon"])]["label"] == "Solar Panel"
+    assert scan.passed == 1
+    assert scan.refined == len(group["cells"]) == 16
+    assert scan.skipped == len(plan) - 16
+
+
+def test_screen_extent_covers_every_tile_window(cfg, imagery):
+    plan = ScanPlan(AREA)
+    scan = ps.HierarchicalScan(None, plan, cfg)
+    half_lat, half_lon = scan.screen_extent()
+
+    for group in plan.iter_groups(1 << cfg.scan_screen_levels):
+        lat1, lon1, lat2, lon2 = get_bbox(group["lat"], group["lon"], (half_lat, half_lon))
+        for cell in group["cells"]:
+            assert lat2 <= cell["lat"] <= lat1
+            assert lon1 <= cell["lon"] <= lon2
+
+
+@pytest.mark.parametrize("label", ["Error", "N/A"])
+def test_failed_screening_refines_the_cell(cfg, imagery, label):
+    plan = ScanPlan(AREA)
+    imagery["panel"] = (0.0, 0.0)
+    imagery["screen_label"] = label
+
+    scan, results = run(plan, cfg)
+
+    assert scan.passed == scan.screened == 4
+    assert scan.skipped == 0
+    assert len(results) == len(plan)
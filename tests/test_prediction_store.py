@@ -0,0 +1,77 @@
+"""Keyset pagination and filters of the SQLite history store, and the background writer."""
+import pytest
+
+from app.services.prediction_store import PredictionStore, make_record
+from app.services.prediction_writer import PredictionWriter
+
+LABELS = ["Solar Panel", "Not a Solar Panel", "Error"]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PredictionStore(str(tmp_path / "predictions.db"))
+
+
+def fill(store, n=25):
+    store.add_many([make_record(10 + i / 1000, 20, LABELS[i % 3], i / n) for i in range(n)])
+
+
+def all_pages(store, limit, filters=None):
+    pages = []
+    cursor = None
+    while True:
+        rows, cursor = store.page(limit, cursor, filters)
+        pages.append(rows)
+        if cursor is None:
+            return pages
+
+
+def test_pages_cover_history_newest_first(store):
+    fill(store)
+
+    pages = all_pages(store, 10)
+    ids = [row["id"] for rows in pages for row in rows]
+
+    assert [len(rows) for rows in pages] == [10, 10, 5]
+    assert ids == sorted(ids, reverse=True)
+    assert len(set(ids)) == store.count() == 25
+
+
+def test_exact_multiple_of_the_page_size_has_no_empty_last_page(store):
+    fill(store, 20)
+
+    assert [len(rows) for rows in all_pages(store, 10)] == [10, 10]
+
+
+def test_label_filter_pages_only_matching_rows(store):
+    fill(store)
+
+    pages = all_pages(store, 4, {"label": "Solar Panel"})
+    rows = [row for page in pages for row in page]
+
+    assert len(rows) == 9
+    assert {row["label"] for row in rows} == {"Solar Panel"}
+    assert [row["id"] for row in rows] == sorted((row["id"] for row in rows), reverse=True)
+
+
+def test_labels_are_distinct_and_sorted(store):
+    assert store.labels() == []
+
+    fill(store)
+
+    assert store.labels() == sorted(LABELS)
+
+
+def test_writer_flushes_queued_records_on_close(store):
+    # Neither the count nor the interval triggers a flush before close()
+    writer = PredictionWriter(store, flush_count=1000, flush_interval=60)
+    writer.submit([make_record(1, 2, "Solar Panel", 0.9) for _ in range(5)])
+
+    writer.close()
+
+    assert store.count() == 5
+    assert writer.stats()["written"] == 5
+
+    # After close, submits go straight to the store instead of a stopped queue
+    writer.submit([make_record(1, 2, "Solar Panel", 0.9)])
+    assert store.count() == 6
@@ -0,0 +1,83 @@
+"""Parity of the fused NumPy Preprocessor with the original torchvision pipeline."""
+import cv2
+import numpy as np
+import pytest
+import torch
+
+from ml.preprocess import Preprocessor, reference_transform, check_preprocess_parity
+
+IMAGE_SIZE = (224, 224)
+ATOL = 1e-4
+
+# Square, satellite-window sized and non-square inputs, up- and down-scaled
+SIZES = [(224, 224), (256, 256), (305, 559), (100, 300), (480, 120), (37, 53)]
+
+
+def random_bgr(height, width, seed):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+
+def reference(images, image_size=IMAGE_SIZE):
+    transform = reference_transform(image_size)
+    return torch.stack([transform(cv2.cvtColor(img, cv2.COLOR_BGR2RGB)) for img in images])
+
+
+@pytest.mark.parametrize("height,width", SIZES)
+def test_single_image_matches_torchvision(height, width):
+    image = random_bgr(height, width, seed=height * 1000 + width)
+
+    actual = Preprocessor(IMAGE_SIZE)(image).cpu()
+    expected = reference([image])
+
+    assert actual.shape == expected.shape == (1, 3, *IMAGE_SIZE)
+    assert (actual - expected).abs().max().item() <= ATOL
+
+
+def test_batch_of_mixed_sizes_matches_torchvision():
+    images = [random_bgr(h, w, seed=i) for i, (h, w) in enumerate(SIZES)]
+
+    actual = Preprocessor(IMAGE_SIZE)(images).cpu()
+    expected = reference(images)
+
+    assert actual.shape == (len(images), 3, *IMAGE_SIZE)
+    assert (actual - expected).abs().max().item() <= ATOL
+
+
+def test_batch_matches_single_calls():
+    # The per-thread buffer is reused between calls; results must not depend on batch composition
+    preprocessor = Preprocessor(IMAGE_SIZE)
+    images = [random_bgr(h, w, seed=10 + i) for i, (h, w) in enumerate(SIZES)]
+
+    singles = [preprocessor(img).clone() for img in images]
+    batch = preprocessor(images).clone()
+
+    for i, single in enumerate(singles):
+        assert torch.equal(batch[i], single[0])
+
+
+def test_non_square_output_size():
+    image_size = (160, 240)
+    images = [random_bgr(h, w, seed=20 + i) for i, (h, w) in enumerate(SIZES[:3])]
+
+    actual = Preprocessor(image_size)(images).cpu()
+    expected = reference(images, image_size)
+
+    assert actual.shape == (3, 3, *image_size)
+    assert (actual - expected).abs().max().item() <= ATOL
+
+
+def test_check_preprocess_parity_helper():
+    images = [random_bgr(h, w, seed=30 + i) for i, (h, w) in enumerate(SIZES)]
+
+    ok, max_diff, mean_diff = check_preprocess_parity(Preprocessor(IMAGE_SIZE), images, atol=ATOL)
+
+    assert ok
+    assert max_diff <= ATOL
+    assert mean_diff <= max_diff
+
+
+@pytest.mark.parametrize("bad", [np.zeros((8, 8), np.uint8), np.zeros((8, 8, 4), np.uint8), [[1, 2, 3]]])
+def test_rejects_non_bgr_input(bad):
+    with pytest.raises(ValueError):
+        Preprocessor.validate(bad)
@@ -0,0 +1,122 @@
+"""Sliding windows over a memory-mapped GeoTIFF: offsets, pixels and georeferencing."""
+import struct
+
+import numpy as np
+import pytest
+
+from app.services.raster_source import RasterPlan, _window_offsets, open_geotiff, open_raster
+
+# (tag, type, values); type 3 = SHORT, 4 = LONG, 12 = DOUBLE
+SHORT, LONG, DOUBLE = 3, 4, 12
+
+
+def write_geotiff(path, pixels, origin=(10.0, 45.0), pixel_size=0.001, drop=(), override=None):
+    """Minimal uncompressed, single-strip, little-endian GeoTIFF (EPSG:4326 by default).
+    drop / override remove or replace tags, to write malformed files."""
+    height, width, bands = pixels.shape
+    data = pixels.tobytes()
+    data_offset = 8
+
+    tags = [
+        (256, LONG, [width]),
+        (257, LONG, [height]),
+        (258, SHORT, [8] * bands),
+        (259, SHORT, [1]),
+        (273, LONG, [data_offset]),
+        (277, SHORT, [bands]),
+        (278, LONG, [height]),
+        (279, LONG, [len(data)]),
+        (33550, DOUBLE, [pixel_size, pixel_size, 0.0]),
+        (33922, DOUBLE, [0.0, 0.0, 0.0, origin[0], origin[1], 0.0]),
+    ]
+    override = override or {}
+    tags = [(tag, kind, override.get(tag, values)) for tag, kind, values in tags if tag not in drop]
+
+    ifd_offset = data_offset + len(data)
+    extra_offset = ifd_offset + 2 + 12 * len(tags) + 4
+    entries, extra = b"", b""
+
+    for tag, kind, values in tags:
+        fmt = {SHORT: "H", LONG: "I", DOUBLE: "d"}[kind]
+        raw = struct.pack(f"<{len(values)}{fmt}", *values)
+        if len(raw) <= 4:
+            entries += struct.pack("<HHI", tag, kind, len(values)) + raw.ljust(4, b"\0")
+        else:
+            entries += struct.pack("<HHII", tag, kind, len(values), extra_offset + len(extra))
+            extra += raw
+
+    with open(path, "wb") as f:
+        f.write(b"II" + struct.pack("<HI", 42, ifd_offset))
+        f.write(data)
+        f.write(struct.pack("<H", len(tags)) + entries + struct.pack("<I", 0) + extra)
+
+
+PIXELS = np.random.default_rng(0).integers(0, 256, (50, 70, 3), dtype=np.uint8)
+
+
+@pytest.fixture
+def pixels():
+    return PIXELS
+
+
+@pytest.mark.parametrize("size,window,stride,expected", [
+    (10, 4, 4, [0, 4, 6]),
+    (12, 4, 4, [0, 4, 8]),
+    (10, 4, 3, [0, 3, 6]),
+    (4, 4, 4, [0]),
+    (10, 4, 8, [0, 6]),
+])
+def test_window_offsets_end_flush_with_the_edge(size, window, stride, expected):
+    assert _window_offsets(size, window, stride) == expected
+
+
+def test_windows_read_the_pixels_at_their_offsets(tmp_path, pixels):
+    path = tmp_path / "scene.tif"
+    write_geotiff(path, pixels)
+
+    plan = RasterPlan(open_geotiff(str(path)), (20, 30), (15, 25))
+
+    assert plan.row_offsets == [0, 15, 30]
+    assert plan.col_offsets == [0, 25, 40]
+    assert len(plan) == 9
+
+    images = plan.images
+    for index in range(len(plan)):
+        row, col = divmod(index, len(plan.col_offsets))
+        r, c = plan.row_offsets[row], plan.col_offsets[col]
+        # Windows come back as BGR
+        assert np.array_equal(images[index], pixels[r:r + 20, c:c + 30, ::-1])
+
+
+def test_window_centres_are_georeferenced(tmp_path, pixels):
+    path = tmp_path / "scene.tif"
+    write_geotiff(path, pixels, origin=(10.0, 45.0), pixel_size=0.001)
+
+    plan = RasterPlan(open_geotiff(str(path)), (20, 30), (15, 25))
+    centres = list(plan)
+
+    assert centres[0] == {"lat": round(45.0 - 10 * 0.001, 6), "lon": round(10.0 + 15 * 0.001, 6)}
+    assert centres[-1] == {"lat": round(45.0 - 40 * 0.001, 6), "lon": round(10.0 + 55 * 0.001, 6)}
+
+
+def truncate(path, size):
+    with open(path, "r+b") as f:
+        f.truncate(size)
+
+
+@pytest.mark.parametrize("damage,message", [
+    (lambda path: write_geotiff(path, PIXELS, drop=(256,)), "missing required tags ImageWidth"),
+    (lambda path: write_geotiff(path, PIXELS, drop=(273, 279)), "missing required tags StripOffsets, StripByteCounts"),
+    (lambda path: write_geotiff(path, PIXELS, override={273: [10 ** 6]}), "past the end of the file"),
+    (lambda path: write_geotiff(path, PIXELS, override={256: [0]}), "no pixels"),
+    (lambda path: write_geotiff(path, PIXELS, override={33922: [0.0, 0.0]}), "not georeferenced"),
+    (lambda path: (write_geotiff(path, PIXELS), truncate(path, 6)), "Not a TIFF file"),
+    (lambda path: (write_geotiff(path, PIXELS), truncate(path, 8 + PIXELS.nbytes + 20)), "Malformed TIFF"),
+    (lambda path: path.write_bytes(b"II" + struct.pack("<HI", 42, 10 ** 9)), "Malformed TIFF"),
+])
+def test_malformed_tiffs_raise_value_error(tmp_path, damage, message):
+    path = tmp_path / "broken.tif"
+    damage(path)
+
+    with pytest.raises(ValueError, match=message):
+        open_raster(str(path))
@@ -0,0 +1,92 @@
+"""Spatial result cache lookups, and which pipeline results are allowed into it."""
+import numpy as np
+import pytest
+
+import app  # noqa: F401  (config imports app.utils)
+from app.services import prediction_service as ps
+from app.services.result_cache import SpatialResultCache
+from config import Config
+
+# ~1 m of latitude
+METER = 1 / 111000
+
+
+def test_hit_within_radius_and_miss_outside():
+    cache = SpatialResultCache(radius_m=11)
+    cache.put(45.0, 10.0, {"label": "Solar Panel", "confidence": 0.9})
+
+    assert cache.get(45.0 + 5 * METER, 10.0)["label"] == "Solar Panel"
+    assert cache.get(45.0 + 20 * METER, 10.0) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_nearest_entry_wins():
+    cache = SpatialResultCache(radius_m=11)
+    cache.put(45.0, 10.0, {"label": "far"})
+    cache.put(45.0 + 8 * METER, 10.0, {"label": "near"})
+
+    assert cache.get(45.0 + 7 * METER, 10.0)["label"] == "near"
+
+
+def test_expired_and_overflowing_entries_are_dropped(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.services.result_cache.time.time", lambda: now[0])
+
+    cache = SpatialResultCache(radius_m=11, ttl=60, max_entries=2)
+    cache.put(1.0, 1.0, {"label": "a"})
+    now[0] += 61
+    assert cache.get(1.0, 1.0) is None
+
+    for i in range(3):
+        cache.put(2.0 + i, 2.0, {"label": str(i)})
+    assert cache.get(2.0, 2.0) is None
+    assert cache.stats()["entries"] == 2
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """iter_prediction_batch with fake imagery: lat 1 has no tile, lat 2 fails inference."""
+    cache = SpatialResultCache(radius_m=11)
+
+    def fetch(lat, lon, cfg):
+        return None if lat == 1.0 else np.full((4, 4, 3), int(lat), dtype=np.uint8)
+
+    def predict_images(images, model, threshold=0.49, batch_size=32):
+        return [("Error", 0.0) if image[0, 0, 0] == 2 else ("Solar Panel", 0.9) for image in images]
+
+    monkeypatch.setattr(ps, "get_result_cache", lambda: cache)
+    monkeypatch.setattr(ps, "predict_images", predict_images)
+    monkeypatch.setattr(ps, "store_image", lambda image: f"img{image[0, 0, 0]}")
+    monkeypatch.setattr(ps, "save_predictions", lambda records, cfg: None)
+
+    cfg = Config()
+
+    def run(coords):
+        return list(ps.iter_prediction_batch(None, coords, cfg, fetch=fetch))
+
+    return cache, run
+
+
+def test_failed_results_are_not_cached(pipeline):
+    cache, run = pipeline
+    coords = [{"lat": 1.0, "lon": 0.0}, {"lat": 2.0, "lon": 0.0}, {"lat": 3.0, "lon": 0.0}]
+
+    labels = [r["label"] for r in run(coords)]
+
+    assert labels == ["N/A", "Error", "Solar Panel"]
+    assert cache.stats()["entries"] == 1
+    assert cache.get(1.0, 0.0) is None
+    assert cache.get(2.0, 0.0) is None
+    assert cache.get(3.0, 0.0)["image_id"] == "img3"
+
+
+def test_cached_result_skips_fetch_and_inference(pipeline, monkeypatch):
+    cache, run = pipeline
+    cache.put(3.0, 0.0, {"label": "Not a Solar Panel", "confidence": 0.1, "image_id": None})
+
+    predicted = []
+    monkeypatch.setattr(ps, "predict_images", lambda images, *args, **kwargs: predicted.extend(images) or [])
+
+    assert run([{"lat": 3.0, "lon": 0.0}])[0]["label"] == "Not a Solar Panel"
+    assert predicted == []
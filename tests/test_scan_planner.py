@@ -0,0 +1,39 @@
+"""ScanPlan reproduces the original fixed 5 x 5 scan layout."""
+import numpy as np
+import pytest
+
+from app.services.scan_planner import ScanPlan
+
+
+def original_scan_coordinates(lat, lon):
+    """The scan grid as computed before ScanPlan existed."""
+    meters_per_degree_lat = 111000
+    meters_per_degree_lon = 111000 * np.cos(np.radians(lat))
+
+    tile_width_deg = 333 / meters_per_degree_lon
+    tile_height_deg = 177 / meters_per_degree_lat
+
+    start_lat = lat - (tile_height_deg * 5 / 2) + (tile_height_deg / 2)
+    start_lon = lon - (tile_width_deg * 5 / 2) + (tile_width_deg / 2)
+
+    return [
+        {"lat": round(start_lat + i * tile_height_deg, 6), "lon": round(start_lon + j * tile_width_deg, 6)}
+        for i in range(5)
+        for j in range(5)
+    ]
+
+
+@pytest.mark.parametrize("lat,lon", [(34.13747, 77.571188), (0.0, 0.0), (-33.8688, 151.2093), (64.1466, -21.9426)])
+def test_default_grid_matches_original_layout(lat, lon):
+    plan = ScanPlan({"shape": "grid", "lat": lat, "lon": lon, "rows": 5, "cols": 5})
+
+    assert len(plan) == 25
+    assert list(plan) == original_scan_coordinates(lat, lon)
+
+
+def test_groups_partition_the_plan():
+    plan = ScanPlan({"shape": "grid", "lat": 45.0, "lon": 10.0, "rows": 7, "cols": 6})
+
+    cells = [cell for group in plan.iter_groups(4) for cell in group["cells"]]
+
+    assert sorted((c["lat"], c["lon"]) for c in cells) == sorted((c["lat"], c["lon"]) for c in plan)
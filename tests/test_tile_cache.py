@@ -0,0 +1,57 @@
+"""LRU eviction and size accounting of the on-disk cache."""
+import os
+
+from app.services.tile_cache import DiskCache
+
+
+def set_mtime(cache, key, mtime):
+    os.utime(cache._path(key), (mtime, mtime))
+
+
+def test_evicts_least_recently_used_down_to_low_water(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=250, low_water=0.9)
+
+    cache.put(("a",), b"a" * 100)
+    cache.put(("b",), b"b" * 100)
+    set_mtime(cache, ("a",), 1000)
+    set_mtime(cache, ("b",), 2000)
+
+    # A hit makes "a" the most recently used entry
+    assert cache.get(("a",)) == b"a" * 100
+
+    cache.put(("c",), b"c" * 100)
+
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) is not None
+    assert cache.get(("c",)) is not None
+
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["size_bytes"] == 200
+
+
+def test_overwrite_replaces_size_instead_of_adding(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1000)
+
+    cache.put(("z", 1), b"x" * 300)
+    cache.put(("z", 1), b"y" * 100)
+
+    assert cache.stats()["size_bytes"] == 100
+    assert cache.get(("z", 1)) == b"y" * 100
+    assert cache.stats()["evictions"] == 0
+
+
+def test_size_is_rebuilt_from_disk(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1000)
+    cache.put(("z", 1, 2), b"x" * 120)
+    cache.put(("z", 1, 3), b"x" * 80)
+
+    assert DiskCache(str(tmp_path), max_bytes=1000).stats()["size_bytes"] == 200
+
+
+def test_entries_larger_than_the_cache_are_not_stored(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=100)
+    cache.put(("big",), b"x" * 101)
+
+    assert cache.get(("big",)) is None
+    assert cache.stats()["size_bytes"] == 0
@@ -0,0 +1,70 @@
+"""MBTiles reads, and that closing a reader closes every connection it opened."""
+import sqlite3
+import threading
+
+import pytest
+
+from app.services.tile_providers import MBTilesReader
+
+
+@pytest.fixture
+def mbtiles(tmp_path):
+    path = str(tmp_path / "imagery.mbtiles")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE metadata (name TEXT, value TEXT)")
+    conn.execute("CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB)")
+    # TMS row of z=2, y=1
+    conn.execute("INSERT INTO tiles VALUES (2, 3, 2, ?)", (b"tile",))
+    conn.commit()
+    conn.close()
+    return path
+
+
+def is_closed(conn):
+    try:
+        conn.execute("SELECT 1")
+    except sqlite3.ProgrammingError:
+        return True
+    return False
+
+
+def test_reads_tms_rows_as_xyz(mbtiles):
+    reader = MBTilesReader(mbtiles)
+
+    assert reader.read(2, 3, 1) == b"tile"
+    assert reader.read(2, 3, 2) is None
+    reader.close()
+
+
+def test_close_also_closes_connections_in_use(mbtiles):
+    reader = MBTilesReader(mbtiles, pool_size=2)
+    idle = reader._acquire()
+    busy = reader._acquire()
+    reader._release(idle)
+
+    reader.close()
+
+    assert is_closed(idle)
+    assert not is_closed(busy)
+
+    # The read in flight finishes, then its connection is closed too
+    reader._release(busy)
+    assert is_closed(busy)
+    assert reader.open_connections() == 0
+
+
+def test_waiting_reads_finish_after_close(mbtiles):
+    reader = MBTilesReader(mbtiles, pool_size=1)
+    busy = reader._acquire()
+
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(reader.read(2, 3, 1)))
+    waiter.start()
+
+    reader.close()
+    waiter.join(5)
+    reader._release(busy)
+
+    assert not waiter.is_alive()
+    assert results == [b"tile"]
+    assert reader.open_connections() == 0